@@ -0,0 +1,426 @@
+"""
+월 행렬 기반 벡터화 분석 엔진
+
+조회 결과를 (항목 × 월) float64 행렬로 한 번 변환한 뒤 NumPy 연산 한 번의 패스로
+항목별 합계, 월별 합계, 전월/전년 동월 대비 증감률, 이동 평균, 비중, 결측을 고려한
+통계, 상위/하위 N개를 계산합니다. 월 컬럼은 연도 목록이 아니라 YYYY-MM 스키마 규칙으로 찾습니다.
+
+입력 형태
+- 품목 라인 행 (ID, 품목, 함량, YYYY-MM...): analyze_matrix
+- QueryBuilder 월별 집계 (month, count, sum, sumsq, min, max, item_count): analyze_monthly_aggregate
+- QueryBuilder 품목×월 집계 (product, month, count, sum, sumsq, min, max, item_count):
+  analyze_product_monthly (월별 집계 분석 + 품목별 합계, 비중, 상위/하위 N개)
+- QueryBuilder 그룹 집계 (client|product|strength, total): analyze_totals
+- QueryBuilder 그룹별 월 집계 (client|product, month, count, sum, sumsq, min, max, item_count):
+  analyze_grouped_monthly (모든 그룹을 (그룹 × 월) 행렬 한 번으로 분석)
+"""
+
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_processor import DIMENSION_COLUMNS, get_month_columns
+
+# 이동 평균 구간 (개월)
+DEFAULT_ROLLING_WINDOW = 3
+# 상위/하위 항목 개수
+DEFAULT_TOP_N = 5
+# to_dict 결과의 소수점 자리수
+SUMMARY_DECIMALS = 4
+
+EMPTY = np.empty(0, dtype=np.float64)
+
+
+@dataclass(frozen=True)
+class RankedEntity:
+    label: str
+    total: float
+    share: float
+
+
+@dataclass(frozen=True)
+class AnalysisResult:
+    """분석 결과 (배열은 months / entity 순서와 같은 길이의 float64)"""
+    record_count: int
+    months: Tuple[str, ...]
+    monthly_totals: np.ndarray
+    monthly_counts: np.ndarray
+    monthly_mean: np.ndarray
+    mom_growth: np.ndarray
+    yoy_growth: np.ndarray
+    rolling_mean: np.ndarray
+    count: int
+    mean: float
+    std: float
+    min: float
+    max: float
+    null_ratio: float
+    entity_labels: Tuple[str, ...] = ()
+    entity_totals: np.ndarray = field(default_factory=lambda: EMPTY)
+    entity_share: np.ndarray = field(default_factory=lambda: EMPTY)
+    top: Tuple[RankedEntity, ...] = ()
+    bottom: Tuple[RankedEntity, ...] = ()
+    rolling_window: int = DEFAULT_ROLLING_WINDOW
+
+    @property
+    def total(self) -> float:
+        return float(self.monthly_totals.sum()) if len(self.months) else float(self.entity_totals.sum())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """보고서 프롬프트/그래프 상태용 요약 (JSON 직렬화 가능, 값은 반올림)."""
+        def by_month(values):
+            return {month: _round(value) for month, value in zip(self.months, values) if np.isfinite(value)}
+
+        def ranked(entities):
+            return [{"항목": e.label, "합계": _round(e.total), "비중": _round(e.share)} for e in entities]
+
+        summary: Dict[str, Any] = {
+            "총_레코드_수": self.record_count,
+            "분석_월": list(self.months),
+            "합계": _round(self.total),
+            "기본_통계": {
+                "count": self.count,
+                "mean": _round(self.mean),
+                "std": _round(self.std),
+                "min": _round(self.min),
+                "max": _round(self.max),
+                "결측_비율": _round(self.null_ratio),
+            },
+            "월별_분석": by_month(self.monthly_totals),
+            "전월대비_증감률": by_month(self.mom_growth),
+            "전년동월대비_증감률": by_month(self.yoy_growth),
+            f"{self.rolling_window}개월_이동평균": by_month(self.rolling_mean),
+        }
+        if self.top:
+            summary["상위_항목"] = ranked(self.top)
+            summary["하위_항목"] = ranked(self.bottom)
+        return summary
+
+
+def _round(value) -> Optional[float]:
+    value = float(value)
+    return round(value, SUMMARY_DECIMALS) if np.isfinite(value) else None
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def _month_index(months: Sequence[str]) -> np.ndarray:
+    """YYYY-MM -> 연속 월 번호 (year * 12 + month)."""
+    return np.array([int(m[:4]) * 12 + int(m[5:7]) for m in months], dtype=np.int64)
+
+
+def _growth(totals: np.ndarray, months: Sequence[str], lag: int) -> np.ndarray:
+    """lag개월 전 대비 증감률 (마지막 축이 월). 해당 월이 없거나 기준값이 0이면 NaN."""
+    index = _month_index(months)
+    position = {value: i for i, value in enumerate(index)}
+    previous = np.array([position.get(value - lag, -1) for value in index], dtype=np.int64)
+    base = np.where(previous >= 0, totals[..., np.maximum(previous, 0)], np.nan)
+    return _safe_divide(totals - base, base)
+
+
+def _rolling_mean(totals: np.ndarray, window: int) -> np.ndarray:
+    """이동 평균 (마지막 축이 월)."""
+    out = np.full(totals.shape, np.nan)
+    if window > 0 and totals.shape[-1] >= window:
+        cumsum = np.cumsum(totals, axis=-1)
+        cumsum = np.concatenate([np.zeros(totals.shape[:-1] + (1,)), cumsum], axis=-1)
+        out[..., window - 1:] = (cumsum[..., window:] - cumsum[..., :-window]) / window
+    return out
+
+
+def _rank(labels: Sequence[str], totals: np.ndarray, share: np.ndarray, top_n: int):
+    """상위/하위 N개 (argpartition으로 부분 정렬)."""
+    n = len(totals)
+    k = min(top_n, n)
+    if k == 0:
+        return (), ()
+    if k < n:
+        top_idx = np.argpartition(-totals, k - 1)[:k]
+        bottom_idx = np.argpartition(totals, k - 1)[:k]
+    else:
+        top_idx = bottom_idx = np.arange(n)
+    top_idx = top_idx[np.argsort(-totals[top_idx], kind="stable")]
+    bottom_idx = bottom_idx[np.argsort(totals[bottom_idx], kind="stable")]
+
+    def make(indices):
+        return tuple(RankedEntity(labels[i], float(totals[i]), float(share[i])) for i in indices)
+
+    return make(top_idx), make(bottom_idx)
+
+
+def _series_fields(months: Sequence[str], totals: np.ndarray, counts: np.ndarray, window: int) -> Dict[str, Any]:
+    return {
+        "months": tuple(months),
+        "monthly_totals": totals,
+        "monthly_counts": counts,
+        "monthly_mean": _safe_divide(totals, counts),
+        "mom_growth": _growth(totals, months, 1),
+        "yoy_growth": _growth(totals, months, 12),
+        "rolling_mean": _rolling_mean(totals, window),
+        "rolling_window": window,
+    }
+
+
+def _sample_std(count: float, total: float, sumsq: float) -> float:
+    """합/제곱합으로 표본 표준편차(n-1)를 계산합니다 (pandas describe와 동일)."""
+    if count <= 1:
+        return float("nan")
+    return float(np.sqrt(max((sumsq - total * total / count) / (count - 1), 0.0)))
+
+
+def analyze_matrix(values: np.ndarray, months: Sequence[str], labels: Sequence[str] = (),
+                   top_n: int = DEFAULT_TOP_N, window: int = DEFAULT_ROLLING_WINDOW) -> AnalysisResult:
+    """(항목 × 월) 행렬을 분석합니다. 결측은 NaN이며 합계에서는 0, 통계에서는 제외됩니다."""
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if values.ndim != 2 or values.shape[1] != len(months):
+        raise ValueError("values는 (항목 수, 월 수) 형태여야 합니다.")
+    labels = tuple(labels) or tuple(str(i) for i in range(values.shape[0]))
+
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+
+    # 행/열 합계는 BLAS 행렬-벡터 곱으로 계산
+    monthly_totals = np.ones(values.shape[0]) @ filled
+    entity_totals = filled @ np.ones(values.shape[1])
+    monthly_counts = np.count_nonzero(present, axis=0).astype(np.float64)
+
+    count = int(monthly_counts.sum())
+    total = float(monthly_totals.sum())
+    sumsq = float(np.einsum("ij,ij->", filled, filled))
+    if count:
+        # fmin/fmax는 NaN을 무시
+        minimum = float(np.fmin.reduce(values, axis=None))
+        maximum = float(np.fmax.reduce(values, axis=None))
+    else:
+        minimum = maximum = float("nan")
+
+    share = _safe_divide(entity_totals, entity_totals.sum())
+    top, bottom = _rank(labels, entity_totals, share, top_n)
+
+    return AnalysisResult(
+        record_count=values.shape[0],
+        count=count,
+        mean=total / count if count else float("nan"),
+        std=_sample_std(count, total, sumsq),
+        min=minimum,
+        max=maximum,
+        null_ratio=1.0 - count / values.size if values.size else 0.0,
+        entity_labels=labels,
+        entity_totals=entity_totals,
+        entity_share=share,
+        top=top,
+        bottom=bottom,
+        **_series_fields(months, monthly_totals, monthly_counts, window),
+    )
+
+
+def analyze_monthly_aggregate(df: pd.DataFrame, window: int = DEFAULT_ROLLING_WINDOW) -> AnalysisResult:
+    """QueryBuilder의 월별 집계 결과를 분석합니다 (항목별 분해 없음)."""
+    months = df["month"].astype(str).tolist()
+    counts = df["count"].to_numpy(dtype=np.float64)
+    totals = df["sum"].to_numpy(dtype=np.float64)
+    count = float(counts.sum())
+    total = float(totals.sum())
+    item_count = int(df["item_count"].iloc[0]) if len(df) else 0
+    cells = item_count * len(months)
+
+    return AnalysisResult(
+        record_count=item_count,
+        count=int(count),
+        mean=total / count if count else float("nan"),
+        std=_sample_std(count, total, float(df["sumsq"].to_numpy(dtype=np.float64).sum())),
+        min=float(df["min"].min()) if len(df) else float("nan"),
+        max=float(df["max"].max()) if len(df) else float("nan"),
+        null_ratio=1.0 - count / cells if cells else 0.0,
+        **_series_fields(months, totals, counts, window),
+    )
+
+
+def collapse_product_monthly(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    품목×월 집계(QueryFilter aggregation="product_monthly")를 월별 집계 형식으로 합칩니다.
+    item_count는 품목별 품목 라인 수의 합이고, 값이 없는 (품목, 월) 행은 제외됩니다.
+    """
+    _, first_rows = np.unique(df["product"].astype(str).to_numpy(), return_index=True)
+    item_count = int(df["item_count"].to_numpy()[first_rows].sum())
+    present = df[df["month"].notna() & (df["count"] > 0)]
+    months, inverse = np.unique(present["month"].astype(str).to_numpy(), return_inverse=True)
+
+    def column(name: str) -> np.ndarray:
+        return present[name].to_numpy(dtype=np.float64)
+
+    mins = np.full(len(months), np.inf)
+    maxs = np.full(len(months), -np.inf)
+    np.minimum.at(mins, inverse, column("min"))
+    np.maximum.at(maxs, inverse, column("max"))
+    return pd.DataFrame({
+        "month": months,
+        "count": np.bincount(inverse, weights=column("count"), minlength=len(months)),
+        "sum": np.bincount(inverse, weights=column("sum"), minlength=len(months)),
+        "sumsq": np.bincount(inverse, weights=column("sumsq"), minlength=len(months)),
+        "min": mins,
+        "max": maxs,
+        "item_count": item_count,
+    })
+
+
+def analyze_product_monthly(df: pd.DataFrame, top_n: int = DEFAULT_TOP_N,
+                            window: int = DEFAULT_ROLLING_WINDOW) -> AnalysisResult:
+    """
+    품목×월 집계를 분석합니다. 월 시계열/통계는 월별 집계로 합친 결과(analyze_monthly_aggregate)와 같고,
+    품목별 합계, 비중, 상위/하위 N개를 함께 계산합니다 (값이 있는 품목만, SQL 품목 그룹 집계와 동일).
+    """
+    result = analyze_monthly_aggregate(collapse_product_monthly(df), window)
+    present = df[df["month"].notna() & (df["count"] > 0)]
+    return _with_product_ranking(result, present["product"], present["sum"], top_n)
+
+
+def _with_product_ranking(result: AnalysisResult, products: pd.Series, sums: pd.Series,
+                          top_n: int) -> AnalysisResult:
+    """품목별 합계, 비중, 상위/하위 N개를 채운 결과를 반환합니다 (품목 이름순으로 모은 뒤 순위)."""
+    labels, inverse = np.unique(products.astype(str).to_numpy(), return_inverse=True)
+    totals = np.bincount(inverse, weights=sums.to_numpy(dtype=np.float64), minlength=len(labels))
+    share = _safe_divide(totals, totals.sum())
+    labels = tuple(str(label) for label in labels)
+    top, bottom = _rank(labels, totals, share, top_n)
+    return replace(result, entity_labels=labels, entity_totals=totals, entity_share=share, top=top, bottom=bottom)
+
+
+def analyze_grouped_monthly(df: pd.DataFrame, key: str,
+                            window: int = DEFAULT_ROLLING_WINDOW) -> Dict[str, AnalysisResult]:
+    """
+    QueryBuilder.build_grouped_monthly 결과를 그룹별로 분석합니다.
+    그룹마다 analyze_monthly_aggregate를 호출한 것과 같은 결과를 (그룹 × 월) 행렬 연산으로 한 번에 계산합니다.
+    값이 없는 월은 그룹별 결과에서 제외됩니다 (개별 조회의 GROUP BY 결과와 동일).
+    """
+    if df.empty:
+        return {}
+    labels, group_index = np.unique(df[key].astype(str).to_numpy(), return_inverse=True)
+    months, month_index = np.unique(df["month"].astype(str).to_numpy(), return_inverse=True)
+    shape = (len(labels), len(months))
+
+    def grid(column, fill):
+        out = np.full(shape, fill)
+        out[group_index, month_index] = df[column].to_numpy(dtype=np.float64)
+        return out
+
+    counts = grid("count", 0.0)
+    totals = grid("sum", 0.0)
+    present = counts > 0
+    # 증감률은 전체 월 격자에서 계산 (기준 월에 값이 없으면 합계 0 -> NaN으로 개별 분석과 같음)
+    mom = _growth(totals, months, 1)
+    yoy = _growth(totals, months, 12)
+
+    # 이동 평균은 그룹별로 값이 있는 월만 앞으로 모은 뒤 계산
+    order = np.argsort(~present, axis=1, kind="stable")
+    compact_totals = np.take_along_axis(totals, order, axis=1)
+    rolling = _rolling_mean(compact_totals, window)
+
+    group_count = counts.sum(axis=1)
+    group_total = totals.sum(axis=1)
+    group_sumsq = grid("sumsq", 0.0).sum(axis=1)
+    group_min = np.fmin.reduce(grid("min", np.nan), axis=1)
+    group_max = np.fmax.reduce(grid("max", np.nan), axis=1)
+    month_count = present.sum(axis=1)
+    item_count = np.zeros(len(labels))
+    item_count[group_index] = df["item_count"].to_numpy(dtype=np.float64)
+    cells = item_count * month_count
+    null_ratio = 1.0 - _safe_divide(group_count, cells)
+    mean = _safe_divide(group_total, group_count)
+
+    results: Dict[str, AnalysisResult] = {}
+    for g, label in enumerate(labels):
+        n = int(month_count[g])
+        columns = order[g, :n]
+        group_counts = counts[g, columns]
+        group_totals = compact_totals[g, :n]
+        results[str(label)] = AnalysisResult(
+            record_count=int(item_count[g]),
+            count=int(group_count[g]),
+            mean=float(mean[g]),
+            std=_sample_std(group_count[g], group_total[g], group_sumsq[g]),
+            min=float(group_min[g]),
+            max=float(group_max[g]),
+            null_ratio=float(null_ratio[g]) if cells[g] else 0.0,
+            months=tuple(str(month) for month in months[columns]),
+            monthly_totals=group_totals,
+            monthly_counts=group_counts,
+            monthly_mean=_safe_divide(group_totals, group_counts),
+            mom_growth=mom[g, columns],
+            yoy_growth=yoy[g, columns],
+            rolling_mean=rolling[g, :n],
+            rolling_window=window,
+        )
+    return results
+
+
+def add_grouped_product_ranking(results: Dict[str, AnalysisResult], df: pd.DataFrame,
+                                top_n: int = DEFAULT_TOP_N) -> Dict[str, AnalysisResult]:
+    """
+    QueryBuilder.build_grouped_product_totals 결과(entity, product, total)로 그룹별 품목 순위를 채웁니다.
+    항목 하나를 품목×월로 조회해 analyze_product_monthly로 분석한 결과와 같은 품목 합계/비중/상위·하위 N개입니다.
+    """
+    ranked = dict(results)
+    if df.empty:
+        return ranked
+    for entity, rows in df.groupby(df["entity"].astype(str), sort=False):
+        if entity in ranked:
+            ranked[entity] = _with_product_ranking(ranked[entity], rows["product"], rows["total"], top_n)
+    return ranked
+
+
+def analyze_totals(labels: Sequence[str], totals: Sequence[float], top_n: int = DEFAULT_TOP_N) -> AnalysisResult:
+    """그룹별 합계(client/product/strength, total)를 분석합니다 (월 정보 없음)."""
+    totals = np.asarray(totals, dtype=np.float64)
+    labels = tuple(str(label) for label in labels)
+    share = _safe_divide(totals, totals.sum())
+    top, bottom = _rank(labels, totals, share, top_n)
+    count = len(totals)
+    return AnalysisResult(
+        record_count=count,
+        count=count,
+        mean=float(totals.mean()) if count else float("nan"),
+        std=_sample_std(count, float(totals.sum()), float(totals @ totals)),
+        min=float(totals.min()) if count else float("nan"),
+        max=float(totals.max()) if count else float("nan"),
+        null_ratio=0.0,
+        entity_labels=labels,
+        entity_totals=totals,
+        entity_share=share,
+        top=top,
+        bottom=bottom,
+        **_series_fields((), EMPTY, EMPTY, DEFAULT_ROLLING_WINDOW),
+    )
+
+
+def entity_labels(df: pd.DataFrame) -> Tuple[str, ...]:
+    """차원 컬럼(ID, 품목, 함량)을 이어 붙여 항목 이름을 만듭니다."""
+    dims = [col for col in DIMENSION_COLUMNS if col in df.columns]
+    if not dims:
+        return tuple(str(i) for i in range(len(df)))
+    return tuple(df[dims].fillna("").astype(str).agg(" ".join, axis=1).str.strip())
+
+
+def analyze_frame(df: pd.DataFrame, top_n: int = DEFAULT_TOP_N,
+                  window: int = DEFAULT_ROLLING_WINDOW) -> AnalysisResult:
+    """조회 결과의 형태를 보고 알맞은 분석을 수행합니다."""
+    columns = set(df.columns)
+    if "product" in columns and "month" in columns:
+        return analyze_product_monthly(df, top_n, window)
+    if {"month", "count", "sum", "sumsq", "item_count"} <= columns:
+        return analyze_monthly_aggregate(df, window)
+    if "total" in columns and len(df.columns) == 2:
+        key = next(col for col in df.columns if col != "total")
+        return analyze_totals(df[key].tolist(), df["total"].to_numpy(), top_n)
+
+    months = get_month_columns(df.columns)
+    values = df[months].to_numpy(dtype=np.float64) if months else np.zeros((len(df), 0))
+    return analyze_matrix(values, months, entity_labels(df), top_n, window)
@@ -1,12 +1,11 @@
 import streamlit as st
 import pandas as pd
 import os
-from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
+import uuid
+from chart_renderer import load_plotly_json
 from data_processor import DataProcessor
-from langgraph_system import PerformanceReportSystem
-import sqlite3
+from db_pool import read_connection
+from system_registry import get_system, is_loaded, reset_system, warm_system
 
 # 페이지 설정
 st.set_page_config(
@@ -54,6 +53,9 @@ def initialize_session_state():
         st.session_state.auto_check_done = False
     if 'system_error' not in st.session_state:
         st.session_state.system_error = None
+    if 'thread_id' not in st.session_state:
+        # 그래프 체크포인트 스레드 ID (실패한 요청 이어서 실행, 보고서 검토)
+        st.session_state.thread_id = uuid.uuid4().hex
 
 def auto_check_systems():
     """시스템 상태를 자동으로 확인합니다."""
@@ -81,9 +83,9 @@ def auto_check_systems():
         import os
         load_dotenv()
         if os.getenv('OPENAI_API_KEY'):
-            from langgraph_system import PerformanceReportSystem
-            system = PerformanceReportSystem()
-            st.session_state.system = system
+            # 프로세스 공용 시스템 사용 (세션에는 채팅 히스토리만 저장)
+            # 첫 화면이 LLM/그래프 스택 임포트를 기다리지 않도록 백그라운드에서 준비
+            warm_system()
             st.session_state.system_initialized = True
     except Exception as e:
         st.session_state.system_initialized = False
@@ -97,8 +99,7 @@ def create_database():
         processor = DataProcessor()
         df = processor.load_excel_data()
         
-        if df is not None:
-            processor.create_sqlite_db(df)
+        if df is not None and processor.create_sqlite_db(df):
             analysis = processor.analyze_data_structure(df)
             st.session_state.db_created = True
             st.session_state.data_analysis = analysis
@@ -110,7 +111,7 @@ def create_database():
         return False, None
 
 def initialize_system():
-    """LangGraph 시스템을 초기화합니다."""
+    """LangGraph 시스템을 초기화합니다 (모든 세션이 공유하는 시스템을 새로 만듭니다)."""
     try:
         from dotenv import load_dotenv
         import os
@@ -122,9 +123,8 @@ def initialize_system():
             st.error("OPENAI_API_KEY가 설정되지 않았습니다. .env 파일을 확인해주세요.")
             return False
         
-        from langgraph_system import PerformanceReportSystem
-        system = PerformanceReportSystem()
-        st.session_state.system = system
+        reset_system()
+        get_system()
         st.session_state.system_initialized = True
         st.success("AI 시스템이 성공적으로 초기화되었습니다!")
         return True
@@ -169,9 +169,8 @@ def display_sample_data():
     st.markdown('<div class="section-header">📋 샘플 데이터</div>', unsafe_allow_html=True)
     
     try:
-        conn = sqlite3.connect("sales_data.db")
-        sample_data = pd.read_sql("SELECT * FROM sales_data LIMIT 10", conn)
-        conn.close()
+        with read_connection("sales_data.db") as conn:
+            sample_data = pd.read_sql("SELECT * FROM sales_data LIMIT 10", conn)
         
         st.dataframe(sample_data, use_container_width=True)
         
@@ -200,26 +199,68 @@ def chat_interface():
         with st.chat_message("user"):
             st.write(user_input)
         
-        # AI 응답 생성
+        # AI 응답 생성 (보고서 토큰 스트리밍)
         with st.chat_message("assistant"):
-            with st.spinner("보고서를 생성하고 있습니다..."):
-                try:
-                    response = st.session_state.system.run(user_input)
+            status = st.status("보고서를 생성하고 있습니다...", expanded=False)
+            final = {}
+            
+            def report_tokens():
+                for event in get_system().stream(user_input, thread_id=st.session_state.thread_id):
+                    if event["type"] == "progress":
+                        status.write(event["message"])
+                    elif event["type"] == "token":
+                        yield event["content"]
+                    elif event["type"] == "final":
+                        final.update(event)
+            
+            try:
+                streamed = st.write_stream(report_tokens())
+                status.update(label="보고서 생성 완료", state="complete")
+                response = final.get("content", "")
+                if not streamed:
                     st.write(response)
-                    
-                    # 차트가 생성된 경우 표시
-                    chart_files = [f for f in os.listdir('.') if f.startswith('chart_') and f.endswith('.png')]
-                    if chart_files:
-                        latest_chart = max(chart_files, key=os.path.getctime)
-                        st.image(latest_chart, caption="생성된 차트", use_column_width=True)
-                    
-                    # 채팅 히스토리에 추가
-                    st.session_state.chat_history.append((user_input, response))
-                    
-                except Exception as e:
-                    error_msg = f"오류가 발생했습니다: {e}"
-                    st.error(error_msg)
-                    st.session_state.chat_history.append((user_input, error_msg))
+                else:
+                    # 스트리밍된 보고서 외의 안내(검토 필요, 차트 경로)
+                    extra = response.replace(final.get("report", ""), "", 1).strip()
+                    if extra:
+                        st.write(extra)
+                
+                # 차트가 생성된 경우 표시 (PNG 렌더링을 기다리지 않고 Plotly JSON으로 표시)
+                chart = load_plotly_json(final.get("chart_json"))
+                if chart is not None:
+                    st.plotly_chart(chart, use_container_width=True)
+                
+                # 채팅 히스토리에 추가
+                st.session_state.chat_history.append((user_input, response))
+                
+            except Exception as e:
+                status.update(label="보고서 생성 실패", state="error")
+                error_msg = f"오류가 발생했습니다: {e}"
+                st.error(error_msg)
+                st.session_state.chat_history.append((user_input, error_msg))
+    
+    review_interface()
+
+def review_interface():
+    """검토 대기 중인 보고서를 승인/반려합니다 (그래프가 human_review 앞에서 멈춘 경우)."""
+    system = get_system() if is_loaded() else None
+    pending = system.pending_review(st.session_state.thread_id) if system is not None else None
+    if pending is None:
+        return
+    
+    st.warning(f"'{pending['client_or_region']}' 보고서는 사람의 검토가 필요합니다.")
+    report = st.text_area("보고서 초안 (수정 후 승인할 수 있습니다)", value=pending["report"], height=300)
+    col1, col2 = st.columns(2)
+    decision = None
+    if col1.button("✅ 승인", use_container_width=True):
+        decision = True
+    if col2.button("❌ 반려", use_container_width=True):
+        decision = False
+    if decision is not None:
+        response = system.review(st.session_state.thread_id, decision,
+                                 report if report != pending["report"] else None)
+        st.session_state.chat_history.append(("검토 " + ("승인" if decision else "반려"), response))
+        st.rerun()
 
 def sidebar():
     """사이드바를 구성합니다."""
@@ -243,6 +284,30 @@ def sidebar():
     if st.session_state.system_initialized:
         st.sidebar.success("✅ AI 시스템 준비됨")
         st.sidebar.info("🤖 GPT-4o 모델 연결됨")
+        
+        # 시스템이 아직 준비 중이면 지표 표시를 위해 기다리지 않음
+        system = get_system() if is_loaded() else None
+        metrics = system.get_classifier_metrics() if system else {"total": 0}
+        if metrics["total"]:
+            st.sidebar.metric(
+                "로컬 분류 적중률",
+                f"{metrics['hit_rate']:.0%}",
+                help=f"{metrics['local_hits']}/{metrics['total']}건을 LLM 호출 없이 분류"
+            )
+
+        node_metrics = system.get_node_metrics() if system else {}
+        if node_metrics:
+            with st.sidebar.expander("⏱️ 노드별 실행 시간"):
+                st.dataframe(pd.DataFrame([
+                    {
+                        "노드": node,
+                        "실행": m["count"],
+                        "p50(ms)": round(m["p50_ms"], 1),
+                        "p95(ms)": round(m["p95_ms"], 1),
+                        "토큰": m["prompt_tokens"] + m["completion_tokens"],
+                    }
+                    for node, m in node_metrics.items()
+                ]), hide_index=True, use_container_width=True)
     else:
         st.sidebar.warning("⚠️ AI 시스템 미준비")
         if hasattr(st.session_state, 'system_error'):
@@ -278,6 +343,8 @@ def sidebar():
     # 채팅 히스토리 클리어
     if st.sidebar.button("🗑️ 채팅 히스토리 클리어", use_container_width=True):
         st.session_state.chat_history = []
+        # 새 대화는 새 체크포인트 스레드에서 시작
+        st.session_state.thread_id = uuid.uuid4().hex
         st.rerun()
     
     st.sidebar.markdown("---")
@@ -0,0 +1,231 @@
+"""
+일괄 보고서 생성 (월말 전체 거래처/품목 보고서)
+
+PerformanceReportSystem.run을 항목마다 반복하면 항목마다 DB를 조회하고 LLM을 직렬로 호출합니다.
+이 모듈은 다음 순서로 모든 항목의 보고서를 만듭니다.
+1. QueryBuilder.build_grouped_monthly로 모든 항목의 월별 집계를, build_grouped_product_totals로 품목별 합계를 한 번에 조회
+2. analyze_grouped_monthly로 모든 항목을 한 번의 행렬 연산으로 분석하고 항목별 품목 순위(상위/하위, 비중)를 추가
+3. 보고서 생성(LLM)만 동시 실행 수를 제한한 비동기 풀에서 병렬로 호출
+   - 요청 한도(429) 응답을 받으면 모든 워커가 함께 대기(Retry-After 또는 지수 백오프)한 뒤 재시도
+4. 완료된 보고서는 즉시 reports.jsonl에 한 줄씩 추가하고 항목별 Markdown 파일로도 저장
+   - 중단 후 다시 실행하면 같은 데이터 버전으로 이미 완료된 항목은 건너뜀
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from analysis_engine import add_grouped_product_ranking, analyze_grouped_monthly
+from db_pool import read_connection
+from report_cache import get_data_version
+
+# 동시에 진행하는 보고서 생성 요청 수
+DEFAULT_CONCURRENCY = 8
+# 항목당 최대 재시도 횟수 (요청 한도/일시적 오류)
+DEFAULT_MAX_RETRIES = 6
+# 지수 백오프 기본 대기 시간과 상한 (초)
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+# 결과 디렉터리와 진행 기록 파일
+DEFAULT_OUTPUT_DIR = "batch_reports"
+RESULTS_FILE = "reports.jsonl"
+# 진행 상황 출력 간격 (완료 건수)
+PROGRESS_EVERY = 25
+
+# 재시도하는 일시적 오류 (openai/httpx 예외 클래스 이름, 임포트하지 않고 이름으로 판별)
+TRANSIENT_ERRORS = ("RateLimitError", "APITimeoutError", "APIConnectionError",
+                    "InternalServerError", "TimeoutError", "TimeoutException")
+
+_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def is_rate_limit(error: Exception) -> bool:
+    return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+
+def is_transient(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    return (type(error).__name__ in TRANSIENT_ERRORS or isinstance(error, asyncio.TimeoutError)
+            or status == 429 or (isinstance(status, int) and status >= 500))
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """응답의 Retry-After 헤더(초)를 반환합니다. 없으면 None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def report_filename(entity: str) -> str:
+    """
+    항목별 Markdown 파일 이름. 안전하지 않은 문자를 바꾸면 서로 다른 항목("A/B", "A B")이 같은 이름이 되므로
+    원래 이름의 해시 앞 8자리를 붙입니다.
+    """
+    digest = hashlib.sha256(entity.encode("utf-8")).hexdigest()[:8]
+    return f"{_UNSAFE_FILENAME.sub('_', entity).strip('_') or 'entity'}_{digest}.md"
+
+
+class BatchReportRunner:
+    """모든 거래처/품목의 보고서를 한 번에 생성합니다."""
+
+    def __init__(self, system, output_dir: str = DEFAULT_OUTPUT_DIR, group: str = "client",
+                 concurrency: int = DEFAULT_CONCURRENCY, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY):
+        """
+        system: PerformanceReportSystem (DB 파일, 쿼리 빌더, LLM, 보고서 프롬프트를 재사용)
+        group: client(거래처별) | product(품목별)
+        """
+        self.system = system
+        self.output_dir = output_dir
+        self.group = group
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.results_file = os.path.join(output_dir, RESULTS_FILE)
+        # 요청 한도에 걸리면 이 시각(time.monotonic)까지 모든 워커가 새 요청을 보내지 않음
+        self._cooldown_until = 0.0
+        self.stats = {"total": 0, "skipped": 0, "completed": 0, "failed": 0,
+                      "retries": 0, "rate_limited": 0}
+
+    def load_analyses(self) -> Dict[str, Dict[str, Any]]:
+        """
+        모든 항목의 월별 집계와 품목별 합계를 한 번씩 조회해 분석 결과(to_dict)를 반환합니다.
+        대화형 보고서(품목×월 분석)와 같은 시계열, 통계, 품목 순위(상위/하위 항목, 비중)를 포함합니다.
+        """
+        query_builder = self.system.query_builder
+        with read_connection(self.system.db_file) as conn:
+            df = pd.read_sql(query_builder.build_grouped_monthly(self.group), conn)
+            product_totals = pd.read_sql(query_builder.build_grouped_product_totals(self.group), conn)
+        analyses = add_grouped_product_ranking(analyze_grouped_monthly(df, self.group), product_totals)
+        return {entity: result.to_dict() for entity, result in analyses.items()}
+
+    def completed_entities(self, data_version: Optional[str]) -> set:
+        """같은 데이터 버전으로 이미 완료된 항목 (이어서 실행할 때 건너뜀)."""
+        done = set()
+        if not os.path.exists(self.results_file):
+            return done
+        with open(self.results_file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 중단 시점에 잘린 마지막 줄
+                    continue
+                if (record.get("status") == "ok" and record.get("group") == self.group
+                        and record.get("data_version") == data_version):
+                    done.add(record["entity"])
+        return done
+
+    def _write_result(self, record: Dict[str, Any]):
+        with open(self.results_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if record["status"] == "ok":
+            path = os.path.join(self.output_dir, self.group, report_filename(record["entity"]))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"# {record['entity']}\n\n{record['report']}\n")
+
+    async def _wait_cooldown(self):
+        while True:
+            delay = self._cooldown_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """재시도 대기 시간: Retry-After가 있으면 그 값, 없으면 지수 백오프 + 지터."""
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+            delay *= 0.5 + random.random() / 2
+        return delay
+
+    async def _generate(self, entity: str, analysis: Dict[str, Any]) -> str:
+        """보고서 한 건을 생성합니다 (일시적 오류는 백오프 후 재시도)."""
+        state = {"client_or_region": entity, "analysis_result": analysis}
+        messages = self.system._report_messages(state)
+        attempt = 0
+        while True:
+            await self._wait_cooldown()
+            try:
+                response = await self.system._ainvoke_llm(messages)
+                return response.content
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.stats["retries"] += 1
+                if is_rate_limit(e):
+                    # 한 워커가 한도에 걸리면 나머지 워커도 같은 시간만큼 요청을 멈춤
+                    self.stats["rate_limited"] += 1
+                    self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                else:
+                    await asyncio.sleep(delay)
+
+    async def _worker(self, queue: "asyncio.Queue", data_version: Optional[str], started: float):
+        while True:
+            try:
+                entity, analysis = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            record = {"entity": entity, "group": self.group, "data_version": data_version}
+            try:
+                record.update(status="ok", report=await self._generate(entity, analysis))
+                self.stats["completed"] += 1
+            except Exception as e:
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+                self.stats["failed"] += 1
+                print(f"보고서 생성 실패 ({entity}): {e}")
+            self._write_result(record)
+
+            finished = self.stats["completed"] + self.stats["failed"]
+            if finished % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  · {finished}/{self.stats['total'] - self.stats['skipped']}건 완료 "
+                      f"({finished / elapsed:.1f}건/초, 재시도 {self.stats['retries']}회)")
+
+    async def arun(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """모든 항목의 보고서를 생성하고 통계를 반환합니다."""
+        started = time.perf_counter()
+        os.makedirs(os.path.join(self.output_dir, self.group), exist_ok=True)
+        data_version = get_data_version(self.system.db_file)
+
+        analyses = await asyncio.to_thread(self.load_analyses)
+        loaded = time.perf_counter()
+        # 월별 데이터가 없는 항목은 보고서를 만들지 않음 (h2h_decision에서 검토 대상인 경우)
+        entities: List[str] = [entity for entity, analysis in analyses.items() if analysis["월별_분석"]]
+        if limit is not None:
+            entities = entities[:limit]
+        done = self.completed_entities(data_version)
+        self.stats["total"] = len(entities)
+        self.stats["skipped"] = sum(1 for entity in entities if entity in done)
+        print(f"📋 {len(entities)}개 항목 분석 완료 ({loaded - started:.2f}초), "
+              f"이미 완료 {self.stats['skipped']}개 건너뜀")
+
+        queue: "asyncio.Queue" = asyncio.Queue()
+        for entity in entities:
+            if entity not in done:
+                queue.put_nowait((entity, analyses[entity]))
+        workers = [self._worker(queue, data_version, loaded) for _ in range(max(1, self.concurrency))]
+        await asyncio.gather(*workers)
+
+        self.stats["data_version"] = data_version
+        self.stats["analysis_seconds"] = round(loaded - started, 3)
+        self.stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return dict(self.stats)
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        return asyncio.run(self.arun(limit))
@@ -0,0 +1,443 @@
+"""
+오프라인 벤치마크
+
+OPENAI_API_KEY나 네트워크 없이 재현 가능한 성능 수치를 측정합니다.
+- FakeChatModel: 지연 시간을 설정할 수 있는 결정적 채팅 모델 (PerformanceReportSystem(llm=...)에 주입)
+- iter_synthetic_chunks: data.xlsx와 같은 스키마(ID, 품목, 함량, YYYY-MM...)의 합성 데이터를 청크 단위로 생성
+- 시나리오: 적재(ingest), 조회(query), 분석(analysis), 종단 간 요청(end_to_end, 요청/초)
+
+결과는 JSON으로 기록되므로 커밋 간 회귀를 비교할 수 있습니다.
+
+사용 예:
+    python benchmark.py --sizes 10k
+    python benchmark.py --sizes 10k,1m --latency-ms 300 --output bench_results/$(git rev-parse --short HEAD).json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+# 벤치마크는 네트워크 없이 실행되어야 하므로 .env 설정과 관계없이 LangSmith 추적을 끔
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+os.environ["LANGSMITH_TRACING"] = "false"
+
+import numpy as np
+import pandas as pd
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from analysis_engine import analyze_frame, analyze_matrix
+from data_processor import DataProcessor
+from db_pool import read_connection
+from prompt_compactor import estimate_tokens
+from query_builder import QueryBuilder, QueryFilter
+
+# 데이터 규모 프리셋 (거래처×품목 행 수)
+SIZE_PRESETS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+# 합성 데이터 기본값 (data.xlsx: 357행, 거래처 41곳, 결측 약 22%)
+DEFAULT_MONTHS = 12
+DEFAULT_START_MONTH = "2019-12"
+DEFAULT_NULL_RATIO = 0.22
+PRODUCTS_PER_CLIENT = 9
+PRODUCT_COUNT = 80
+STRENGTHS = ("정", "정 50mg", "캡슐 100mg", "캡슐 300mg", "정 800mg", "캡슐 30MG")
+REGIONS = ("강서구 화곡동", "강남구 역삼동", "마포구 합정동", "송파구 잠실동", "노원구 상계동",
+           "분당구 정자동", "해운대구 우동", "수성구 범어동", "유성구 봉명동", "남동구 구월동")
+# 합성 데이터 생성 청크 크기
+DEFAULT_CHUNK_ROWS = 50_000
+# 분석 시나리오에서 사용하는 최대 행렬 행 수 (메모리 제한)
+MAX_ANALYSIS_ROWS = 1_000_000
+# 가짜 모델 보고서 길이 (토큰 수)
+DEFAULT_REPORT_TOKENS = 300
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    결정적 가짜 채팅 모델.
+    분류/파싱 프롬프트에는 고정된 답을, 보고서 프롬프트에는 프롬프트 해시로 정해지는 보고서를 반환합니다.
+    latency_ms는 첫 토큰까지의 지연, token_latency_ms는 스트리밍 시 토큰 간 지연입니다.
+    """
+
+    model_name: str = "fake-chat-model"
+    latency_ms: float = 0.0
+    token_latency_ms: float = 0.0
+    report_tokens: int = DEFAULT_REPORT_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if "작업 타입을 분류" in prompt:
+            return "PerformanceReport"
+        if "클라이언트, 제품, 또는 지역" in prompt:
+            return "전체"
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        words = ("매출", "증가", "감소", "추세", "거래처", "품목", "전월", "대비", "권장", "분석")
+        body = " ".join(words[(seed + i * 7) % len(words)] for i in range(self.report_tokens))
+        return f"## 요약\n{body}"
+
+    def _usage(self, messages, text: str) -> Dict[str, int]:
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        completion_tokens = estimate_tokens(text)
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    @staticmethod
+    def _pieces(text: str) -> List[str]:
+        words = text.split(" ")
+        return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        text = self._respond(messages)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        text = self._respond(messages)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000)
+        text = self._respond(messages)
+        for piece in self._pieces(text):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+            time.sleep(self.token_latency_ms / 1000)
+        # 마지막 청크에 토큰 사용량 포함 (stream_usage=True인 ChatOpenAI와 같은 형태)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        text = self._respond(messages)
+        for piece in self._pieces(text):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+            await asyncio.sleep(self.token_latency_ms / 1000)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+
+# ----- 합성 데이터 -----
+
+def synthetic_months(count: int = DEFAULT_MONTHS, start: str = DEFAULT_START_MONTH) -> List[str]:
+    year, month = int(start[:4]), int(start[5:7])
+    index = year * 12 + month - 1
+    return [f"{(index + i) // 12}-{(index + i) % 12 + 1:02d}" for i in range(count)]
+
+
+def synthetic_client(client: int) -> str:
+    return f"합성의원{client:07d}({REGIONS[client % len(REGIONS)]})"
+
+
+def synthetic_product(product: int) -> tuple:
+    """카탈로그 번호 -> (품목, 함량)."""
+    name = f"합성품{product % PRODUCT_COUNT:03d}"
+    return name, f"{name}{STRENGTHS[product // PRODUCT_COUNT % len(STRENGTHS)]}"
+
+
+def iter_synthetic_chunks(rows: int, months: int = DEFAULT_MONTHS, start_month: str = DEFAULT_START_MONTH,
+                          chunk_rows: int = DEFAULT_CHUNK_ROWS, null_ratio: float = DEFAULT_NULL_RATIO,
+                          seed: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    data.xlsx와 같은 스키마의 합성 데이터를 청크 단위로 생성합니다 (같은 인자면 같은 데이터).
+    거래처마다 PRODUCTS_PER_CLIENT개의 서로 다른 (품목, 함량) 라인을 가지며,
+    값은 로그정규 기준값 × 월별 추세 × 잡음이고 null_ratio 비율로 결측입니다.
+    """
+    month_columns = synthetic_months(months, start_month)
+    catalog = PRODUCT_COUNT * len(STRENGTHS)
+    products = [synthetic_product(p) for p in range(catalog)]
+    trend = 1.0 + 0.02 * np.arange(months)
+
+    for start in range(0, rows, chunk_rows):
+        stop = min(start + chunk_rows, rows)
+        rng = np.random.default_rng([seed, start])
+        index = np.arange(start, stop)
+        clients = index // PRODUCTS_PER_CLIENT
+        # 거래처 안의 라인 j는 j * 13 < 카탈로그 크기이므로 (품목, 함량)이 겹치지 않음
+        product_ids = (clients * 7 + (index % PRODUCTS_PER_CLIENT) * 13) % catalog
+
+        base = rng.lognormal(mean=11.5, sigma=1.0, size=(len(index), 1))
+        values = np.round(base * trend * rng.uniform(0.7, 1.3, size=(len(index), months)))
+        values[rng.random(values.shape) < null_ratio] = np.nan
+
+        chunk = pd.DataFrame(values, columns=month_columns)
+        chunk.insert(0, "ID", [synthetic_client(c) for c in clients])
+        chunk.insert(1, "품목", [products[p][0] for p in product_ids])
+        chunk.insert(2, "함량", [products[p][1] for p in product_ids])
+        yield chunk
+
+
+# ----- 시나리오 -----
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "runs": int(len(samples)),
+        "mean_ms": float(samples.mean()) if len(samples) else 0.0,
+        "p50_ms": float(np.percentile(samples, 50)) if len(samples) else 0.0,
+        "p95_ms": float(np.percentile(samples, 95)) if len(samples) else 0.0,
+    }
+
+
+def bench_ingest(db_file: str, rows: int, chunk_rows: int = DEFAULT_CHUNK_ROWS, seed: int = 0,
+                 columnar: bool = False) -> Dict[str, Any]:
+    """합성 데이터를 청크 단위로 SQLite(long 스키마)에 적재하는 시간을 측정합니다 (생성 시간은 제외)."""
+    generate_seconds = 0.0
+
+    def timed_chunks():
+        nonlocal generate_seconds
+        chunks = iter_synthetic_chunks(rows, chunk_rows=chunk_rows, seed=seed)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            generate_seconds += time.perf_counter() - started
+            if chunk is None:
+                return
+            yield chunk
+
+    processor = DataProcessor(excel_file="", db_file=db_file, cache_dir=None, columnar=columnar)
+    started = time.perf_counter()
+    if not processor.create_sqlite_db_from_chunks(timed_chunks()):
+        raise RuntimeError("합성 데이터 적재에 실패했습니다.")
+    total = time.perf_counter() - started
+    seconds = total - generate_seconds
+    return {
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+        "generate_seconds": generate_seconds,
+        "db_bytes": os.path.getsize(db_file),
+    }
+
+
+def query_scenarios(rows: int) -> Dict[str, QueryFilter]:
+    """규모와 관계없이 같은 모양의 조회 시나리오 (합성 데이터에 존재하는 거래처/품목 사용)."""
+    client = synthetic_client(min(rows // PRODUCTS_PER_CLIENT, 17) // 2)
+    product = synthetic_product(3)[0]
+    months = synthetic_months()
+    return {
+        "all_monthly": QueryFilter(entity="전체", aggregation="monthly"),
+        "client_monthly": QueryFilter(entity=client, aggregation="monthly"),
+        "product_monthly": QueryFilter(entity=product, aggregation="monthly"),
+        "product_monthly_range": QueryFilter(entity=product, months=(months[3], months[8]), aggregation="monthly"),
+        "top10_clients": QueryFilter(entity="전체", aggregation="client", top_n=10),
+        "client_rows": QueryFilter(entity=client, aggregation="rows"),
+    }
+
+
+def bench_query(db_file: str, rows: int, repeat: int = 20) -> Dict[str, Any]:
+    """QueryBuilder로 만든 SQL의 실행 시간을 시나리오별로 측정합니다."""
+    builder = QueryBuilder(db_file)
+    results: Dict[str, Any] = {}
+    for name, query_filter in query_scenarios(rows).items():
+        samples, result_rows, plan = [], 0, ""
+        for _ in range(repeat):
+            started = time.perf_counter()
+            sql, params, plan = builder.build_with_plan(query_filter)
+            with read_connection(db_file) as conn:
+                df = pd.read_sql(sql, conn, params=params or None)
+            samples.append((time.perf_counter() - started) * 1000)
+            result_rows = len(df)
+        results[name] = {"plan": plan, "result_rows": result_rows, **_percentiles(samples)}
+    return results
+
+
+def bench_analysis(db_file: str, rows: int, repeat: int = 5, seed: int = 0) -> Dict[str, Any]:
+    """조회 결과 분석(analyze_frame)과 (항목 × 월) 행렬 분석(analyze_matrix) 시간을 측정합니다."""
+    builder = QueryBuilder(db_file)
+    results: Dict[str, Any] = {}
+    for name, query_filter in query_scenarios(rows).items():
+        sql, params = builder.build(query_filter)
+        with read_connection(db_file) as conn:
+            df = pd.read_sql(sql, conn, params=params or None)
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            analyze_frame(df)
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = {"input_rows": len(df), **_percentiles(samples)}
+
+    matrix_rows = min(rows, MAX_ANALYSIS_ROWS)
+    chunks = list(iter_synthetic_chunks(matrix_rows, chunk_rows=matrix_rows, seed=seed))
+    frame = chunks[0]
+    months = synthetic_months()
+    values = frame[months].to_numpy(dtype=np.float64)
+    labels = tuple(frame["ID"])
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        analyze_matrix(values, months, labels)
+        samples.append((time.perf_counter() - started) * 1000)
+    results["matrix"] = {"input_rows": matrix_rows, **_percentiles(samples)}
+    return results
+
+
+def end_to_end_prompts(rows: int, requests: int) -> List[str]:
+    """서로 다른 분석 대상의 보고서 요청 (보고서 캐시를 피하도록 거래처를 바꿔 가며 생성)."""
+    clients = max(rows // PRODUCTS_PER_CLIENT, 1)
+    step = max(clients // max(requests, 1), 1)
+    prompts = ["전체 매출 현황 보고서를 만들어주세요"]
+    for i in range(1, requests):
+        prompts.append(f"{synthetic_client((i * step) % clients)}의 실적 보고서를 만들어주세요")
+    return prompts[:requests]
+
+
+async def _run_requests(system, prompts: List[str], concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(prompt):
+        async with semaphore:
+            started = time.perf_counter()
+            await system.arun(prompt)
+            return (time.perf_counter() - started) * 1000
+
+    return await asyncio.gather(*(one(prompt) for prompt in prompts))
+
+
+def bench_end_to_end(db_file: str, rows: int, requests: int = 20, concurrency: int = 4,
+                     latency_ms: float = 0.0, token_latency_ms: float = 0.0) -> Dict[str, Any]:
+    """
+    가짜 LLM으로 전체 그래프를 실행해 요청/초를 측정합니다.
+    cold: 보고서 캐시가 빈 상태의 요청, warm: 같은 요청 반복 (보고서 캐시 적중).
+    """
+    from langgraph_system import PerformanceReportSystem
+
+    llm = FakeChatModel(latency_ms=latency_ms, token_latency_ms=token_latency_ms)
+    system = PerformanceReportSystem(db_file, llm=llm)
+    prompts = end_to_end_prompts(rows, requests)
+    results: Dict[str, Any] = {"requests": len(prompts), "concurrency": concurrency,
+                               "latency_ms": latency_ms, "token_latency_ms": token_latency_ms}
+    try:
+        for phase in ("cold", "warm"):
+            started = time.perf_counter()
+            samples = asyncio.run(_run_requests(system, prompts, concurrency))
+            elapsed = time.perf_counter() - started
+            results[phase] = {"requests_per_sec": len(prompts) / elapsed if elapsed > 0 else 0.0,
+                              **_percentiles(samples)}
+        results["nodes"] = system.get_node_metrics()
+    finally:
+        system.chart_renderer.shutdown()
+    return results
+
+
+# ----- 실행 -----
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes: List[str], workdir: str, scenarios: List[str], requests: int = 20,
+                  concurrency: int = 4, latency_ms: float = 0.0, token_latency_ms: float = 0.0,
+                  repeat: int = 20, seed: int = 0, columnar: bool = False) -> Dict[str, Any]:
+    """규모별로 시나리오를 실행하고 결과 딕셔너리를 반환합니다."""
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "seed": seed,
+            "columnar": columnar,
+        },
+        "results": {},
+    }
+    # 차트 캐시 등 실행 중 생성 파일은 작업 디렉터리에 기록
+    os.environ["CHART_CACHE_DIR"] = os.path.join(workdir, ".chart_cache")
+    os.environ["GRAPH_CHECKPOINT_FILE"] = os.path.join(workdir, "graph_checkpoints.db")
+
+    for size in sizes:
+        rows = SIZE_PRESETS.get(size.lower()) or int(size)
+        db_file = os.path.join(workdir, f"bench_{rows}.db")
+        print(f"\n📏 규모 {size} ({rows:,}행)")
+        result: Dict[str, Any] = {"rows": rows}
+
+        started = time.perf_counter()
+        result["ingest"] = bench_ingest(db_file, rows, seed=seed, columnar=columnar)
+        print(f"  적재: {result['ingest']['seconds']:.2f}초 ({result['ingest']['rows_per_sec']:,.0f}행/초)")
+        if "query" in scenarios:
+            result["query"] = bench_query(db_file, rows, repeat)
+            print("  조회: " + ", ".join(f"{k} {v['p50_ms']:.1f}ms" for k, v in result["query"].items()))
+        if "analysis" in scenarios:
+            result["analysis"] = bench_analysis(db_file, rows, max(repeat // 4, 1), seed)
+            print("  분석: " + ", ".join(f"{k} {v['p50_ms']:.1f}ms" for k, v in result["analysis"].items()))
+        if "end_to_end" in scenarios:
+            result["end_to_end"] = bench_end_to_end(db_file, rows, requests, concurrency,
+                                                   latency_ms, token_latency_ms)
+            cold, warm = result["end_to_end"]["cold"], result["end_to_end"]["warm"]
+            print(f"  종단 간: cold {cold['requests_per_sec']:.1f}req/s (p95 {cold['p95_ms']:.0f}ms), "
+                  f"warm {warm['requests_per_sec']:.1f}req/s")
+        result["total_seconds"] = time.perf_counter() - started
+        report["results"][size] = result
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='오프라인 성능 벤치마크 (가짜 LLM + 합성 데이터)')
+    parser.add_argument('--sizes', default='10k',
+                        help=f'쉼표로 구분한 데이터 규모: {", ".join(SIZE_PRESETS)} 또는 행 수 (default: 10k)')
+    parser.add_argument('--scenarios', default='query,analysis,end_to_end',
+                        help='적재 이후 실행할 시나리오 (default: query,analysis,end_to_end)')
+    parser.add_argument('--requests', type=int, default=20, help='종단 간 요청 수 (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=4, help='동시 요청 수 (default: 4)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='가짜 LLM 응답 지연 (default: 0)')
+    parser.add_argument('--token-latency-ms', type=float, default=0.0, help='가짜 LLM 토큰 간 지연 (default: 0)')
+    parser.add_argument('--repeat', type=int, default=20, help='조회 반복 횟수 (default: 20)')
+    parser.add_argument('--seed', type=int, default=0, help='합성 데이터 시드 (default: 0)')
+    parser.add_argument('--columnar', action='store_true', help='컬럼형 저장소도 생성해 조회에 사용')
+    parser.add_argument('--workdir', help='DB 등 작업 파일 위치 (기본: 임시 디렉터리, 끝나면 삭제)')
+    parser.add_argument('--output', default='benchmark_results.json', help='결과 JSON 경로')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        report = run_benchmark(
+            sizes=[size.strip() for size in args.sizes.split(",") if size.strip()],
+            workdir=workdir,
+            scenarios=[name.strip() for name in args.scenarios.split(",")],
+            requests=args.requests,
+            concurrency=args.concurrency,
+            latency_ms=args.latency_ms,
+            token_latency_ms=args.token_latency_ms,
+            repeat=args.repeat,
+            seed=args.seed,
+            columnar=args.columnar,
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
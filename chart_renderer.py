@@ -0,0 +1,210 @@
+"""
+콘텐츠 주소 기반 차트 렌더러
+
+차트는 그려지는 시계열(제목, 월, 값)의 해시를 이름으로 캐시 디렉터리에 저장합니다.
+- 같은 데이터의 차트는 다시 그리지 않고 기존 파일을 재사용합니다.
+- 웹 UI용 Plotly JSON은 요청 경로에서 바로 기록합니다 (래스터화 없음, 수 KB).
+- PNG 래스터화는 백그라운드 워커 풀에서 수행하므로 보고서가 차트를 기다리지 않습니다.
+  같은 키의 렌더링이 진행 중이면 새로 제출하지 않고 기존 작업을 공유합니다.
+- 렌더링 후 오래된 파일(max_age_seconds)과 개수 초과분(max_files, 오래된 순)을 삭제합니다.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+# matplotlib은 임포트 비용이 커서 PNG를 처음 렌더링할 때 워커 스레드에서 임포트
+
+# 차트 캐시 디렉터리
+DEFAULT_CHART_DIR = ".chart_cache"
+# 캐시에 유지하는 최대 차트 수 (PNG/JSON 한 쌍을 1개로 셈)
+DEFAULT_MAX_CHARTS = 200
+# 차트 파일 최대 보관 기간 (초)
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+# PNG 렌더링 워커 수
+DEFAULT_MAX_WORKERS = 2
+# PNG 해상도 (화면 표시용으로 충분한 값)
+DEFAULT_DPI = 120
+# 차트 스타일을 바꾸면 올려서 이전 캐시 파일을 무효화
+CHART_STYLE_VERSION = 1
+
+
+def chart_key(title: str, months: Sequence[str], values: Sequence[float]) -> str:
+    """차트 내용(스타일 버전, 제목, 월, 값)의 SHA-256 해시 앞 32자리."""
+    payload = json.dumps(
+        [CHART_STYLE_VERSION, title, list(months), [float(v) for v in values]],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class ChartHandle:
+    """제출된 차트 (PNG는 future가 끝난 뒤에 존재)"""
+    key: str
+    png_path: str
+    json_path: str
+    future: Optional[Future] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.future is None or self.future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[str]:
+        """PNG 렌더링을 기다려 경로를 반환합니다 (실패하면 None)."""
+        if self.future is not None and not self.future.result(timeout):
+            return None
+        return self.png_path if os.path.exists(self.png_path) else None
+
+
+class ChartRenderer:
+    """월별 추이 차트 렌더러 (캐시 + 백그라운드 PNG 렌더링)"""
+
+    def __init__(self, chart_dir: str = DEFAULT_CHART_DIR, max_charts: int = DEFAULT_MAX_CHARTS,
+                 max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+                 max_workers: int = DEFAULT_MAX_WORKERS, dpi: int = DEFAULT_DPI):
+        self.chart_dir = chart_dir
+        self.max_charts = max_charts
+        self.max_age_seconds = max_age_seconds
+        self.dpi = dpi
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chart")
+        self._lock = threading.Lock()
+        # key -> 진행 중인 PNG 렌더링
+        self._pending: Dict[str, Future] = {}
+        self.hits = 0
+        self.renders = 0
+
+    def paths(self, key: str):
+        base = os.path.join(self.chart_dir, key)
+        return f"{base}.png", f"{base}.json"
+
+    def submit(self, title: str, months: Sequence[str], values: Sequence[float]) -> ChartHandle:
+        """
+        차트를 제출하고 바로 반환합니다.
+        Plotly JSON은 즉시 기록하고, PNG는 캐시에 없을 때만 백그라운드에서 렌더링합니다.
+        """
+        months = [str(m) for m in months]
+        values = [float(v) for v in values]
+        key = chart_key(title, months, values)
+        png_path, json_path = self.paths(key)
+        os.makedirs(self.chart_dir, exist_ok=True)
+
+        if not os.path.exists(json_path):
+            _atomic_write(json_path, plotly_json(title, months, values).encode("utf-8"))
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None and os.path.exists(png_path):
+                # 캐시 적중: mtime을 갱신해 최근 사용으로 표시 (개수 초과 시 오래된 것부터 삭제)
+                self.hits += 1
+                for path in (png_path, json_path):
+                    os.utime(path)
+                return ChartHandle(key, png_path, json_path)
+            if future is None:
+                self.renders += 1
+                future = self._executor.submit(self._render_png, key, title, months, values)
+                self._pending[key] = future
+        return ChartHandle(key, png_path, json_path, future)
+
+    def _render_png(self, key: str, title: str, months, values) -> bool:
+        png_path, _ = self.paths(key)
+        try:
+            import matplotlib
+            matplotlib.use("Agg")  # 차트는 파일로만 저장하며 워커 스레드에서 렌더링됨
+            from matplotlib.figure import Figure
+
+            # pyplot 전역 상태 대신 Figure 객체를 사용 (워커 스레드에서 안전)
+            fig = Figure(figsize=(12, 6))
+            ax = fig.subplots()
+            ax.plot(months, values, marker='o', linewidth=2, markersize=6)
+            ax.set_title(title, fontsize=16, fontweight='bold')
+            ax.set_xlabel('월', fontsize=12)
+            ax.set_ylabel('매출액', fontsize=12)
+            ax.tick_params(axis='x', labelrotation=45)
+            ax.grid(True, alpha=0.3)
+            fig.tight_layout()
+
+            tmp_path = f"{png_path}.{threading.get_ident()}.tmp"
+            fig.savefig(tmp_path, dpi=self.dpi, bbox_inches='tight', format="png")
+            os.replace(tmp_path, png_path)
+            return True
+        except Exception as e:
+            print(f"차트 생성 오류: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            self.evict()
+
+    def evict(self):
+        """보관 기간이 지난 파일과 개수 초과분(오래된 순)을 삭제합니다."""
+        try:
+            names = os.listdir(self.chart_dir)
+        except OSError:
+            return
+        with self._lock:
+            pending = set(self._pending)
+        now = time.time()
+        charts: Dict[str, float] = {}
+        for name in names:
+            key, ext = os.path.splitext(name)
+            if ext not in (".png", ".json") or key in pending:
+                continue
+            try:
+                mtime = os.path.getmtime(os.path.join(self.chart_dir, name))
+            except OSError:
+                continue
+            charts[key] = max(charts.get(key, 0.0), mtime)
+
+        expired = {key for key, mtime in charts.items() if now - mtime > self.max_age_seconds}
+        remaining = sorted((mtime, key) for key, mtime in charts.items() if key not in expired)
+        overflow = len(remaining) - self.max_charts
+        if overflow > 0:
+            expired.update(key for _, key in remaining[:overflow])
+
+        for key in expired:
+            for path in self.paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "renders": self.renders, "pending": len(self._pending)}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def plotly_json(title: str, months, values) -> str:
+    """Plotly figure JSON (plotly.io.from_json으로 읽을 수 있는 형식, plotly 임포트 없이 생성)."""
+    return json.dumps({
+        "data": [{"type": "scatter", "mode": "lines+markers", "x": list(months), "y": list(values)}],
+        "layout": {
+            "title": {"text": title},
+            "xaxis": {"title": {"text": "월"}},
+            "yaxis": {"title": {"text": "매출액"}},
+        },
+    }, ensure_ascii=False)
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_plotly_json(path: str):
+    """저장된 Plotly JSON을 Figure로 읽습니다 (없으면 None)."""
+    if not path or not os.path.exists(path):
+        return None
+    import plotly.io as pio
+    with open(path, encoding="utf-8") as f:
+        return pio.from_json(f.read())
@@ -0,0 +1,143 @@
+"""
+LangGraph 체크포인트 저장소 (SQLite)
+
+그래프는 노드가 끝날 때마다 상태를 체크포인트로 저장합니다. 같은 thread_id로 다시 실행하면
+- 실패한 요청(예: generate_report 시간 초과)은 마지막으로 완료된 노드 다음부터 이어서 실행하고
+- 사람의 검토가 필요한 보고서는 human_review 앞에서 멈췄다가 검토 결과를 받아 이어서 실행합니다.
+
+조회 결과 DataFrame은 그래프 상태에 넣지 않습니다. query_database가 결과를 프로세스 내 FrameStore에 넣고
+상태에는 참조(FrameRef: 키, 행 수)만 담으므로 상태와 체크포인트의 크기는 조회 결과 크기와 무관합니다.
+키는 (SQL, 파라미터, 데이터 버전)에서 만들어 동시에 들어온 같은 조회는 DataFrame 하나를 공유합니다.
+프로세스가 다시 시작되었거나 LRU에서 제거되어 참조를 찾을 수 없으면 그래프는 저장된 SQL로 다시 조회합니다.
+
+langgraph-checkpoint-sqlite가 설치되어 있지 않으면 메모리 체크포인트를 사용합니다 (프로세스 내에서만 이어서 실행).
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+
+import pandas as pd
+from langgraph.checkpoint.memory import InMemorySaver
+
+# 체크포인트 SQLite 파일 기본 경로
+DEFAULT_CHECKPOINT_FILE = "graph_checkpoints.db"
+# FrameStore에 유지하는 최대 DataFrame 수 (오래 사용하지 않은 것부터 제거)
+DEFAULT_MAX_FRAMES = 32
+
+
+@dataclass(frozen=True)
+class FrameRef:
+    """FrameStore에 저장된 조회 결과 참조 (그래프 상태/체크포인트에는 이 값만 기록)"""
+    key: str
+    rows: int
+
+
+def frame_key(*parts: Any) -> str:
+    """조회를 식별하는 값들(SQL, 파라미터, 데이터 버전)의 SHA-256 해시."""
+    payload = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FrameStore:
+    """프로세스 내 조회 결과 저장소 (LRU)"""
+
+    def __init__(self, max_frames: int = DEFAULT_MAX_FRAMES):
+        self.max_frames = max_frames
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, df: pd.DataFrame) -> FrameRef:
+        """결과를 저장하고 참조를 반환합니다. 같은 키가 이미 있으면 기존 DataFrame을 공유합니다."""
+        with self._lock:
+            existing = self._frames.get(key)
+            if existing is not None:
+                self._frames.move_to_end(key)
+                return FrameRef(key, len(existing))
+            self._frames[key] = df
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+            return FrameRef(key, len(df))
+
+    def get(self, ref: FrameRef) -> Optional[pd.DataFrame]:
+        with self._lock:
+            df = self._frames.get(ref.key)
+            if df is not None:
+                self._frames.move_to_end(ref.key)
+            return df
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames)
+
+
+def is_sqlite_available() -> bool:
+    return importlib.util.find_spec("langgraph.checkpoint.sqlite") is not None
+
+
+def open_checkpointer(path: Optional[str] = DEFAULT_CHECKPOINT_FILE):
+    """
+    체크포인트 저장소를 만듭니다. path가 None이거나 SQLite 체크포인트 패키지가 없으면 메모리 저장소를 사용합니다.
+    동기(invoke/stream)와 비동기(ainvoke/astream) 실행이 같은 저장소를 사용합니다.
+    """
+    if path is None:
+        return InMemorySaver()
+    if not is_sqlite_available():
+        print("체크포인트를 메모리에 저장합니다: langgraph-checkpoint-sqlite가 설치되어 있지 않습니다.")
+        return InMemorySaver()
+
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    class ThreadedSqliteSaver(SqliteSaver):
+        """
+        SqliteSaver의 비동기 메서드를 워커 스레드에서 실행합니다.
+        AsyncSqliteSaver는 이벤트 루프에 묶이므로 스레드와 여러 이벤트 루프가 한 저장소를 공유하도록 이 방식을 사용합니다.
+        """
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator:
+            items = await asyncio.to_thread(
+                lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return ThreadedSqliteSaver(conn)
+
+
+def prune_thread(saver, thread_id: str):
+    """스레드의 최신 체크포인트만 남기고 이전 체크포인트와 쓰기 기록을 삭제합니다 (SQLite 저장소)."""
+    conn = getattr(saver, "conn", None)
+    if conn is None:
+        return
+    with saver.lock:
+        conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < "
+            "(SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '')",
+            (thread_id, thread_id)
+        )
+        conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_id NOT IN "
+            "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ?)",
+            (thread_id, thread_id)
+        )
+        conn.commit()
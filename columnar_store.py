@@ -0,0 +1,323 @@
+"""
+Parquet 기반 컬럼형 분석 저장소 (선택 기능)
+
+DataProcessor가 SQLite(long 스키마)를 만든 뒤 같은 데이터를 Parquet으로 내보내면,
+query_database는 월별/품목×월/그룹 집계를 SQLite 대신 이 저장소에서 계산합니다.
+
+- items.parquet: 품목 라인 (item_id, client, product, strength)
+- facts.parquet: 월 단위 팩트 (month, item_id, client, product, strength, amount), 월 순으로 정렬
+- 문자열 컬럼은 dictionary 인코딩, 필요한 컬럼만 읽고(column pruning) 월/품목 조건은 스캔 시 적용합니다.
+- DuckDB가 설치되어 있으면 DuckDB로, 없으면 pyarrow compute로 집계합니다.
+- 각 파일에 DB의 데이터 버전이 기록되며, DB와 버전이 다르면 사용하지 않습니다.
+"""
+
+import importlib.util
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+import pandas as pd
+
+# pyarrow/duckdb는 임포트 비용이 커서 처음 사용할 때 임포트 (_load_arrow, _duckdb_cursor)
+pa = pc = ds = pq = None
+
+# 데이터 버전을 기록하는 Parquet 스키마 메타데이터 키
+VERSION_KEY = b"data_version"
+# SQLite에서 내보낼 때 한 번에 가져오는 행 수
+EXPORT_BATCH_ROWS = 100_000
+
+
+def columnar_path_for(db_file: str) -> str:
+    """DB 파일에 대응하는 컬럼형 저장소 디렉터리 (sales_data.db -> sales_data.columnar)."""
+    return f"{os.path.splitext(db_file)[0]}.columnar"
+
+
+def is_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _load_arrow() -> bool:
+    """pyarrow를 임포트합니다. 설치되어 있지 않으면 False (컬럼형 저장소를 사용하지 않음)."""
+    global pa, pc, ds, pq
+    if pa is None and is_available():
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+        pc, ds, pq = pyarrow.compute, pyarrow.dataset, pyarrow.parquet
+        pa = pyarrow
+    return pa is not None
+
+
+def _schemas(version: str):
+    meta = {VERSION_KEY: version.encode("utf-8")}
+    text = pa.dictionary(pa.int32(), pa.string())
+    items = pa.schema([
+        ("item_id", pa.int64()), ("client", text), ("product", text), ("strength", text),
+    ], metadata=meta)
+    facts = pa.schema([
+        ("month", text), ("item_id", pa.int64()), ("client", text), ("product", text),
+        ("strength", text), ("amount", pa.float64()),
+    ], metadata=meta)
+    return items, facts
+
+
+def _export(conn: sqlite3.Connection, sql: str, schema, path: str, batch_rows: int) -> int:
+    """SQL 결과를 배치 단위로 Parquet에 기록합니다 (임시 파일에 쓴 뒤 교체)."""
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    cursor = conn.execute(sql)
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            while True:
+                batch = cursor.fetchmany(batch_rows)
+                if not batch:
+                    break
+                columns = list(zip(*batch))
+                arrays = [
+                    pa.array(values, type=field.type.value_type).dictionary_encode()
+                    if pa.types.is_dictionary(field.type) else pa.array(values, type=field.type)
+                    for values, field in zip(columns, schema)
+                ]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                rows += len(batch)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+def write_columnar_store(db_file: str, path: Optional[str] = None,
+                         batch_rows: int = EXPORT_BATCH_ROWS) -> bool:
+    """long 스키마 SQLite DB를 컬럼형 저장소로 내보냅니다. 성공하면 True."""
+    if not _load_arrow():
+        print("컬럼형 저장소 건너뜀: pyarrow가 설치되어 있지 않습니다.")
+        return False
+
+    path = path or columnar_path_for(db_file)
+    conn = sqlite3.connect(db_file)
+    try:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        if "sales_fact" not in names:
+            print("컬럼형 저장소 건너뜀: long 스키마 DB가 아닙니다.")
+            return False
+        cursor = conn.execute("SELECT * FROM metadata LIMIT 1")
+        meta = dict(zip([desc[0] for desc in cursor.description], cursor.fetchone()))
+        version = str(meta.get("updated_at") or meta.get("created_at"))
+
+        os.makedirs(path, exist_ok=True)
+        items_schema, facts_schema = _schemas(version)
+        # facts를 먼저 쓰고 items를 나중에 씀 (두 파일의 버전이 같을 때만 사용)
+        fact_rows = _export(conn, (
+            "SELECT f.month, i.item_id, c.name, p.product, p.strength, f.amount FROM sales_fact f "
+            "JOIN sales_item i ON i.client_id = f.client_id AND i.product_id = f.product_id "
+            "JOIN dim_client c ON c.client_id = f.client_id "
+            "JOIN dim_product p ON p.product_id = f.product_id "
+            "ORDER BY f.month, i.item_id"
+        ), facts_schema, os.path.join(path, "facts.parquet"), batch_rows)
+        _export(conn, (
+            "SELECT i.item_id, c.name, p.product, p.strength FROM sales_item i "
+            "JOIN dim_client c ON c.client_id = i.client_id "
+            "JOIN dim_product p ON p.product_id = i.product_id ORDER BY i.item_id"
+        ), items_schema, os.path.join(path, "items.parquet"), batch_rows)
+    except (sqlite3.Error, OSError, pa.ArrowException) as e:
+        print(f"컬럼형 저장소 생성 오류: {e}")
+        return False
+    finally:
+        conn.close()
+
+    print(f"컬럼형 저장소 생성 완료: {path} ({fact_rows}행)")
+    return True
+
+
+class ColumnarStore:
+    """컬럼형 저장소 조회기 (QueryBuilder의 monthly/client/product/strength 집계와 같은 결과 형태)"""
+
+    def __init__(self, path: str, engine: Optional[str] = None):
+        if engine not in (None, "duckdb", "pyarrow"):
+            raise ValueError(f"지원하지 않는 엔진입니다: {engine}")
+        self.path = path
+        self.items_file = os.path.join(path, "items.parquet")
+        self.facts_file = os.path.join(path, "facts.parquet")
+        self.engine = engine or ("duckdb" if importlib.util.find_spec("duckdb") is not None else "pyarrow")
+        self._lock = threading.Lock()
+        self._identity = None
+        self._version = None
+        self._items = None
+        self._duckdb = None
+
+    @classmethod
+    def for_db(cls, db_file: str, engine: Optional[str] = None) -> "ColumnarStore":
+        return cls(columnar_path_for(db_file), engine)
+
+    def available(self) -> bool:
+        return os.path.exists(self.items_file) and os.path.exists(self.facts_file) and _load_arrow()
+
+    def _refresh(self):
+        """파일이 바뀌었으면 버전과 품목 라인 테이블을 다시 읽습니다."""
+        identity = tuple(os.stat(f).st_mtime_ns for f in (self.items_file, self.facts_file))
+        with self._lock:
+            if identity == self._identity:
+                return
+            versions = {
+                pq.read_schema(f).metadata.get(VERSION_KEY) for f in (self.items_file, self.facts_file)
+            }
+            self._version = versions.pop().decode("utf-8") if len(versions) == 1 else None
+            self._items = None
+            self._identity = identity
+
+    def data_version(self) -> Optional[str]:
+        """저장소의 데이터 버전 (두 파일의 버전이 다르면 None)."""
+        if not self.available():
+            return None
+        self._refresh()
+        return self._version
+
+    def supports(self, query_filter) -> bool:
+        """이 저장소로 처리할 수 있는 필터인지 확인합니다 (행 조회, LIKE 와일드카드는 SQLite로)."""
+        if query_filter.aggregation == "rows":
+            return False
+        return not (query_filter.has_entity and any(ch in query_filter.entity for ch in "%_"))
+
+    def query(self, query_filter) -> pd.DataFrame:
+        """필터에 맞는 집계 결과를 DataFrame으로 반환합니다."""
+        if self.engine == "duckdb":
+            return self._query_duckdb(query_filter)
+        return self._query_pyarrow(query_filter)
+
+    # ----- pyarrow -----
+
+    def _item_table(self):
+        self._refresh()
+        with self._lock:
+            if self._items is None:
+                table = pq.read_table(self.items_file)
+                self._items = table.cast(pa.schema([
+                    (field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type)
+                    for field in table.schema
+                ]))
+            return self._items
+
+    def _query_pyarrow(self, query_filter) -> pd.DataFrame:
+        items = self._item_table()
+        expr = None
+        if query_filter.has_entity:
+            entity = query_filter.entity
+            mask = pc.or_(pc.or_(
+                pc.match_substring(items["client"], entity, ignore_case=True),
+                pc.match_substring(items["product"], entity, ignore_case=True)),
+                pc.match_substring(items["strength"], entity, ignore_case=True))
+            items = items.filter(mask)
+            expr = ds.field("item_id").isin(items["item_id"])
+        if query_filter.months is not None:
+            start, end = query_filter.months
+            month_expr = (ds.field("month") >= start) & (ds.field("month") <= end)
+            expr = month_expr if expr is None else expr & month_expr
+
+        aggregation = query_filter.aggregation
+        if aggregation == "product_monthly":
+            return self._product_monthly_pyarrow(items, expr)
+        key = "month" if aggregation == "monthly" else aggregation
+        facts = ds.dataset(self.facts_file).to_table(columns=[key, "amount"], filter=expr)
+        facts = facts.set_column(0, key, facts[key].cast(pa.string()))
+
+        if aggregation == "monthly":
+            facts = facts.append_column("sq", pc.multiply(facts["amount"], facts["amount"]))
+            result = facts.group_by("month").aggregate([
+                ("amount", "count"), ("amount", "sum"), ("amount", "mean"),
+                ("amount", "min"), ("amount", "max"), ("sq", "sum"),
+            ]).to_pandas()
+            result.columns = [col.replace("amount_", "") if col != "sq_sum" else "sumsq" for col in result.columns]
+            result = result[result["count"] > 0].sort_values("month").reset_index(drop=True)
+            result = result[["month", "count", "sum", "mean", "min", "max", "sumsq"]]
+            result["item_count"] = items.num_rows
+            return result
+
+        result = facts.group_by(key).aggregate([("amount", "sum")]).to_pandas()
+        result.columns = [aggregation, "total"]
+        result = result.sort_values("total", ascending=False, kind="stable").reset_index(drop=True)
+        if query_filter.top_n is not None:
+            result = result.head(int(query_filter.top_n))
+        return result
+
+    def _product_monthly_pyarrow(self, items, expr) -> pd.DataFrame:
+        """품목×월 집계: 대상 품목 라인의 품목별 개수에 월별 집계를 LEFT JOIN (SQLite 결과와 같은 형태)."""
+        item_counts = items.group_by("product").aggregate([("item_id", "count")]).to_pandas()
+        item_counts = item_counts.rename(columns={"item_id_count": "item_count"})
+        facts = ds.dataset(self.facts_file).to_table(columns=["product", "month", "amount"], filter=expr)
+        facts = facts.set_column(0, "product", facts["product"].cast(pa.string()))
+        facts = facts.set_column(1, "month", facts["month"].cast(pa.string()))
+        facts = facts.append_column("sq", pc.multiply(facts["amount"], facts["amount"]))
+        monthly = facts.group_by(["product", "month"]).aggregate([
+            ("amount", "count"), ("amount", "sum"), ("sq", "sum"), ("amount", "min"), ("amount", "max"),
+        ]).to_pandas()
+        monthly.columns = [col.replace("amount_", "") if col != "sq_sum" else "sumsq" for col in monthly.columns]
+        result = item_counts.merge(monthly, on="product", how="left")
+        result = result.sort_values(["product", "month"], kind="stable").reset_index(drop=True)
+        return result[["product", "month", "count", "sum", "sumsq", "min", "max", "item_count"]]
+
+    # ----- DuckDB -----
+
+    def _duckdb_cursor(self):
+        with self._lock:
+            if self._duckdb is None:
+                import duckdb
+                self._duckdb = duckdb.connect()
+            # 커서는 독립된 커넥션이므로 스레드마다 따로 사용
+            return self._duckdb.cursor()
+
+    def _query_duckdb(self, query_filter) -> pd.DataFrame:
+        def source(path):
+            return "read_parquet('{}')".format(path.replace("'", "''"))
+
+        conditions, params = [], []
+        item_where, item_params = "", []
+        if query_filter.has_entity:
+            pattern = f"%{query_filter.entity}%"
+            entity_condition = "(client ILIKE ? OR product ILIKE ? OR strength ILIKE ?)"
+            conditions.append(entity_condition)
+            params.extend([pattern] * 3)
+            item_where, item_params = f" WHERE {entity_condition}", [pattern] * 3
+        if query_filter.months is not None:
+            conditions.append("month BETWEEN ? AND ?")
+            params.extend(query_filter.months)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        aggregation = query_filter.aggregation
+        if aggregation == "product_monthly":
+            sql = (
+                "WITH item_counts AS (SELECT CAST(product AS VARCHAR) AS product, COUNT(*) AS item_count "
+                f"FROM {source(self.items_file)}{item_where} GROUP BY 1), "
+                "monthly AS (SELECT CAST(product AS VARCHAR) AS product, CAST(month AS VARCHAR) AS month, "
+                "COUNT(amount) AS count, SUM(amount) AS sum, SUM(amount * amount) AS sumsq, "
+                "MIN(amount) AS min, MAX(amount) AS max "
+                f"FROM {source(self.facts_file)}{where} GROUP BY 1, 2) "
+                "SELECT n.product, m.month, m.count, m.sum, m.sumsq, m.min, m.max, n.item_count "
+                "FROM item_counts n LEFT JOIN monthly m ON m.product = n.product ORDER BY n.product, m.month"
+            )
+            params = item_params + params
+        elif aggregation == "monthly":
+            sql = (
+                "SELECT CAST(month AS VARCHAR) AS month, COUNT(amount) AS count, SUM(amount) AS sum, "
+                "AVG(amount) AS mean, MIN(amount) AS min, MAX(amount) AS max, "
+                "SUM(amount * amount) AS sumsq, "
+                f"(SELECT COUNT(*) FROM {source(self.items_file)}{item_where}) AS item_count "
+                f"FROM {source(self.facts_file)}{where} GROUP BY month ORDER BY month"
+            )
+            params = item_params + params
+        else:
+            limit = " LIMIT ?" if query_filter.top_n is not None else ""
+            sql = (
+                f"SELECT CAST({aggregation} AS VARCHAR) AS {aggregation}, SUM(amount) AS total "
+                f"FROM {source(self.facts_file)}{where} GROUP BY {aggregation} ORDER BY total DESC{limit}"
+            )
+            if query_filter.top_n is not None:
+                params.append(int(query_filter.top_n))
+
+        cursor = self._duckdb_cursor()
+        try:
+            return cursor.execute(sql, params).df()
+        finally:
+            cursor.close()
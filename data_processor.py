@@ -1,30 +1,183 @@
 import pandas as pd
+import numpy as np
 import sqlite3
 import os
+import re
+import hashlib
 from datetime import datetime
 import json
 
+from columnar_store import columnar_path_for, write_columnar_store
+from db_pool import configure_writer, read_connection, remove_db_files, reset_pool
+from entity_resolver import write_entity_dictionary
+from excel_loader import DEFAULT_CACHE_DIR, DEFAULT_CHUNK_ROWS, StreamingExcelLoader
+
+# 원본 시트의 차원 컬럼 (거래처, 품목, 함량)
+DIMENSION_COLUMNS = ("ID", "품목", "함량")
+
+# 월 컬럼 형식 (YYYY-MM)
+MONTH_COLUMN_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+
+# long 스키마 DDL: 차원 테이블 + 월 단위 팩트 테이블
+LONG_SCHEMA_DDL = """
+CREATE TABLE dim_client (
+    client_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE dim_product (
+    product_id INTEGER PRIMARY KEY,
+    product TEXT NOT NULL,
+    strength TEXT NOT NULL,
+    UNIQUE (product, strength)
+);
+CREATE TABLE sales_item (
+    item_id INTEGER PRIMARY KEY,
+    client_id INTEGER NOT NULL REFERENCES dim_client(client_id),
+    product_id INTEGER NOT NULL REFERENCES dim_product(product_id),
+    row_hash INTEGER,
+    UNIQUE (client_id, product_id)
+);
+CREATE TABLE sales_fact (
+    client_id INTEGER NOT NULL REFERENCES dim_client(client_id),
+    product_id INTEGER NOT NULL REFERENCES dim_product(product_id),
+    month TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (client_id, product_id, month)
+) WITHOUT ROWID;
+CREATE INDEX idx_fact_client_month ON sales_fact (client_id, month);
+CREATE INDEX idx_fact_product_month ON sales_fact (product_id, month);
+CREATE INDEX idx_fact_month ON sales_fact (month);
+"""
+
+# 자주 묻는 집계(월별 합계, 거래처별/품목별 월 합계)를 미리 계산해 두는 롤업 테이블
+# (count, sum, sumsq, min, max)를 저장하여 평균/표준편차도 롤업만으로 계산합니다.
+ROLLUP_TABLES = ("rollup_month", "rollup_client_month", "rollup_product_month")
+ROLLUP_DDL = """
+CREATE TABLE IF NOT EXISTS rollup_client_month (
+    client_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    sumsq REAL NOT NULL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (client_id, month)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_product_month (
+    product_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    sumsq REAL NOT NULL,
+    min REAL,
+    max REAL,
+    PRIMARY KEY (product_id, month)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_month (
+    month TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    sumsq REAL NOT NULL,
+    min REAL,
+    max REAL
+);
+CREATE INDEX IF NOT EXISTS idx_item_product ON sales_item (product_id);
+"""
+
+ROLLUP_AGGREGATES = "COUNT(amount), SUM(amount), SUM(amount * amount), MIN(amount), MAX(amount)"
+
+# 거래처/품목/함량 부분 문자열 검색용 FTS5 trigram 인덱스 (rowid = sales_wide.item_id)
+SEARCH_TABLE = "sales_search"
+SEARCH_INDEX_DDL = f"""
+CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+    "ID", "품목", "함량",
+    tokenize = 'trigram'
+)
+"""
+
+
+# 증분 적재 시 metadata에 추가되는 컬럼
+INCREMENTAL_METADATA_COLUMNS = ("updated_at", "source_hash", "watermark")
+
+
+def get_month_columns(columns):
+    """컬럼 목록에서 YYYY-MM 형식의 월 컬럼만 골라 정렬해 반환합니다."""
+    return sorted(str(col) for col in columns if MONTH_COLUMN_PATTERN.match(str(col)))
+
+
+def compute_row_hashes(df):
+    """행 단위 내용 해시(int64)를 계산합니다. 변경된 품목 라인 탐지에 사용합니다."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64)
+
+
+def new_sheet_digest(columns):
+    """시트 해시 누적기를 만듭니다. 청크별 행 해시를 차례로 update하면 compute_sheet_hash와 같습니다."""
+    return hashlib.sha256("\x1f".join(map(str, columns)).encode("utf-8"))
+
+
+def compute_sheet_hash(df, row_hashes):
+    """시트 전체 내용 해시를 계산합니다. 같은 시트를 다시 적재하면 건너뜁니다."""
+    digest = new_sheet_digest(df.columns)
+    digest.update(np.ascontiguousarray(row_hashes).tobytes())
+    return digest.hexdigest()
+
+
+def sheet_content_columns(columns):
+    """시트 해시/행 해시 계산에 사용하는 컬럼 (차원 + 월)."""
+    return [col for col in DIMENSION_COLUMNS if col in columns] + get_month_columns(columns)
+
+
+def merge_duplicate_lines(df, months):
+    """
+    같은 (ID, 품목, 함량) 품목 라인이 여러 행이면 월별 금액을 합산해 한 행으로 만듭니다.
+    long 스키마는 품목 라인당 한 행만 저장하므로 합산하지 않으면 마지막 행만 남습니다.
+    중복이 없으면 원본 DataFrame을 그대로 반환하고, 있으면 중복된 키를 출력합니다.
+    """
+    dims = df[list(DIMENSION_COLUMNS)].fillna("").astype(str)
+    duplicated = dims.duplicated(keep=False)
+    if not duplicated.any():
+        return df
+    keys = list(dict.fromkeys(dims[duplicated].itertuples(index=False, name=None)))
+    shown = ", ".join("/".join(key) for key in keys[:5]) + (f" 외 {len(keys) - 5}개" if len(keys) > 5 else "")
+    print(f"⚠️ 중복 품목 라인 {len(keys)}개의 월별 금액을 합산합니다: {shown}")
+    merged = pd.concat([dims, df[months]], axis=1)
+    if not months:
+        return merged.drop_duplicates(list(DIMENSION_COLUMNS)).reset_index(drop=True)
+    # min_count=1: 모든 행이 결측인 월은 합계 0이 아니라 결측으로 유지
+    return merged.groupby(list(DIMENSION_COLUMNS), sort=False, as_index=False)[months].sum(min_count=1)
+
+
 class DataProcessor:
-    def __init__(self, excel_file="data.xlsx", db_file="sales_data.db"):
+    def __init__(self, excel_file="data.xlsx", db_file="sales_data.db", schema="long",
+                 cache_dir=DEFAULT_CACHE_DIR, columnar=False):
+        """
+        schema:
+            - "long": 차원 테이블 + 월 단위 팩트 테이블(sales_fact)로 정규화하고,
+              기존 컬럼 구조의 sales_data는 팩트 테이블 위의 뷰로 제공합니다.
+            - "wide": 시트를 그대로 sales_data 테이블에 저장합니다 (기존 방식).
+        cache_dir: Excel 사이드카 캐시 디렉터리 (None이면 캐시 사용 안 함)
+        columnar: True면 DB와 함께 Parquet 컬럼형 저장소를 만듭니다 (long 스키마, pyarrow 필요).
+            저장소가 이미 있으면 플래그와 관계없이 DB를 바꿀 때마다 다시 만들어 동기화합니다.
+        """
+        if schema not in ("long", "wide"):
+            raise ValueError(f"지원하지 않는 스키마입니다: {schema}")
         self.excel_file = excel_file
         self.db_file = db_file
+        self.schema = schema
+        self.cache_dir = cache_dir
+        self.columnar = columnar
+    
+    def excel_loader(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """스트리밍 Excel 로더를 반환합니다 (헤더의 datetime은 YYYY-MM 문자열로 변환)."""
+        return StreamingExcelLoader(
+            self.excel_file, chunk_rows=chunk_rows, cache_dir=self.cache_dir,
+            month_pattern=MONTH_COLUMN_PATTERN
+        )
         
     def load_excel_data(self):
-        """Excel 파일에서 데이터를 로드합니다."""
+        """Excel 파일에서 데이터를 로드합니다 (변경되지 않은 파일은 사이드카 캐시에서 로드)."""
         try:
-            # Excel 파일 읽기 (헤더가 있는 경우)
-            df = pd.read_excel(self.excel_file)
-            
-            # datetime 컬럼명을 문자열로 변환
-            new_columns = []
-            for col in df.columns:
-                if isinstance(col, datetime):
-                    # datetime을 YYYY-MM 형식의 문자열로 변환
-                    new_columns.append(col.strftime('%Y-%m'))
-                else:
-                    new_columns.append(str(col))
-            
-            df.columns = new_columns
+            df = self.excel_loader().load()
             print(f"Excel 파일 로드 완료: {df.shape[0]}행, {df.shape[1]}열")
             print(f"컬럼명: {list(df.columns)}")
             return df
@@ -50,34 +203,483 @@ class DataProcessor:
         return analysis
     
     def create_sqlite_db(self, df):
-        """SQLite 데이터베이스를 생성합니다."""
+        """
+        SQLite 데이터베이스를 생성합니다.
+        임시 파일에 만든 뒤 os.replace로 교체하므로 생성 중에도 기존 DB를 계속 읽을 수 있습니다.
+        성공하면 True를 반환합니다.
+        """
+        return self._create_from_chunks([df])
+    
+    def create_sqlite_db_streaming(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        Excel을 청크 단위로 읽으면서 바로 SQLite에 기록합니다.
+        시트 전체를 메모리에 올리지 않으므로 행 수와 관계없이 메모리 사용량이 청크 크기로 유지됩니다.
+        """
+        loader = self.excel_loader(chunk_rows)
+        if not self._create_from_chunks(loader.iter_chunks()):
+            return None
+        return loader.stats
+    
+    def create_sqlite_db_from_chunks(self, chunks):
+        """
+        DataFrame 청크(ID, 품목, 함량, YYYY-MM...)를 차례로 받아 데이터베이스를 만듭니다.
+        Excel 이외의 원본(합성 데이터 등)을 적재할 때 사용합니다.
+        """
+        return self._create_from_chunks(chunks)
+    
+    def _create_from_chunks(self, chunks):
+        tmp_file = f"{self.db_file}.tmp"
         try:
-            # 기존 DB 파일이 있으면 삭제
-            if os.path.exists(self.db_file):
-                os.remove(self.db_file)
+            remove_db_files(tmp_file)
             
             # SQLite 연결
-            conn = sqlite3.connect(self.db_file)
-            
-            # 데이터를 sales_data 테이블에 저장
-            df.to_sql('sales_data', conn, index=False, if_exists='replace')
+            conn = sqlite3.connect(tmp_file)
+            try:
+                self._write_database(conn, chunks)
+                # WAL 모드는 파일에 기록되어 교체 후에도 유지됨
+                configure_writer(conn)
+            finally:
+                conn.close()
             
-            # 메타데이터 테이블 생성
-            metadata = {
-                'created_at': datetime.now().isoformat(),
-                'total_records': len(df),
-                'columns': ', '.join(df.columns),
-                'source_file': self.excel_file
-            }
-            
-            metadata_df = pd.DataFrame([metadata])
-            metadata_df.to_sql('metadata', conn, index=False, if_exists='replace')
+            # 이전 DB의 WAL을 비운 뒤 원자적으로 교체하고 풀의 커넥션 정리
+            if not self._checkpoint_live_database():
+                remove_db_files(tmp_file)
+                print("데이터베이스 생성 오류: 진행 중인 읽기 요청 때문에 기존 DB의 WAL을 비우지 못했습니다. 잠시 후 다시 시도하세요.")
+                return False
+            os.replace(tmp_file, self.db_file)
+            reset_pool(self.db_file)
             
+        except Exception as e:
+            remove_db_files(tmp_file)
+            print(f"데이터베이스 생성 오류: {e}")
+            return False
+        
+        print(f"SQLite 데이터베이스 생성 완료: {self.db_file}")
+        self._sync_columnar_store()
+        return True
+    
+    def _checkpoint_live_database(self):
+        """
+        교체 전에 기존 DB의 WAL 내용을 DB 파일에 반영하고 WAL을 비웁니다.
+        -wal/-shm 파일은 삭제하지 않고 SQLite가 관리하도록 남깁니다 (다른 프로세스의 읽기 커넥션이 열고 있을 수 있음).
+        WAL이 비어 있으므로 교체 직후 새로 연 커넥션은 새 DB 파일만 읽습니다.
+        읽기 트랜잭션이 끝나기를 최대 30초 기다리며, 그래도 비우지 못하면 False를 반환합니다.
+        """
+        if not os.path.exists(self.db_file):
+            return True
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        try:
+            busy, wal_frames, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
             conn.close()
-            print(f"SQLite 데이터베이스 생성 완료: {self.db_file}")
+        # WAL 모드가 아닌 DB는 wal_frames가 -1
+        return busy == 0 and wal_frames <= 0
+    
+    def _write_database(self, conn, chunks):
+        """빈 DB에 테이블, 검색 인덱스, 엔티티 사전, 메타데이터를 청크 단위로 기록합니다."""
+        columns = None
+        months = []
+        digest = None
+        total_records = 0
+        # long 스키마 차원 키와 품목 라인 키 (청크 사이에서 공유, 등장 순서 유지)
+        client_ids, product_ids, item_keys = {}, {}, set()
+        
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.columns)
+                months = get_month_columns(columns)
+                digest = new_sheet_digest(sheet_content_columns(columns))
+                if self.schema == "long":
+                    missing = [col for col in DIMENSION_COLUMNS if col not in columns]
+                    if missing:
+                        raise ValueError(f"필수 컬럼이 없습니다: {missing}")
+                    conn.executescript(LONG_SCHEMA_DDL)
             
+            row_hashes = compute_row_hashes(chunk[sheet_content_columns(columns)])
+            digest.update(np.ascontiguousarray(row_hashes).tobytes())
+            if self.schema == "long":
+                self._write_long_chunk(conn, chunk, months, row_hashes, client_ids, product_ids, item_keys)
+            else:
+                # 데이터를 sales_data 테이블에 저장
+                chunk.to_sql('sales_data', conn, index=False, if_exists='append')
+            total_records += len(chunk)
+        
+        if columns is None:
+            raise ValueError("적재할 데이터가 없습니다.")
+        
+        if self.schema == "long":
+            with conn:
+                for sql in self._build_wide_view_sql(months):
+                    conn.execute(sql)
+                self._refresh_rollups(conn)
+            conn.execute("ANALYZE")
+        else:
+            conn.execute("CREATE VIEW sales_wide AS SELECT rowid AS item_id, * FROM sales_data")
+        
+        self._build_search_index(conn)
+        
+        # 로컬 엔티티 사전 (LLM 없이 거래처/품목/지역 추출)
+        with conn:
+            write_entity_dictionary(conn, conn.execute('SELECT "ID", "품목", "함량" FROM sales_wide').fetchall())
+        
+        # 메타데이터 테이블 생성
+        created_at = datetime.now().isoformat()
+        metadata = {
+            'created_at': created_at,
+            'total_records': total_records,
+            'columns': ', '.join(columns),
+            'source_file': self.excel_file,
+            'schema': self.schema,
+            'months': ', '.join(months),
+            'updated_at': created_at,
+            'source_hash': digest.hexdigest(),
+            'watermark': months[-1] if months else ''
+        }
+        
+        metadata_df = pd.DataFrame([metadata])
+        metadata_df.to_sql('metadata', conn, index=False, if_exists='replace')
+    
+    def update_sqlite_db(self, df):
+        """
+        증분 적재를 수행합니다 (long 스키마).
+        
+        - 시트 해시가 마지막 적재와 같으면 아무것도 하지 않습니다.
+        - 행 해시로 신규/변경된 품목 라인만 골라 (거래처, 품목, 월) 셀 단위로 upsert 합니다.
+        - 시트에 없는 품목 라인과 월은 그대로 둡니다.
+        - 하나의 트랜잭션으로 처리하므로 WAL 모드의 읽기 요청은 커밋 전까지 이전 상태를 봅니다.
+        
+        증분 적재할 수 없는 경우(DB 없음, wide 스키마) 전체 재생성합니다.
+        
+        반환: 적재 통계 (재생성했으면 rebuilt=True), 실패(롤백, 재생성 실패)하면 None
+        """
+        if self.schema != "long" or not self._has_long_schema():
+            print("증분 적재를 사용할 수 없어 데이터베이스를 새로 생성합니다.")
+            if not self.create_sqlite_db(df):
+                return None
+            return {"rebuilt": True, "skipped": False}
+        
+        missing = [col for col in DIMENSION_COLUMNS if col not in df.columns]
+        if missing:
+            print(f"증분 적재 오류: 필수 컬럼이 없습니다: {missing}")
+            return None
+        
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        try:
+            configure_writer(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            stats = self._apply_incremental(conn, df)
+            conn.execute("COMMIT")
         except Exception as e:
-            print(f"데이터베이스 생성 오류: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"증분 적재 오류: {e}")
+            return None
+        finally:
+            conn.close()
+        
+        if stats["skipped"]:
+            print("변경된 데이터가 없어 증분 적재를 건너뜁니다.")
+        else:
+            self._sync_columnar_store()
+            print(
+                f"증분 적재 완료: 신규 라인 {stats['new_items']}개, 변경 라인 {stats['changed_items']}개, "
+                f"변경 셀 {stats['changed_cells']}개, 신규 월 {stats['new_months']}, 워터마크 {stats['watermark']}"
+            )
+        return stats
+    
+    def _sync_columnar_store(self):
+        """
+        컬럼형 저장소를 DB와 같은 버전으로 다시 만듭니다.
+        DB는 이미 반영된 뒤이므로 실패해도 오류만 출력합니다 (버전이 다른 저장소는 조회에 사용되지 않음).
+        """
+        if self.schema == "long" and (self.columnar or os.path.exists(columnar_path_for(self.db_file))):
+            try:
+                write_columnar_store(self.db_file)
+            except Exception as e:
+                print(f"컬럼형 저장소 동기화 오류 (DB는 반영됨, SQLite로 조회합니다): {e}")
+    
+    def _has_long_schema(self):
+        if not os.path.exists(self.db_file):
+            return False
+        try:
+            with read_connection(self.db_file) as conn:
+                names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        except (sqlite3.Error, OSError):
+            return False
+        return {"sales_fact", "sales_item", "metadata"} <= names
+    
+    def _apply_incremental(self, conn, df):
+        """update_sqlite_db의 트랜잭션 본문입니다."""
+        months = get_month_columns(df.columns)
+        content = df[sheet_content_columns(df.columns)]
+        row_hashes = compute_row_hashes(content)
+        sheet_hash = compute_sheet_hash(content, row_hashes)
+        
+        # 증분 적재용 메타데이터 컬럼 보장 (이전 버전 DB 호환)
+        meta_columns = {row[1] for row in conn.execute("PRAGMA table_info(metadata)")}
+        for column in INCREMENTAL_METADATA_COLUMNS:
+            if column not in meta_columns:
+                conn.execute(f"ALTER TABLE metadata ADD COLUMN {column} TEXT")
+        meta = conn.execute("SELECT months, source_hash, watermark FROM metadata LIMIT 1").fetchone()
+        old_months = [m.strip() for m in (meta[0] or "").split(",") if m.strip()]
+        
+        stats = {"rebuilt": False, "skipped": False, "new_items": 0, "changed_items": 0, "changed_cells": 0,
+                 "new_months": [], "watermark": meta[2]}
+        if meta[1] == sheet_hash:
+            stats["skipped"] = True
+            return stats
+        
+        # 중복 품목 라인은 합산 (전체 적재와 같은 행 해시)
+        merged = merge_duplicate_lines(df, months)
+        if merged is not df:
+            df = merged
+            row_hashes = compute_row_hashes(df[sheet_content_columns(df.columns)])
+        
+        client_col, product_col, strength_col = DIMENSION_COLUMNS
+        dims = df[list(DIMENSION_COLUMNS)].fillna("").astype(str)
+        
+        # 차원 upsert 후 키 조회
+        conn.executemany("INSERT OR IGNORE INTO dim_client (name) VALUES (?)",
+                         [(name,) for name in pd.unique(dims[client_col])])
+        conn.executemany("INSERT OR IGNORE INTO dim_product (product, strength) VALUES (?, ?)",
+                         list(dict.fromkeys(zip(dims[product_col], dims[strength_col]))))
+        client_ids = dict(conn.execute("SELECT name, client_id FROM dim_client"))
+        product_ids = {(p, st): i for i, p, st in conn.execute("SELECT product_id, product, strength FROM dim_product")}
+        
+        sheet = pd.DataFrame({
+            "client_id": dims[client_col].map(client_ids).to_numpy(),
+            "product_id": [product_ids[key] for key in zip(dims[product_col], dims[strength_col])],
+            "row_hash": row_hashes,
+        })
+        
+        # 품목 라인 upsert 후 기존 행 해시와 비교
+        existing = pd.DataFrame(
+            conn.execute("SELECT client_id, product_id, item_id, row_hash FROM sales_item").fetchall(),
+            columns=["client_id", "product_id", "item_id", "old_hash"]
+        )
+        merged = sheet.reset_index().merge(existing, on=["client_id", "product_id"], how="left")
+        new_rows = merged[merged["item_id"].isna()]
+        changed_rows = merged[merged["item_id"].notna() & (merged["old_hash"] != merged["row_hash"])]
+        
+        conn.executemany(
+            "INSERT OR IGNORE INTO sales_item (client_id, product_id, row_hash) VALUES (?, ?, ?)",
+            [(int(c), int(p), int(h)) for c, p, h in new_rows[["client_id", "product_id", "row_hash"]].itertuples(index=False)]
+        )
+        conn.executemany(
+            "UPDATE sales_item SET row_hash = ? WHERE item_id = ?",
+            [(int(h), int(i)) for h, i in changed_rows[["row_hash", "item_id"]].itertuples(index=False)]
+        )
+        stats["new_items"] = len(new_rows)
+        stats["changed_items"] = len(changed_rows)
+        
+        # 신규/변경 라인의 셀만 upsert (값이 같은 셀은 쓰지 않음), 비워진 셀은 삭제
+        touched = pd.concat([new_rows, changed_rows])
+        if months and not touched.empty:
+            cells = df.loc[touched["index"], months].copy()
+            cells["client_id"] = touched["client_id"].to_numpy()
+            cells["product_id"] = touched["product_id"].to_numpy()
+            cells = cells.melt(id_vars=["client_id", "product_id"], value_vars=months,
+                               var_name="month", value_name="amount")
+            present = cells.dropna(subset=["amount"])
+            removed = cells[cells["amount"].isna()]
+            
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO sales_fact (client_id, product_id, month, amount) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (client_id, product_id, month) DO UPDATE SET amount = excluded.amount "
+                "WHERE sales_fact.amount != excluded.amount",
+                zip(present["client_id"].astype(int).tolist(), present["product_id"].astype(int).tolist(),
+                    present["month"].tolist(), present["amount"].astype(float).tolist())
+            )
+            conn.executemany(
+                "DELETE FROM sales_fact WHERE client_id = ? AND product_id = ? AND month = ?",
+                zip(removed["client_id"].astype(int).tolist(), removed["product_id"].astype(int).tolist(),
+                    removed["month"].tolist())
+            )
+            stats["changed_cells"] = conn.total_changes - before
+        
+        # 변경된 거래처/품목의 롤업만 다시 계산 (롤업이 없던 DB는 전체 계산)
+        has_rollup = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name IN (?, ?, ?)", ROLLUP_TABLES
+        ).fetchone()[0] == len(ROLLUP_TABLES)
+        if not has_rollup:
+            self._refresh_rollups(conn)
+        elif not touched.empty:
+            self._refresh_rollups(conn, touched["client_id"].unique(), touched["product_id"].unique())
+        
+        # 신규 월이 있으면 wide 뷰 재생성
+        all_months = sorted(set(old_months) | set(months))
+        stats["new_months"] = [month for month in all_months if month not in old_months]
+        if stats["new_months"]:
+            conn.execute("DROP VIEW IF EXISTS sales_data")
+            conn.execute("DROP VIEW IF EXISTS sales_wide")
+            for sql in self._build_wide_view_sql(all_months):
+                conn.execute(sql)
+        
+        # 신규 라인은 검색 인덱스와 엔티티 사전에 반영
+        if not new_rows.empty:
+            has_search = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)
+            ).fetchone()
+            if has_search:
+                conn.execute(
+                    f'INSERT INTO {SEARCH_TABLE} (rowid, "ID", "품목", "함량") '
+                    f'SELECT item_id, "ID", "품목", "함량" FROM sales_wide '
+                    f'WHERE item_id NOT IN (SELECT rowid FROM {SEARCH_TABLE})'
+                )
+            write_entity_dictionary(conn, conn.execute(
+                "SELECT c.name, p.product, p.strength FROM sales_item i "
+                "JOIN dim_client c ON c.client_id = i.client_id "
+                "JOIN dim_product p ON p.product_id = i.product_id"
+            ).fetchall())
+        
+        # 워터마크 및 메타데이터 갱신 (updated_at이 데이터 버전이 되어 보고서 캐시 무효화)
+        stats["watermark"] = max([m for m in [meta[2], *months] if m] or [""])
+        conn.execute(
+            "UPDATE metadata SET updated_at = ?, total_records = (SELECT COUNT(*) FROM sales_item), "
+            "columns = ?, months = ?, source_file = ?, source_hash = ?, watermark = ?",
+            (datetime.now().isoformat(), ", ".join(list(DIMENSION_COLUMNS) + all_months),
+             ", ".join(all_months), self.excel_file, sheet_hash, stats["watermark"])
+        )
+        conn.execute("PRAGMA optimize")
+        return stats
+    
+    @staticmethod
+    def _refresh_rollups(conn, client_ids=None, product_ids=None):
+        """
+        롤업 테이블을 갱신합니다. client_ids/product_ids가 주어지면 해당 키의 행만 다시 계산하고
+        (증분 적재), 없으면 전체를 다시 계산합니다. 호출한 쪽의 트랜잭션 안에서 실행됩니다.
+        """
+        for statement in ROLLUP_DDL.strip().split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        
+        for table, key, ids in (("rollup_client_month", "client_id", client_ids),
+                                ("rollup_product_month", "product_id", product_ids)):
+            if ids is None:
+                conn.execute(f"DELETE FROM {table}")
+                conn.execute(
+                    f"INSERT INTO {table} SELECT {key}, month, {ROLLUP_AGGREGATES} "
+                    f"FROM sales_fact GROUP BY {key}, month"
+                )
+                continue
+            ids = [(int(i),) for i in ids]
+            conn.executemany(f"DELETE FROM {table} WHERE {key} = ?", ids)
+            conn.executemany(
+                f"INSERT INTO {table} SELECT {key}, month, {ROLLUP_AGGREGATES} "
+                f"FROM sales_fact WHERE {key} = ? GROUP BY {key}, month",
+                ids
+            )
+        
+        # 월별 합계는 거래처×월 롤업에서 다시 계산 (거래처 수 × 월 수)
+        conn.execute("DELETE FROM rollup_month")
+        conn.execute(
+            "INSERT INTO rollup_month SELECT month, SUM(count), SUM(sum), SUM(sumsq), MIN(min), MAX(max) "
+            "FROM rollup_client_month GROUP BY month"
+        )
+    
+    def _write_long_chunk(self, conn, df, months, row_hashes, client_ids, product_ids, item_keys):
+        """
+        청크 하나를 차원/팩트 테이블로 정규화하여 저장합니다. 새 차원 키는 client_ids/product_ids에,
+        품목 라인 키는 item_keys에 추가됩니다. 중복 품목 라인의 금액은 합산합니다 (청크 사이 중복 포함).
+        """
+        merged = merge_duplicate_lines(df, months)
+        if merged is not df:
+            df = merged
+            row_hashes = compute_row_hashes(df[sheet_content_columns(df.columns)])
+        client_col, product_col, strength_col = DIMENSION_COLUMNS
+        dims = df[list(DIMENSION_COLUMNS)].fillna("").astype(str)
+        
+        # 차원 키 부여 (등장 순서 유지)
+        new_clients = [name for name in pd.unique(dims[client_col]) if name not in client_ids]
+        for name in new_clients:
+            client_ids[name] = len(client_ids) + 1
+        new_products = [key for key in dict.fromkeys(zip(dims[product_col], dims[strength_col]))
+                        if key not in product_ids]
+        for key in new_products:
+            product_ids[key] = len(product_ids) + 1
+        
+        item_client = dims[client_col].map(client_ids).to_numpy()
+        item_product = [product_ids[key] for key in zip(dims[product_col], dims[strength_col])]
+        
+        # 이전 청크에 이미 있던 품목 라인 (팩트 upsert에서 금액 합산)
+        repeated = [(c, p) for c, p in zip(item_client.tolist(), item_product) if (c, p) in item_keys]
+        if repeated:
+            print(f"⚠️ 이전 청크와 중복된 품목 라인 {len(repeated)}개의 월별 금액을 합산합니다.")
+        item_keys.update(zip(item_client.tolist(), item_product))
+        
+        with conn:
+            conn.executemany(
+                "INSERT INTO dim_client (client_id, name) VALUES (?, ?)",
+                [(client_ids[name], name) for name in new_clients]
+            )
+            conn.executemany(
+                "INSERT INTO dim_product (product_id, product, strength) VALUES (?, ?, ?)",
+                [(product_ids[key], key[0], key[1]) for key in new_products]
+            )
+            # 원본 행 순서와 전 기간 결측 행을 보존하기 위한 품목 라인 테이블
+            conn.executemany(
+                "INSERT OR IGNORE INTO sales_item (client_id, product_id, row_hash) VALUES (?, ?, ?)",
+                [(int(c), int(p), int(h)) for c, p, h in zip(item_client, item_product, row_hashes)]
+            )
+            
+            # wide -> long 변환 (결측 셀은 저장하지 않음)
+            if months:
+                long_df = df[months].copy()
+                long_df["client_id"] = item_client
+                long_df["product_id"] = item_product
+                long_df = long_df.melt(
+                    id_vars=["client_id", "product_id"], value_vars=months,
+                    var_name="month", value_name="amount"
+                ).dropna(subset=["amount"])
+                conn.executemany(
+                    "INSERT INTO sales_fact (client_id, product_id, month, amount) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (client_id, product_id, month) DO UPDATE SET amount = amount + excluded.amount",
+                    zip(long_df["client_id"].astype(int).tolist(),
+                        long_df["product_id"].astype(int).tolist(),
+                        long_df["month"].tolist(),
+                        long_df["amount"].astype(float).tolist())
+                )
+    
+    @staticmethod
+    def _build_wide_view_sql(months):
+        """
+        기존 wide 컬럼 구조를 노출하는 뷰 DDL을 생성합니다.
+        sales_wide는 item_id를 포함하여 품목 라인 단위 필터가 뷰 안으로 전달되고,
+        sales_data는 item_id를 제외한 기존 컬럼만 보여줍니다.
+        """
+        month_exprs = [
+            "(SELECT f.amount FROM sales_fact f WHERE f.client_id = i.client_id "
+            "AND f.product_id = i.product_id AND f.month = '{0}') AS \"{1}\"".format(
+                month.replace("'", "''"), month.replace('"', '""'))
+            for month in months
+        ]
+        select_cols = ['i.item_id AS item_id', 'c.name AS "ID"', 'p.product AS "품목"', 'p.strength AS "함량"'] + month_exprs
+        data_cols = ['"{}"'.format(col.replace('"', '""')) for col in list(DIMENSION_COLUMNS) + list(months)]
+        # 집계 없이 월별 PK 조회로 구성하여 item_id 조건이 뷰 안으로 평탄화되도록 함
+        wide_view = f"""
+        CREATE VIEW sales_wide AS
+        SELECT {', '.join(select_cols)}
+        FROM sales_item i
+        JOIN dim_client c ON c.client_id = i.client_id
+        JOIN dim_product p ON p.product_id = i.product_id
+        ORDER BY i.item_id
+        """
+        data_view = f"CREATE VIEW sales_data AS SELECT {', '.join(data_cols)} FROM sales_wide"
+        return [wide_view, data_view]
+    
+    def _build_search_index(self, conn):
+        """거래처/품목/함량 검색용 FTS5 trigram 인덱스를 생성합니다."""
+        try:
+            with conn:
+                conn.execute(SEARCH_INDEX_DDL)
+                conn.execute(
+                    f'INSERT INTO {SEARCH_TABLE} (rowid, "ID", "품목", "함량") '
+                    'SELECT item_id, "ID", "품목", "함량" FROM sales_wide'
+                )
+        except sqlite3.OperationalError as e:
+            # FTS5/trigram 미지원 SQLite 빌드에서는 LIKE 검색으로 동작
+            print(f"검색 인덱스 생성 건너뜀 (FTS5 trigram 미지원): {e}")
     
     def get_sample_queries(self):
         """샘플 SQL 쿼리들을 반환합니다."""
@@ -87,23 +689,35 @@ class DataProcessor:
             "메타데이터": "SELECT * FROM metadata",
             "총_레코드_수": "SELECT COUNT(*) as total_count FROM sales_data"
         }
+        if self.schema == "long":
+            queries.update({
+                "월별_합계": "SELECT month, sum AS amount FROM rollup_month ORDER BY month",
+                "거래처별_월별_합계": (
+                    "SELECT c.name AS client, f.month, SUM(f.amount) AS amount "
+                    "FROM sales_fact f JOIN dim_client c ON c.client_id = f.client_id "
+                    "GROUP BY f.client_id, f.month"
+                ),
+                "품목별_월별_합계": (
+                    "SELECT p.product, f.month, SUM(f.amount) AS amount "
+                    "FROM sales_fact f JOIN dim_product p ON p.product_id = f.product_id "
+                    "GROUP BY p.product, f.month"
+                )
+            })
         return queries
     
     def test_database(self):
         """데이터베이스 연결 테스트를 수행합니다."""
         try:
-            conn = sqlite3.connect(self.db_file)
-            
-            # 테이블 목록 확인
-            tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)
-            print("데이터베이스 테이블:", tables['name'].tolist())
+            with read_connection(self.db_file) as conn:
+                # 테이블 목록 확인
+                tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)
+                print("데이터베이스 테이블:", tables['name'].tolist())
+                
+                # 샘플 데이터 확인
+                sample_data = pd.read_sql("SELECT * FROM sales_data LIMIT 5", conn)
+                print("\n샘플 데이터:")
+                print(sample_data)
             
-            # 샘플 데이터 확인
-            sample_data = pd.read_sql("SELECT * FROM sales_data LIMIT 5", conn)
-            print("\n샘플 데이터:")
-            print(sample_data)
-            
-            conn.close()
             return True
             
         except Exception as e:
@@ -0,0 +1,152 @@
+"""
+SQLite 읽기 전용 커넥션 풀
+
+요청마다 sqlite3.connect/close를 반복하지 않도록 DB 파일별로 읽기 전용
+커넥션을 재사용합니다. 커넥션은 체크아웃/반납 방식으로 한 번에 한 스레드만
+사용하므로 Streamlit 세션 스레드와 asyncio 워커 스레드에서 안전하게 공유됩니다.
+재사용되는 커넥션은 페이지 캐시와 prepared statement 캐시가 유지됩니다.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+# 커넥션별 페이지 캐시 (음수 = KiB 단위)
+DEFAULT_CACHE_SIZE_KIB = 64 * 1024
+# 메모리 매핑 I/O 크기
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+# 커넥션별 prepared statement 캐시 개수
+DEFAULT_CACHED_STATEMENTS = 256
+# 풀에 보관할 유휴 커넥션 최대 개수
+DEFAULT_MAX_IDLE = 8
+
+
+def configure_writer(conn: sqlite3.Connection):
+    """쓰기 커넥션에 WAL 모드를 설정합니다 (읽기 중에도 쓰기 가능, DB 파일에 유지됨)."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+
+def remove_db_files(db_file: str):
+    """DB 파일과 WAL 부속 파일(-wal, -shm)을 삭제합니다."""
+    for path in (db_file, f"{db_file}-wal", f"{db_file}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class ReadOnlyConnectionPool:
+    """DB 파일 하나에 대한 읽기 전용 커넥션 풀"""
+
+    def __init__(self, db_file: str, max_idle: int = DEFAULT_MAX_IDLE,
+                 cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+                 mmap_size: int = DEFAULT_MMAP_SIZE):
+        self.db_file = os.path.abspath(db_file)
+        self.max_idle = max_idle
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self._idle: "queue.LifoQueue[Tuple[sqlite3.Connection, Tuple[int, int]]]" = queue.LifoQueue()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _file_identity(self) -> Tuple[int, int]:
+        """DB 파일이 다시 만들어졌는지 판단하기 위한 (device, inode)."""
+        st = os.stat(self.db_file)
+        return st.st_dev, st.st_ino
+
+    def _open(self) -> sqlite3.Connection:
+        uri = f"{Path(self.db_file).as_uri()}?mode=ro"
+        conn = sqlite3.connect(
+            uri, uri=True,
+            check_same_thread=False,  # 풀을 통해 스레드 간 이동 (동시에 한 스레드만 사용)
+            cached_statements=DEFAULT_CACHED_STATEMENTS
+        )
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def _acquire(self) -> Tuple[sqlite3.Connection, Tuple[int, int], int]:
+        identity = self._file_identity()
+        with self._lock:
+            generation = self._generation
+        while True:
+            try:
+                conn, conn_identity = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open(), identity, generation
+            if conn_identity == identity:
+                return conn, conn_identity, generation
+            # DB 파일이 교체된 경우 이전 파일의 커넥션은 폐기
+            conn.close()
+
+    def _release(self, conn: sqlite3.Connection, identity: Tuple[int, int], generation: int):
+        with self._lock:
+            stale = generation != self._generation
+        if stale or self._idle.qsize() >= self.max_idle:
+            conn.close()
+        else:
+            self._idle.put((conn, identity))
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """풀에서 커넥션을 빌려 사용합니다. 블록이 끝나면 반납됩니다."""
+        conn, identity, generation = self._acquire()
+        healthy = True
+        try:
+            yield conn
+        except sqlite3.Error:
+            # SQLite 오류가 난 커넥션은 재사용하지 않음
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                self._release(conn, identity, generation)
+            else:
+                conn.close()
+
+    def close_all(self):
+        """유휴 커넥션을 모두 닫고, 사용 중인 커넥션은 반납 시 닫히도록 합니다."""
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+_pools: Dict[str, ReadOnlyConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file: str) -> ReadOnlyConnectionPool:
+    """DB 파일별 프로세스 공용 풀을 반환합니다."""
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ReadOnlyConnectionPool(key)
+            _pools[key] = pool
+        return pool
+
+
+def reset_pool(db_file: str):
+    """DB를 다시 만들 때 기존 커넥션을 정리합니다."""
+    key = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(key)
+    if pool is not None:
+        pool.close_all()
+
+
+@contextmanager
+def read_connection(db_file: str) -> Iterator[sqlite3.Connection]:
+    """get_pool(db_file).connection()의 축약형입니다."""
+    with get_pool(db_file).connection() as conn:
+        yield conn
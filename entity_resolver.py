@@ -0,0 +1,188 @@
+"""
+거래처/품목/지역 엔티티를 LLM 없이 추출하는 로컬 사전 기반 리졸버
+
+DataProcessor가 적재 시 entity_dictionary 테이블에 사전을 기록하고,
+EntityResolver는 이를 Aho-Corasick 오토마톤으로 컴파일하여
+사용자 메시지에서 한 번의 선형 스캔으로 엔티티를 찾습니다.
+"""
+
+import re
+import sqlite3
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from db_pool import read_connection
+
+# 사전 테이블 이름
+ENTITY_TABLE = "entity_dictionary"
+
+ENTITY_TABLE_DDL = f"""
+CREATE TABLE {ENTITY_TABLE} (
+    term TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    kind TEXT NOT NULL
+)
+"""
+
+# 사전에 넣을 최소 글자 수 (정규화 후)
+MIN_TERM_LENGTH = 2
+
+# 엔티티가 없을 때 "전체"로 확정하는 키워드
+ALL_KEYWORDS = ("전체", "모든", "전부")
+
+# 같은 정규화 키에 여러 값이 있을 때 우선순위 (앞쪽 우선)
+KIND_PRIORITY = ("client", "product", "strength", "client_name", "region")
+
+_CLIENT_PATTERN = re.compile(r"^\s*(?P<name>[^(]+?)\s*\((?P<region>[^)]*)\)\s*$")
+
+
+def normalize_text(text: str) -> str:
+    """공백을 제거하고 대소문자를 통일합니다."""
+    return "".join(str(text).split()).casefold()
+
+
+def build_entity_terms(rows: Iterable[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+    """
+    (ID, 품목, 함량) 행들로부터 (정규화 키, 검색 값, 종류) 목록을 생성합니다.
+
+    - client: 전체 거래처명 "굿모닝신경과의원(강서구 화곡동)"
+    - client_name: 괄호 앞 이름 "굿모닝신경과의원"
+    - region: 괄호 안 지역 "강서구 화곡동" 및 "강서구", "화곡동"
+    - product / strength: 품목, 함량
+    """
+    candidates: Dict[str, Tuple[str, str]] = {}
+
+    def add(value, kind):
+        value = str(value).strip() if value is not None else ""
+        term = normalize_text(value)
+        if len(term) < MIN_TERM_LENGTH:
+            return
+        current = candidates.get(term)
+        if current is None or KIND_PRIORITY.index(kind) < KIND_PRIORITY.index(current[1]):
+            candidates[term] = (value, kind)
+
+    for client, product, strength in rows:
+        if client:
+            add(client, "client")
+            match = _CLIENT_PATTERN.match(str(client))
+            if match:
+                add(match.group("name"), "client_name")
+                region = match.group("region").strip()
+                add(region, "region")
+                for part in region.split():
+                    add(part, "region")
+        if product:
+            add(product, "product")
+        if strength:
+            add(strength, "strength")
+
+    return [(term, value, kind) for term, (value, kind) in candidates.items()]
+
+
+def write_entity_dictionary(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, str]]):
+    """entity_dictionary 테이블을 (재)생성합니다. 트랜잭션은 호출한 쪽에서 관리합니다."""
+    conn.execute(f"DROP TABLE IF EXISTS {ENTITY_TABLE}")
+    conn.execute(ENTITY_TABLE_DDL)
+    conn.executemany(
+        f"INSERT INTO {ENTITY_TABLE} (term, value, kind) VALUES (?, ?, ?)",
+        build_entity_terms(rows)
+    )
+
+
+class EntityResolver:
+    """Aho-Corasick 오토마톤 기반 엔티티 추출기"""
+
+    def __init__(self, terms: Iterable[Tuple[str, str, str]]):
+        # 노드별 전이/실패 링크/출력(패턴 인덱스)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        self._patterns: List[Tuple[int, str, str]] = []
+
+        for term, value, kind in terms:
+            term = normalize_text(term)
+            if len(term) >= MIN_TERM_LENGTH:
+                self._add_pattern(term, value, kind)
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self._patterns)
+
+    @classmethod
+    def from_db(cls, db_file: str) -> "EntityResolver":
+        """DB의 entity_dictionary로 생성합니다. 사전이 없는 DB는 sales_data에서 직접 만듭니다."""
+        with read_connection(db_file) as conn:
+            has_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (ENTITY_TABLE,)
+            ).fetchone()
+            if has_table:
+                terms = conn.execute(f"SELECT term, value, kind FROM {ENTITY_TABLE}").fetchall()
+            else:
+                rows = conn.execute('SELECT DISTINCT "ID", "품목", "함량" FROM sales_data').fetchall()
+                terms = build_entity_terms(rows)
+        return cls(terms)
+
+    def _add_pattern(self, term: str, value: str, kind: str):
+        node = 0
+        for ch in term:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = nxt
+        self._output[node].append(len(self._patterns))
+        self._patterns.append((len(term), value, kind))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """
+        텍스트에서 엔티티를 찾아 (검색 값, 종류) 목록을 반환합니다.
+        겹치는 후보는 가장 왼쪽-가장 긴 매치만 남깁니다.
+        """
+        text = normalize_text(text)
+        matches = []
+        node = 0
+        for end, ch in enumerate(text, start=1):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for index in self._output[node]:
+                length = self._patterns[index][0]
+                matches.append((end - length, -length, index))
+
+        selected = []
+        covered_until = 0
+        for start, neg_length, index in sorted(matches):
+            if start >= covered_until:
+                selected.append(index)
+                covered_until = start - neg_length
+
+        return [self._patterns[index][1:] for index in selected]
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        client_or_region 값을 결정합니다.
+        엔티티가 정확히 하나면 그 값을, 엔티티가 없고 "전체" 키워드가 있으면 "전체"를,
+        그 외(매치 없음/모호함)에는 None을 반환하여 LLM 파싱으로 넘깁니다.
+        """
+        values = list(dict.fromkeys(value for value, _ in self.find(text)))
+        if len(values) == 1:
+            return values[0]
+        if not values and any(keyword in text for keyword in ALL_KEYWORDS):
+            return "전체"
+        return None
@@ -0,0 +1,268 @@
+"""
+스트리밍 Excel 로더와 사이드카 캐시
+
+openpyxl 읽기 전용 모드로 시트를 행 단위로 읽어 청크(DataFrame) 단위로 내보내므로
+수십만 행 워크북에서도 메모리 사용량이 청크 크기로 유지됩니다.
+처음 읽을 때 같은 내용을 사이드카 파일(Parquet, pyarrow가 없으면 CSV)로 기록하고,
+워크북의 mtime/크기 또는 내용 해시가 같으면 다음부터는 사이드카에서 바로 읽습니다.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 한 번에 내보내는 행 수
+DEFAULT_CHUNK_ROWS = 50_000
+# 사이드카 캐시 디렉터리
+DEFAULT_CACHE_DIR = ".excel_cache"
+# 파일 해시 계산 시 읽는 블록 크기
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# pyarrow는 Parquet 사이드카를 읽고 쓸 때 임포트 (없으면 CSV 사이드카 사용)
+pa = pq = None
+
+
+def _has_arrow() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _load_arrow():
+    global pa, pq
+    if pa is None:
+        import pyarrow
+        import pyarrow.parquet
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def normalize_header(values) -> List[str]:
+    """헤더 셀을 컬럼명으로 변환합니다 (datetime은 YYYY-MM 문자열)."""
+    columns = []
+    for i, value in enumerate(values):
+        if isinstance(value, datetime):
+            columns.append(value.strftime('%Y-%m'))
+        elif value is None:
+            columns.append(f"Unnamed: {i}")
+        else:
+            columns.append(str(value))
+    return columns
+
+
+def normalize_frame(df: pd.DataFrame, dimension_columns=(), month_columns=()) -> pd.DataFrame:
+    """
+    로더와 관계없이 같은 dtype이 되도록 정리합니다.
+    차원 컬럼은 문자열(결측은 NaN), 월 컬럼은 float64로 맞춰 행 해시가 일치하도록 합니다.
+    """
+    for col in dimension_columns:
+        if col in df.columns:
+            values = df[col].astype(object)
+            df[col] = values.where(values.isna(), values.astype(str)).where(values.notna(), np.nan)
+    for col in month_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df
+
+
+def file_sha256(path: str) -> str:
+    """파일 내용의 SHA-256을 계산합니다."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StreamingExcelLoader:
+    """청크 단위 Excel 로더 (사이드카 캐시, 처리 속도 통계 포함)"""
+
+    def __init__(self, excel_file: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR, cache_format: Optional[str] = None,
+                 month_pattern=None):
+        if cache_format not in (None, "parquet", "csv"):
+            raise ValueError(f"지원하지 않는 캐시 형식입니다: {cache_format}")
+        if cache_format == "parquet" and not _has_arrow():
+            raise ValueError("parquet 사이드카 캐시에는 pyarrow가 필요합니다.")
+        self.excel_file = excel_file
+        self.chunk_rows = chunk_rows
+        self.cache_dir = cache_dir
+        self.cache_format = cache_format or ("parquet" if _has_arrow() else "csv")
+        self.month_pattern = month_pattern
+        self.stats: Dict[str, object] = {}
+
+    # ----- 사이드카 캐시 -----
+
+    def _cache_paths(self):
+        name = os.path.basename(os.path.abspath(self.excel_file))
+        base = os.path.join(self.cache_dir, name)
+        return f"{base}.{self.cache_format}", f"{base}.meta.json"
+
+    def _source_signature(self) -> Dict[str, int]:
+        st = os.stat(self.excel_file)
+        return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    def _read_cache_meta(self) -> Optional[Dict[str, object]]:
+        data_path, meta_path = self._cache_paths()
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache_meta(self, meta: Dict[str, object]):
+        _, meta_path = self._cache_paths()
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def cached_meta(self) -> Optional[Dict[str, object]]:
+        """워크북이 바뀌지 않았으면 사이드카 메타데이터를, 아니면 None을 반환합니다."""
+        if not self.cache_dir:
+            return None
+        meta = self._read_cache_meta()
+        if meta is None or meta.get("format") != self.cache_format:
+            return None
+        signature = self._source_signature()
+        if meta.get("mtime_ns") == signature["mtime_ns"] and meta.get("size") == signature["size"]:
+            return meta
+        # mtime만 바뀐 경우(복사/touch) 내용 해시로 확인
+        if meta.get("size") == signature["size"] and meta.get("sha256") == file_sha256(self.excel_file):
+            meta.update(signature)
+            self._write_cache_meta(meta)
+            return meta
+        return None
+
+    def _iter_cache(self, meta) -> Iterator[pd.DataFrame]:
+        data_path, _ = self._cache_paths()
+        columns = meta["columns"]
+        if self.cache_format == "parquet":
+            _load_arrow()
+            parquet_file = pq.ParquetFile(data_path)
+            for batch in parquet_file.iter_batches(batch_size=self.chunk_rows):
+                yield self._normalize(batch.to_pandas(), columns)
+        else:
+            dtypes = {col: "object" for col in columns if col not in self._month_columns(columns)}
+            for chunk in pd.read_csv(data_path, chunksize=self.chunk_rows, dtype=dtypes):
+                yield self._normalize(chunk, columns)
+
+    # ----- Excel 읽기 -----
+
+    def _month_columns(self, columns) -> List[str]:
+        if self.month_pattern is None:
+            return []
+        return [col for col in columns if self.month_pattern.match(col)]
+
+    def _normalize(self, df: pd.DataFrame, columns) -> pd.DataFrame:
+        # 월 컬럼 외에는 모두 문자열 차원 컬럼으로 취급
+        df.columns = columns
+        months = self._month_columns(columns)
+        return normalize_frame(df, [col for col in columns if col not in months], months)
+
+    def _arrow_schema(self, columns):
+        months = set(self._month_columns(columns))
+        return pa.schema([(col, pa.float64() if col in months else pa.string()) for col in columns])
+
+    def _iter_excel(self) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.excel_file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = normalize_header(header)
+            width = len(columns)
+            buffer = []
+            for row in rows:
+                # 완전히 빈 행은 건너뜀 (pd.read_excel과 동일)
+                if not any(value is not None for value in row):
+                    continue
+                buffer.append(row[:width])
+                if len(buffer) >= self.chunk_rows:
+                    yield self._normalize(pd.DataFrame.from_records(buffer), columns)
+                    buffer = []
+            if buffer:
+                yield self._normalize(pd.DataFrame.from_records(buffer), columns)
+        finally:
+            workbook.close()
+
+    def _iter_excel_with_cache(self) -> Iterator[pd.DataFrame]:
+        """Excel을 읽으면서 같은 청크를 사이드카 임시 파일에 기록하고, 끝까지 읽으면 교체합니다."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data_path, _ = self._cache_paths()
+        tmp_path = f"{data_path}.tmp"
+        signature = self._source_signature()
+        writer = None
+        columns = None
+        completed = False
+        try:
+            for chunk in self._iter_excel():
+                if columns is None:
+                    columns = list(chunk.columns)
+                if self.cache_format == "parquet":
+                    if writer is None:
+                        _load_arrow()
+                        writer = pq.ParquetWriter(tmp_path, self._arrow_schema(columns))
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+                else:
+                    chunk.to_csv(tmp_path, mode="a" if writer else "w", header=writer is None, index=False)
+                    writer = True
+                yield chunk
+            completed = True
+        finally:
+            if writer is not None and writer is not True:
+                writer.close()
+            if completed and writer is not None:
+                os.replace(tmp_path, data_path)
+                self._write_cache_meta({
+                    **signature,
+                    "sha256": file_sha256(self.excel_file),
+                    "format": self.cache_format,
+                    "columns": columns,
+                })
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # ----- 공개 API -----
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """청크 DataFrame을 차례로 반환합니다. 끝나면 self.stats에 처리 통계가 기록됩니다."""
+        started = time.perf_counter()
+        meta = self.cached_meta()
+        source = "cache" if meta is not None else "excel"
+        if meta is not None:
+            chunks = self._iter_cache(meta)
+        elif self.cache_dir:
+            chunks = self._iter_excel_with_cache()
+        else:
+            chunks = self._iter_excel()
+
+        rows = 0
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+        elapsed = time.perf_counter() - started
+        self.stats = {
+            "source": source,
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed > 0 else float("inf"),
+        }
+        print(f"Excel 스트리밍 ({source}): {rows}행, {elapsed:.3f}초, {self.stats['rows_per_sec']:,.0f}행/초")
+
+    def load(self) -> pd.DataFrame:
+        """모든 청크를 하나의 DataFrame으로 합쳐 반환합니다."""
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,166 @@
+"""
+후속 질문(멀티턴) 해석과 메모리 내 재분석
+
+보고서를 받은 뒤 같은 세션에서 이어지는 "그럼 2020년 상반기만 보여줘", "그 중 뉴렙톨만" 같은 요청을
+규칙으로 해석합니다. 해석된 조건(월 범위, 품목)은 refine_result/analyze_data 노드가 세션에 남아 있는
+이전 조회 결과(품목×월 집계)에 메모리에서 적용하므로 작업 분류, 대상 추출, DB 조회를 다시 하지 않습니다.
+
+- 후속 표현("그럼", "그 중", "~만 보여줘" 등)이 있거나 현재 분석 대상을 다시 언급한 요청만 후속 질문으로 봅니다.
+- 다른 거래처/지역이 언급되거나, "전체/모든" 요청이거나, 후속 표현 없이 "보고서"를 요청하면 새 요청으로 처리합니다.
+- 조건은 누적됩니다 ("2020년 상반기만" 다음의 "그 중 뉴렙톨만"은 두 조건을 함께 적용).
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from entity_resolver import ALL_KEYWORDS
+
+# 후속 질문 표현 ("그럼", "그 중", "~만 보여줘" 등, "10만 원" 같은 숫자 단위는 제외)
+FOLLOW_UP_PATTERN = re.compile(
+    r"그럼|그러면|그\s*중|이\s*중|중에서|대신|다시|(?<![0-9])만(?:\s|$|[?.!]|보여|분석|알려|봐)"
+)
+
+# 후속 표현 없이 이 키워드가 있으면 새 보고서 요청으로 봄
+NEW_REQUEST_KEYWORDS = ("보고서", "리포트", "report")
+
+# 언급되면 새 분석 대상으로 보는 엔티티 종류 (품목/함량은 이전 결과 안의 조건으로 사용)
+TARGET_KINDS = ("client", "client_name", "region")
+
+# 전체 대상의 client_or_region 값 (EntityResolver.resolve와 같은 값)
+ALL_TARGET = "전체"
+
+_RANGE = re.compile(
+    r"(\d{4})\s*[년.\-/]\s*(\d{1,2})\s*월?\s*(?:부터|에서|~|〜|–)\s*"
+    r"(?:(\d{4})\s*[년.\-/]\s*)?(\d{1,2})\s*월?"
+)
+_YEAR_RANGE = re.compile(r"(\d{4})\s*년?\s*(?:부터|에서|~|〜|–)\s*(\d{4})\s*년")
+_HALF = re.compile(r"(\d{4})\s*년?\s*(상반기|하반기)")
+_QUARTER = re.compile(r"(\d{4})\s*년?\s*([1-4])\s*분기")
+_MONTH = re.compile(r"(\d{4})\s*(?:년\s*|-)(\d{1,2})\s*월?")
+_YEAR = re.compile(r"(\d{4})\s*년")
+_RECENT = re.compile(r"최근\s*(\d+)\s*(개월|년)")
+
+
+def _month(year, month) -> str:
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def parse_month_range(text: str, months: Sequence[str] = ()) -> Optional[Tuple[str, str]]:
+    """
+    텍스트의 기간 표현을 (시작 월, 종료 월) YYYY-MM으로 바꿉니다 (양 끝 포함). 없으면 None.
+    "최근 N개월/N년"은 months(조회 결과의 월 목록) 기준으로 계산합니다.
+    """
+    match = _RANGE.search(text)
+    if match:
+        start_year, start_month, end_year, end_month = match.groups()
+        return _month(start_year, start_month), _month(end_year or start_year, end_month)
+    match = _YEAR_RANGE.search(text)
+    if match:
+        return _month(match.group(1), 1), _month(match.group(2), 12)
+    match = _HALF.search(text)
+    if match:
+        first = match.group(2) == "상반기"
+        return _month(match.group(1), 1 if first else 7), _month(match.group(1), 6 if first else 12)
+    match = _QUARTER.search(text)
+    if match:
+        quarter = int(match.group(2))
+        return _month(match.group(1), quarter * 3 - 2), _month(match.group(1), quarter * 3)
+    match = _MONTH.search(text)
+    if match and 1 <= int(match.group(2)) <= 12:
+        month = _month(match.group(1), match.group(2))
+        return month, month
+    match = _YEAR.search(text)
+    if match:
+        return _month(match.group(1), 1), _month(match.group(1), 12)
+    match = _RECENT.search(text)
+    if match and months:
+        count = int(match.group(1)) * (12 if match.group(2) == "년" else 1)
+        recent = sorted(months)[-count:]
+        return recent[0], recent[-1]
+    return None
+
+
+def _matches(product: str, value: str) -> bool:
+    # QueryBuilder의 LIKE '%값%'과 같은 부분 문자열 비교
+    return value.casefold() in str(product).casefold()
+
+
+def parse_follow_up(text: str, entities: Iterable[Tuple[str, str]], current_target: str,
+                    months: Sequence[str] = (), products: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    이전 결과를 좁히는 후속 질문이면 조건 {"months": [시작, 종료], "products": [...]}(있는 것만)을,
+    새 요청이면 None을 반환합니다.
+    entities: EntityResolver.find 결과, products: 이전 결과의 품목 목록 (알 수 없으면 None)
+    """
+    entities = list(entities)
+    if any(kind in TARGET_KINDS and value != current_target for value, kind in entities):
+        return None
+    mentions_all = any(keyword in text for keyword in ALL_KEYWORDS)
+    if mentions_all and current_target != ALL_TARGET:
+        return None
+    # 후속 표현도 현재 대상 언급도 없는 요청(예: "2020년 매출 보여줘")은 이전 대상과 무관한 새 요청일 수 있음
+    has_marker = FOLLOW_UP_PATTERN.search(text) is not None
+    names_target = mentions_all or any(value == current_target for value, _ in entities)
+    if not has_marker and (not names_target
+                           or any(keyword in text.lower() for keyword in NEW_REQUEST_KEYWORDS)):
+        return None
+
+    refinement: Dict[str, Any] = {}
+    month_range = parse_month_range(text, months)
+    if month_range is not None:
+        refinement["months"] = list(month_range)
+    product_values = list(dict.fromkeys(
+        value for value, kind in entities if kind == "product" and value != current_target))
+    if product_values:
+        # 이전 결과에 없는 품목이면 새 대상에 대한 요청
+        if products is not None and not all(any(_matches(p, v) for p in products) for v in product_values):
+            return None
+        refinement["products"] = product_values
+    return refinement or None
+
+
+def merge_refinement(previous: Optional[Dict[str, Any]], update: Dict[str, Any]) -> Dict[str, Any]:
+    """이전 조건에 새 조건을 덮어씁니다 (월 범위/품목 각각)."""
+    merged = dict(previous or {})
+    merged.update(update)
+    return merged
+
+
+def apply_refinement(df: pd.DataFrame, refinement: Dict[str, Any]) -> pd.DataFrame:
+    """
+    조회 결과(품목×월 또는 월별 집계)에 월 범위/품목 조건을 적용합니다.
+    품목 조건은 품목 컬럼이 있는 결과(product_monthly)에만 적용됩니다.
+    """
+    if not refinement or "month" not in df.columns:
+        return df
+    products: List[str] = refinement.get("products") or []
+    if products and "product" in df.columns:
+        names = df["product"].astype(str)
+        selected = pd.Series(False, index=df.index)
+        for value in products:
+            selected |= names.str.contains(value, case=False, regex=False)
+        df = df[selected]
+    months = refinement.get("months")
+    if months:
+        in_range = df["month"].between(*months)
+        if "product" in df.columns:
+            # 범위 밖 (품목, 월)은 월만 지워 품목별 item_count를 유지 (SQL 월 범위 조건과 같은 결과)
+            df = df.assign(month=df["month"].where(in_range))
+        else:
+            df = df[in_range]
+    return df
+
+
+def describe_refinement(refinement: Optional[Dict[str, Any]]) -> str:
+    """조건 설명 (예: "2020-01~2020-06, 품목: 뉴렙톨"). 조건이 없으면 빈 문자열."""
+    if not refinement:
+        return ""
+    parts = []
+    if refinement.get("months"):
+        start, end = refinement["months"]
+        parts.append(start if start == end else f"{start}~{end}")
+    if refinement.get("products"):
+        parts.append(f"품목: {', '.join(refinement['products'])}")
+    return ", ".join(parts)
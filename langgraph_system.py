@@ -1,21 +1,32 @@
 import os
+import uuid
+import asyncio
 import sqlite3
+import threading
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-from typing import Dict, Any, List, Optional
-import json
+from typing import Dict, Any, List, Optional, Iterator, AsyncIterator
 
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from langgraph.graph import StateGraph, END
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from typing_extensions import TypedDict, Annotated
 from dotenv import load_dotenv
 
+from analysis_engine import analyze_frame
+from chart_renderer import ChartRenderer
+from checkpointing import DEFAULT_CHECKPOINT_FILE, FrameRef, FrameStore, frame_key, open_checkpointer, prune_thread
+from node_metrics import NodeMetrics
+from llm_singleflight import SingleFlight, request_key
+from columnar_store import ColumnarStore
+from prompt_compactor import DEFAULT_TOKEN_BUDGET, PromptCompactor, TokenCounter
+from db_pool import read_connection
+from entity_resolver import EntityResolver
+from followup import apply_refinement, describe_refinement, merge_refinement, parse_follow_up
+from query_builder import QueryBuilder, QueryFilter
+from task_classifier import RuleBasedTaskClassifier
+from report_cache import ReportCache, get_data_version
+
 # 환경 변수 로드
 load_dotenv()
 
@@ -24,40 +35,135 @@ class GraphState(TypedDict):
     messages: Annotated[list, add_messages]
     task_type: str
     client_or_region: str
+    query_filter: Dict[str, Any]
     sql_query: str
-    query_result: pd.DataFrame
+    sql_params: List[Any]
+    query_plan: str
+    query_ref: Optional[FrameRef]  # 조회 결과 참조 (DataFrame은 frame_store에 보관)
+    query_rows: int
+    multi_turn: bool  # 세션(thread_id) 실행: 이전 보고서에 대한 후속 질문을 해석
+    refinement: Dict[str, Any]  # 후속 질문 조건 (월 범위, 품목)
+    follow_up: Optional[Dict[str, Any]]  # 이번 메시지의 후속 질문 조건 (detect_follow_up, None이면 새 요청)
     analysis_result: Dict[str, Any]
     chart_path: Optional[str]
+    chart_json: Optional[str]
     report: str
     needs_human_review: bool
+    review_status: Optional[str]
+    data_version: Optional[str]
+    cache_hit: bool
     final_answer: str
 
 class PerformanceReportSystem:
-    def __init__(self, db_file="sales_data.db"):
+    def __init__(self, db_file="sales_data.db", report_cache_file=None, llm=None, checkpoint_file=None):
+        """
+        report_cache_file: 보고서 캐시를 저장할 SQLite 파일 경로.
+            지정하지 않으면 REPORT_CACHE_FILE 환경 변수를 사용하고, 둘 다 없으면 메모리에만 캐시합니다.
+        llm: 사용할 채팅 모델 (기본 GPT-4o). 벤치마크에서는 benchmark.FakeChatModel을 넣어 오프라인으로 실행합니다.
+        checkpoint_file: 그래프 체크포인트 SQLite 파일 경로 (":memory:"면 메모리).
+            지정하지 않으면 GRAPH_CHECKPOINT_FILE 환경 변수, 둘 다 없으면 graph_checkpoints.db를 사용합니다.
+        """
         self.db_file = db_file
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.1
+        if llm is None:
+            # OpenAI 클라이언트 스택은 기본 모델을 만들 때만 임포트
+            from langchain_openai import ChatOpenAI
+            llm = ChatOpenAI(
+                model="gpt-4o",
+                temperature=0.1,
+                stream_usage=True  # 스트리밍 응답에도 토큰 사용량 포함 (노드 계측용)
+            )
+        self.llm = llm
+        # 동일한 LLM 요청이 동시에 들어오면 진행 중인 호출 하나를 공유
+        self.llm_singleflight = SingleFlight()
+        self._entity_resolver = None
+        self._entity_resolver_mtime = None
+        self._resolver_lock = threading.Lock()
+        self.task_classifier = RuleBasedTaskClassifier()
+        self.query_builder = QueryBuilder(db_file)
+        self.columnar_store = ColumnarStore.for_db(db_file)
+        self.prompt_compactor = PromptCompactor(
+            budget_tokens=int(os.getenv("REPORT_PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)),
+            counter=TokenCounter(self.llm.model_name)
+        )
+        self.report_cache = ReportCache(db_path=report_cache_file or os.getenv("REPORT_CACHE_FILE"))
+        self.chart_renderer = ChartRenderer(chart_dir=os.getenv("CHART_CACHE_DIR", ".chart_cache"))
+        self.metrics = NodeMetrics(
+            log_file=os.getenv("NODE_METRICS_LOG"),
+            prom_file=os.getenv("NODE_METRICS_PROM_FILE")
+        )
+        # 조회 결과 DataFrame은 이 저장소에 보관하고 그래프 상태에는 참조만 담음
+        self.frame_store = FrameStore()
+        self.checkpointer = open_checkpointer(
+            checkpoint_file or os.getenv("GRAPH_CHECKPOINT_FILE", DEFAULT_CHECKPOINT_FILE))
+        self.graph = self._build_graph(self.checkpointer)
+        # thread_id 없는 요청은 이어서 실행할 수 없으므로 같은 그래프를 메모리 체크포인트로 실행 (실행 후 삭제)
+        self._ephemeral_checkpointer = open_checkpointer(None)
+        self._ephemeral_graph = self._build_graph(self._ephemeral_checkpointer)
+    
+    def _node(self, name: str, func, afunc=None) -> RunnableLambda:
+        """노드 함수를 계측 래퍼로 감싼 Runnable을 만듭니다."""
+        return RunnableLambda(
+            self.metrics.instrument(name, func),
+            afunc=self.metrics.instrument_async(name, afunc) if afunc else None,
+            name=name
         )
-        self.graph = self._build_graph()
     
-    def _build_graph(self) -> StateGraph:
+    def _run_config(self, thread_id: str) -> Dict[str, Any]:
+        """그래프 실행 설정 (체크포인트 스레드, LLM 토큰 사용량을 노드 기록에 더하는 콜백)."""
+        return {"callbacks": [self.metrics.callback], "configurable": {"thread_id": thread_id}}
+    
+    def _invoke_llm(self, messages: list):
+        """LLM을 호출합니다. 같은 요청(모델, temperature, 메시지)이 진행 중이면 그 결과를 함께 받습니다."""
+        return self.llm_singleflight.do(request_key(self.llm, messages), lambda: self.llm.invoke(messages))
+    
+    async def _ainvoke_llm(self, messages: list):
+        """_invoke_llm의 비동기 버전입니다."""
+        return await self.llm_singleflight.ado(request_key(self.llm, messages), lambda: self.llm.ainvoke(messages))
+    
+    def _build_graph(self, checkpointer) -> StateGraph:
         """LangGraph 워크플로우를 구성합니다."""
         workflow = StateGraph(GraphState)
         
-        # 노드 추가
-        workflow.add_node("classify_task", self.classify_task_type)
-        workflow.add_node("parse_client_region", self.parse_client_or_region)
-        workflow.add_node("build_sql_query", self.build_sql_query)
-        workflow.add_node("query_database", self.query_database)
-        workflow.add_node("analyze_data", self.analyze_with_pandas)
-        workflow.add_node("generate_charts", self.generate_charts)
-        workflow.add_node("generate_report", self.generate_report)
-        workflow.add_node("h2h_decision", self.h2h_decision)
-        workflow.add_node("final_answer", self.generate_final_answer)
-        
-        # 진입점 설정
-        workflow.set_entry_point("classify_task")
+        # 노드 추가 (모든 노드는 NodeMetrics로 계측)
+        # I/O 노드는 동기(invoke)/비동기(ainvoke) 구현을 함께 등록
+        workflow.add_node("classify_task", self._node(
+            "classify_task", self.classify_task_type, self.aclassify_task_type))
+        workflow.add_node("parse_client_region", self._node(
+            "parse_client_region", self.parse_client_or_region, self.aparse_client_or_region))
+        workflow.add_node("lookup_report_cache", self._node("lookup_report_cache", self.lookup_report_cache))
+        workflow.add_node("build_sql_query", self._node("build_sql_query", self.build_sql_query))
+        workflow.add_node("query_database", self._node(
+            "query_database", self.query_database, self.aquery_database))
+        workflow.add_node("analyze_data", self._node("analyze_data", self.analyze_with_pandas))
+        workflow.add_node("generate_charts", self._node("generate_charts", self.generate_charts))
+        workflow.add_node("generate_report", self._node(
+            "generate_report", self.generate_report, self.agenerate_report))
+        workflow.add_node("h2h_decision", self._node("h2h_decision", self.h2h_decision))
+        workflow.add_node("human_review", self._node("human_review", self.human_review))
+        workflow.add_node("store_report_cache", self._node("store_report_cache", self.store_report_cache))
+        workflow.add_node("final_answer", self._node("final_answer", self.generate_final_answer))
+        
+        workflow.add_node("detect_follow_up", self._node("detect_follow_up", self.detect_follow_up))
+        workflow.add_node("refine_result", self._node("refine_result", self.refine_result))
+        
+        # 진입점: 세션에 이전 분석 대상이 있으면 detect_follow_up에서 메시지를 한 번 해석하고,
+        # 후속 질문이면 분류/대상 추출/조회 없이 refine_result로
+        workflow.add_conditional_edges(
+            START,
+            self.route_entry,
+            {
+                "session": "detect_follow_up",
+                "new_request": "classify_task"
+            }
+        )
+        workflow.add_conditional_edges(
+            "detect_follow_up",
+            self.route_follow_up,
+            {
+                "follow_up": "refine_result",
+                "new_request": "classify_task"
+            }
+        )
         
         # 엣지 추가
         workflow.add_conditional_edges(
@@ -69,30 +175,66 @@ class PerformanceReportSystem:
             }
         )
         
-        workflow.add_edge("parse_client_region", "build_sql_query")
+        workflow.add_edge("parse_client_region", "lookup_report_cache")
+        workflow.add_conditional_edges(
+            "lookup_report_cache",
+            self.route_report_cache,
+            {
+                "hit": "final_answer",
+                "miss": "build_sql_query"
+            }
+        )
+        workflow.add_conditional_edges(
+            "refine_result",
+            self.route_report_cache,
+            {
+                "hit": "final_answer",
+                "miss": "analyze_data"
+            }
+        )
         workflow.add_edge("build_sql_query", "query_database")
         workflow.add_edge("query_database", "analyze_data")
+        # 차트와 보고서는 서로 의존하지 않으므로 병렬 실행 후 h2h_decision에서 합류
         workflow.add_edge("analyze_data", "generate_charts")
-        workflow.add_edge("generate_charts", "generate_report")
-        workflow.add_edge("generate_report", "h2h_decision")
+        workflow.add_edge("analyze_data", "generate_report")
+        workflow.add_edge(["generate_charts", "generate_report"], "h2h_decision")
         
         workflow.add_conditional_edges(
             "h2h_decision",
             self.route_h2h_decision,
             {
-                "needs_review": "final_answer",  # 실제로는 human reviewer로 가야 함
-                "auto": "final_answer"
+                "needs_review": "human_review",
+                "auto": "store_report_cache"
             }
         )
+        # human_review 앞에서 멈추고 review()로 검토 결과를 받아 이어서 실행
+        workflow.add_conditional_edges(
+            "human_review",
+            self.route_review,
+            {
+                "approved": "store_report_cache",
+                "rejected": "final_answer"
+            }
+        )
+        
+        workflow.add_edge("store_report_cache", "final_answer")
         
         workflow.add_edge("final_answer", END)
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=checkpointer, interrupt_before=["human_review"])
     
-    def classify_task_type(self, state: GraphState) -> GraphState:
-        """사용자 입력을 분석하여 작업 타입을 분류합니다."""
+    def _classify_task_messages(self, state: GraphState) -> Optional[list]:
+        """규칙 기반으로 분류되면 state를 채우고 None을, 아니면 LLM 메시지를 반환합니다."""
         user_message = state["messages"][-1].content
         
+        # 규칙 기반 1차 분류 (신뢰도가 낮을 때만 LLM 호출)
+        resolver = self._get_entity_resolver()
+        entity_found = bool(resolver.find(user_message)) if resolver is not None else False
+        task_type = self.task_classifier.classify(user_message, entity_found=entity_found)
+        if task_type is not None:
+            state["task_type"] = task_type
+            return None
+        
         system_prompt = """
         사용자의 입력을 분석하여 작업 타입을 분류하세요.
         
@@ -103,19 +245,61 @@ class PerformanceReportSystem:
         응답은 반드시 다음 중 하나여야 합니다: "PerformanceReport" 또는 "Other"
         """
         
-        response = self.llm.invoke([
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_message)
-        ])
+        ]
+    
+    def classify_task_type(self, state: GraphState) -> GraphState:
+        """사용자 입력을 분석하여 작업 타입을 분류합니다."""
+        messages = self._classify_task_messages(state)
+        if messages is None:
+            return state
         
-        task_type = "PerformanceReport" if "PerformanceReport" in response.content else "Other"
-        state["task_type"] = task_type
+        response = self._invoke_llm(messages)
+        state["task_type"] = "PerformanceReport" if "PerformanceReport" in response.content else "Other"
+        return state
+    
+    async def aclassify_task_type(self, state: GraphState) -> GraphState:
+        """classify_task_type의 비동기 버전입니다."""
+        messages = await asyncio.to_thread(self._classify_task_messages, state)
+        if messages is None:
+            return state
         
+        response = await self._ainvoke_llm(messages)
+        state["task_type"] = "PerformanceReport" if "PerformanceReport" in response.content else "Other"
         return state
     
-    def parse_client_or_region(self, state: GraphState) -> GraphState:
-        """클라이언트나 지역 정보를 파싱합니다."""
+    def _get_entity_resolver(self) -> Optional[EntityResolver]:
+        """엔티티 사전을 로드합니다. DB 파일이 바뀌면 다시 로드합니다."""
+        try:
+            mtime = os.path.getmtime(self.db_file)
+        except OSError:
+            return None
+        
+        # 여러 세션이 한 시스템을 공유하므로 사전은 한 스레드만 로드
+        with self._resolver_lock:
+            if self._entity_resolver is None or self._entity_resolver_mtime != mtime:
+                try:
+                    self._entity_resolver = EntityResolver.from_db(self.db_file)
+                    self._entity_resolver_mtime = mtime
+                except (sqlite3.Error, OSError) as e:
+                    print(f"엔티티 사전 로드 오류: {e}")
+                    return None
+            return self._entity_resolver
+    
+    def _parse_client_messages(self, state: GraphState) -> Optional[list]:
+        """로컬 사전으로 확정되면 state를 채우고 None을, 아니면 LLM 메시지를 반환합니다."""
         user_message = state["messages"][-1].content
+        # 새 분석 대상: 이전 후속 질문 조건은 적용하지 않음
+        state["refinement"] = {}
+        
+        # 로컬 사전으로 확정되면 LLM 호출 생략 (매치 없음/모호한 경우만 LLM 사용)
+        resolver = self._get_entity_resolver()
+        resolved = resolver.resolve(user_message) if resolver is not None else None
+        if resolved is not None:
+            state["client_or_region"] = resolved
+            return None
         
         system_prompt = """
         사용자의 요청에서 특정 클라이언트, 제품, 또는 지역 정보를 추출하세요.
@@ -127,120 +311,263 @@ class PerformanceReportSystem:
         - "전체 매출 보고서" -> "전체"
         """
         
-        response = self.llm.invoke([
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_message)
-        ])
+        ]
+    
+    def parse_client_or_region(self, state: GraphState) -> GraphState:
+        """클라이언트나 지역 정보를 파싱합니다."""
+        messages = self._parse_client_messages(state)
+        if messages is None:
+            return state
         
+        response = self._invoke_llm(messages)
         state["client_or_region"] = response.content.strip()
         return state
     
+    async def aparse_client_or_region(self, state: GraphState) -> GraphState:
+        """parse_client_or_region의 비동기 버전입니다."""
+        messages = await asyncio.to_thread(self._parse_client_messages, state)
+        if messages is None:
+            return state
+        
+        response = await self._ainvoke_llm(messages)
+        state["client_or_region"] = response.content.strip()
+        return state
+    
+    def _cached_report(self, state: GraphState, data_version: Optional[str]) -> Dict[str, Any]:
+        """(분석 대상, 데이터 버전)으로 캐시된 보고서가 있으면 상태 갱신값을 반환합니다."""
+        if data_version is None:
+            return {"cache_hit": False}
+        cached = self.report_cache.get(self._report_subject(state), data_version)
+        if cached is None:
+            return {"cache_hit": False}
+        update = {"report": cached["report"], "needs_human_review": False, "cache_hit": True}
+        chart_json = cached.get("chart_json")
+        # 차트 캐시에서 제거된 경우 차트 없이 보고서만 반환
+        if chart_json and os.path.exists(chart_json):
+            update["chart_path"] = cached.get("chart_path")
+            update["chart_json"] = chart_json
+        return update
+    
+    def lookup_report_cache(self, state: GraphState) -> GraphState:
+        """(분석 대상, 데이터 버전)으로 캐시된 보고서를 찾습니다."""
+        data_version = get_data_version(self.db_file)
+        state["data_version"] = data_version
+        state.update(self._cached_report(state, data_version))
+        return state
+    
+    def store_report_cache(self, state: GraphState) -> GraphState:
+        """검토가 필요 없는 보고서를 캐시에 저장합니다."""
+        if state.get("data_version") and state.get("report"):
+            self.report_cache.set(self._report_subject(state), state["data_version"], {
+                "report": state["report"],
+                "chart_path": state.get("chart_path"),
+                "chart_json": state.get("chart_json")
+            })
+        return state
+    
     def build_sql_query(self, state: GraphState) -> GraphState:
-        """SQL 쿼리를 생성합니다."""
-        client_or_region = state["client_or_region"]
+        """
+        SQL 쿼리를 생성합니다 (값은 파라미터로 바인딩, 집계는 SQL/롤업 테이블에서 수행).
+        품목×월로 집계하므로 분석 결과에 품목별 합계/비중/상위·하위 품목이 들어가고,
+        세션의 후속 질문(품목 조건)도 메모리에서 처리할 수 있습니다.
+        """
+        query_filter = QueryFilter(entity=state["client_or_region"], aggregation="product_monthly")
         
-        # 기본 쿼리
-        if client_or_region == "전체":
-            sql_query = "SELECT * FROM sales_data"
-        else:
-            # 실제 컬럼명 사용: ID, 품목, 함량
-            sql_query = f"SELECT * FROM sales_data WHERE (ID LIKE '%{client_or_region}%' OR 품목 LIKE '%{client_or_region}%' OR 함량 LIKE '%{client_or_region}%')"
+        try:
+            sql_query, sql_params, query_plan = self.query_builder.build_with_plan(query_filter)
+        except (sqlite3.Error, OSError) as e:
+            print(f"쿼리 생성 오류: {e}")
+            sql_query, sql_params, query_plan = "", [], ""
         
+        state["query_filter"] = query_filter.to_dict()
+        state["query_plan"] = query_plan
         state["sql_query"] = sql_query
+        state["sql_params"] = sql_params
         return state
     
-    def query_database(self, state: GraphState) -> GraphState:
-        """데이터베이스에서 데이터를 조회합니다."""
+    def _query_columnar(self, state: GraphState) -> Optional[pd.DataFrame]:
+        """
+        DB와 같은 버전의 컬럼형 저장소가 있으면 집계를 그쪽에서 수행합니다. 사용할 수 없으면 None.
+        롤업 테이블로 답할 수 있는 요청은 롤업이 더 작으므로 SQLite로 조회합니다.
+        """
+        if not state.get("query_filter") or not self.columnar_store.available():
+            return None
+        if state.get("query_plan", "").startswith("rollup"):
+            return None
+        query_filter = QueryFilter.from_dict(state["query_filter"])
+        if not self.columnar_store.supports(query_filter):
+            return None
+        data_version = state.get("data_version") or get_data_version(self.db_file)
+        if data_version is None or self.columnar_store.data_version() != data_version:
+            return None
         try:
-            conn = sqlite3.connect(self.db_file)
-            df = pd.read_sql(state["sql_query"], conn)
-            conn.close()
-            
-
-            
-            state["query_result"] = df
+            return self.columnar_store.query(query_filter)
         except Exception as e:
-            # 오류 발생 시 빈 DataFrame 반환
-            state["query_result"] = pd.DataFrame()
-            print(f"데이터베이스 쿼리 오류: {e}")
-        
-        return state
+            print(f"컬럼형 저장소 조회 오류 (SQLite로 조회): {e}")
+            return None
     
-    def analyze_with_pandas(self, state: GraphState) -> GraphState:
-        """Pandas를 사용하여 데이터를 분석합니다."""
-        df = state["query_result"]
+    def _fetch_frame(self, state: GraphState) -> Optional[pd.DataFrame]:
+        """상태의 SQL로 조회 결과를 읽습니다 (컬럼형 저장소가 있으면 우선 사용). 실패하면 None."""
+        df = self._query_columnar(state)
+        if df is not None:
+            return df
         
-        if df.empty:
-            state["analysis_result"] = {"error": "데이터가 없습니다."}
-            return state
-        
-        analysis = {
-            "총_레코드_수": len(df),
-            "컬럼_수": len(df.columns),
-            "컬럼명": list(df.columns),
-            "기본_통계": {},
-            "월별_분석": {}
+        try:
+            with read_connection(self.db_file) as conn:
+                return pd.read_sql(state["sql_query"], conn, params=state.get("sql_params") or None)
+        except Exception as e:
+            print(f"데이터베이스 쿼리 오류: {e}")
+            return None
+    
+    @staticmethod
+    def _frame_key(state: GraphState) -> str:
+        return frame_key(state.get("sql_query"), state.get("sql_params"), state.get("data_version"))
+    
+    def query_database(self, state: GraphState) -> Dict[str, Any]:
+        """
+        데이터베이스에서 데이터를 조회합니다.
+        결과는 frame_store에 넣고 상태에는 참조와 행 수만 기록합니다 (같은 조회는 DataFrame 하나를 공유).
+        """
+        df = self._fetch_frame(state)
+        if df is None:
+            return {"query_ref": None, "query_rows": 0}
+        ref = self.frame_store.put(self._frame_key(state), df)
+        return {"query_ref": ref, "query_rows": ref.rows}
+    
+    async def aquery_database(self, state: GraphState) -> Dict[str, Any]:
+        """query_database의 비동기 버전입니다 (SQLite 조회는 워커 스레드에서 실행)."""
+        return await asyncio.to_thread(self.query_database, state)
+    
+    def _load_frame(self, state: GraphState) -> Optional[pd.DataFrame]:
+        """
+        참조로 조회 결과를 가져옵니다 (조회 실패로 참조가 없으면 None).
+        프로세스가 다시 시작되었거나 저장소에서 제거되어 없으면 저장된 SQL로 다시 조회합니다.
+        """
+        ref = state.get("query_ref")
+        if ref is None:
+            return None
+        df = self.frame_store.get(ref)
+        if df is None:
+            print("조회 결과가 메모리에 없어 다시 조회합니다.")
+            df = self._fetch_frame(state)
+            if df is not None:
+                self.frame_store.put(ref.key, df)
+        return df
+    
+    def _session_frame(self, state: GraphState) -> Optional[pd.DataFrame]:
+        """세션의 이전 조회 결과 (현재 분석 대상의 품목×월 집계일 때만, 메모리에 없으면 다시 조회)."""
+        query_filter = state.get("query_filter") or {}
+        ref = state.get("query_ref")
+        if (ref is None or query_filter.get("entity") != state.get("client_or_region")
+                or query_filter.get("aggregation") != "product_monthly"):
+            return None
+        return self._load_frame(state)
+    
+    def detect_follow_up(self, state: GraphState) -> Dict[str, Any]:
+        """
+        마지막 메시지가 세션의 이전 보고서를 좁히는 후속 질문이면 새 조건을, 아니면 None을 follow_up에 기록합니다.
+        엔티티 추출과 (메모리에 없으면) 이전 결과 재조회가 필요하므로 라우터가 아닌 노드에서 한 번만 해석합니다.
+        """
+        text = state["messages"][-1].content
+        resolver = self._get_entity_resolver()
+        entities = resolver.find(text) if resolver is not None else []
+        df = self._session_frame(state)
+        months = df["month"].dropna().unique().tolist() if df is not None else ()
+        products = df["product"].unique().tolist() if df is not None else None
+        return {"follow_up": parse_follow_up(text, entities, state["client_or_region"], months, products)}
+    
+    def route_entry(self, state: GraphState) -> str:
+        """세션에 이전 분석 대상이 있으면 후속 질문 해석부터, 아니면 작업 분류부터 실행합니다."""
+        # 사이에 다른 요청(Other)이 있었어도 세션의 분석 대상이 남아 있으면 후속 질문일 수 있음
+        return "session" if state.get("multi_turn") and state.get("client_or_region") else "new_request"
+    
+    def route_follow_up(self, state: GraphState) -> str:
+        """detect_follow_up이 조건을 찾았으면 refine_result로, 아니면 작업 분류부터 실행합니다."""
+        return "follow_up" if state.get("follow_up") is not None else "new_request"
+    
+    def refine_result(self, state: GraphState) -> Dict[str, Any]:
+        """
+        후속 질문의 조건(월 범위, 품목)을 세션 조건에 더합니다. 조건은 analyze_data가 이전 조회 결과에 메모리에서 적용하므로
+        작업 분류, 대상 추출, DB 조회를 다시 하지 않습니다.
+        이전 요청이 캐시된 보고서로 답했거나 그사이 데이터가 갱신된 경우에만 현재 대상을 한 번 조회합니다.
+        """
+        update: Dict[str, Any] = {
+            "task_type": "PerformanceReport",
+            "refinement": merge_refinement(state.get("refinement"), state.get("follow_up") or {})
         }
+        data_version = get_data_version(self.db_file)
+        query_filter = state.get("query_filter") or {}
+        if (data_version != state.get("data_version") or query_filter.get("entity") != state["client_or_region"]
+                or query_filter.get("aggregation") != "product_monthly"):
+            session = self.build_sql_query(dict(state, data_version=data_version))
+            session.update(self.query_database(session))
+            update.update({key: session[key] for key in (
+                "query_filter", "query_plan", "sql_query", "sql_params", "query_ref", "query_rows")})
+        update["data_version"] = data_version
+        # 같은 조건의 후속 질문 보고서가 캐시에 있으면 그대로 사용
+        update.update(self._cached_report(dict(state, **update), data_version))
+        return update
+    
+    def analyze_with_pandas(self, state: GraphState) -> Dict[str, Any]:
+        """
+        조회 결과를 벡터화 분석 엔진(analysis_engine)으로 분석합니다.
+        월별 합계, 전월/전년 동월 대비 증감률, 이동 평균, 결측을 고려한 통계와
+        (품목 라인/그룹 결과인 경우) 항목별 합계, 비중, 상위/하위 항목을 계산합니다.
+        """
+        df = self._load_frame(state)
+        if df is not None and state.get("refinement"):
+            # 후속 질문 조건 (월 범위, 품목)은 메모리에서 적용
+            df = apply_refinement(df, state["refinement"])
         
-        # 숫자형 컬럼들에 대한 기본 통계
-        numeric_columns = df.select_dtypes(include=['number']).columns
-        if len(numeric_columns) > 0:
-            analysis["기본_통계"] = df[numeric_columns].describe().to_dict()
-        
-        # 월별 데이터가 있는 경우 분석 (YYYY-MM 형태)
-        date_columns = [col for col in df.columns if str(col).startswith(('2019', '2020', '2021', '2022', '2023', '2024')) and '-' in str(col)]
-        if date_columns:
-            monthly_data = df[date_columns].sum() if len(date_columns) > 0 else {}
-            analysis["월별_분석"] = monthly_data.to_dict() if hasattr(monthly_data, 'to_dict') else {}
+        if df is None or df.empty:
+            return {"analysis_result": {"error": "데이터가 없습니다."}}
         
-        state["analysis_result"] = analysis
-        return state
+        return {"analysis_result": analyze_frame(df).to_dict()}
     
-    def generate_charts(self, state: GraphState) -> GraphState:
-        """선택적으로 차트를 생성합니다."""
-        df = state["query_result"]
+    def generate_charts(self, state: GraphState) -> Dict[str, Any]:
+        """
+        선택적으로 차트를 생성합니다.
+        generate_report와 병렬로 실행되므로 chart_path/chart_json만 갱신합니다.
+        Plotly JSON만 바로 기록하고 PNG는 ChartRenderer가 백그라운드에서 렌더링하므로
+        (같은 데이터면 캐시 재사용) 이 노드는 래스터화를 기다리지 않습니다.
+        """
         analysis = state["analysis_result"]
         
-        if df.empty or "월별_분석" not in analysis or not analysis["월별_분석"]:
-            state["chart_path"] = None
-            return state
+        if not analysis.get("월별_분석"):
+            return {"chart_path": None, "chart_json": None}
         
         try:
             # 월별 데이터 차트 생성
             monthly_data = analysis["월별_분석"]
-            months = list(monthly_data.keys())
-            values = list(monthly_data.values())
-            
-            plt.figure(figsize=(12, 6))
-            plt.plot(months, values, marker='o', linewidth=2, markersize=6)
-            plt.title('월별 매출 추이', fontsize=16, fontweight='bold')
-            plt.xlabel('월', fontsize=12)
-            plt.ylabel('매출액', fontsize=12)
-            plt.xticks(rotation=45)
-            plt.grid(True, alpha=0.3)
-            plt.tight_layout()
-            
-            chart_path = f"chart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            plt.savefig(chart_path, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            state["chart_path"] = chart_path
+            handle = self.chart_renderer.submit(
+                '월별 매출 추이', list(monthly_data.keys()), list(monthly_data.values()))
         except Exception as e:
             print(f"차트 생성 오류: {e}")
-            state["chart_path"] = None
+            return {"chart_path": None, "chart_json": None}
         
-        return state
+        return {"chart_path": handle.png_path, "chart_json": handle.json_path}
     
-    def generate_report(self, state: GraphState) -> GraphState:
-        """LLM을 사용하여 성과 보고서를 생성합니다."""
-        analysis = state["analysis_result"]
-        client_or_region = state["client_or_region"]
+    @staticmethod
+    def _report_subject(state: GraphState) -> str:
+        """보고서 대상 (후속 질문 조건이 있으면 함께 표시, 보고서 캐시 키로도 사용)."""
+        condition = describe_refinement(state.get("refinement"))
+        return f"{state['client_or_region']} ({condition})" if condition else state["client_or_region"]
+    
+    def _report_messages(self, state: GraphState) -> list:
+        """보고서 생성용 LLM 메시지를 구성합니다."""
+        client_or_region = self._report_subject(state)
+        # 월/항목 수와 관계없이 토큰 예산 안으로 압축 (반올림, 최근 월, 상위 N + 기타)
+        analysis, _ = self.prompt_compactor.compact(state["analysis_result"])
         
         system_prompt = f"""
         다음 분석 결과를 바탕으로 전문적인 성과 보고서를 한국어로 작성하세요.
+        비율 항목의 (%) 값은 퍼센트이며, 금액은 유효 숫자 4자리로 반올림되어 있습니다.
         
         분석 대상: {client_or_region}
-        분석 결과: {json.dumps(analysis, ensure_ascii=False, indent=2)}
+        분석 결과: {analysis}
         
         보고서는 다음 구조로 작성하세요:
         1. 요약 (Executive Summary)
@@ -251,12 +578,20 @@ class PerformanceReportSystem:
         전문적이고 읽기 쉬운 형태로 작성하세요.
         """
         
-        response = self.llm.invoke([
-            SystemMessage(content=system_prompt)
-        ])
-        
-        state["report"] = response.content
-        return state
+        return [SystemMessage(content=system_prompt)]
+    
+    def generate_report(self, state: GraphState) -> Dict[str, Any]:
+        """
+        LLM을 사용하여 성과 보고서를 생성합니다.
+        generate_charts와 병렬로 실행되므로 report만 갱신합니다.
+        """
+        response = self._invoke_llm(self._report_messages(state))
+        return {"report": response.content}
+    
+    async def agenerate_report(self, state: GraphState) -> Dict[str, Any]:
+        """generate_report의 비동기 버전입니다."""
+        response = await self._ainvoke_llm(self._report_messages(state))
+        return {"report": response.content}
     
     def h2h_decision(self, state: GraphState) -> GraphState:
         """사람의 검토가 필요한지 결정합니다."""
@@ -277,48 +612,307 @@ class PerformanceReportSystem:
         state["needs_human_review"] = needs_review
         return state
     
+    def human_review(self, state: GraphState) -> GraphState:
+        """
+        사람의 검토 단계입니다. 그래프는 이 노드 앞에서 멈추고, review()가 검토 결과를
+        이 노드의 출력으로 기록한 뒤 이어서 실행합니다.
+        """
+        return state
+    
     def generate_final_answer(self, state: GraphState) -> GraphState:
         """최종 답변을 생성합니다."""
         if state["task_type"] == "PerformanceReport":
-            if state.get("needs_human_review", False):
+            if state.get("review_status") == "rejected":
+                final_answer = f"성과 보고서가 검토에서 반려되었습니다.\n\n{state.get('report', '')}"
+            elif state.get("needs_human_review", False):
                 final_answer = f"성과 보고서가 생성되었지만 사람의 검토가 필요합니다.\n\n{state.get('report', '보고서 생성 중 오류가 발생했습니다.')}"
             else:
                 final_answer = state.get("report", "보고서 생성 중 오류가 발생했습니다.")
             
-            # 차트가 생성된 경우 경로 포함
+            # 차트가 생성된 경우 경로 포함 (PNG는 백그라운드에서 렌더링 중일 수 있음)
             if state.get("chart_path"):
-                final_answer += f"\n\n📊 차트가 생성되었습니다: {state['chart_path']}"
+                final_answer += f"\n\n📊 차트: {state['chart_path']}"
         else:
             final_answer = "죄송합니다. 현재는 성과 보고서 생성만 지원합니다."
         
         state["final_answer"] = final_answer
         return state
     
+    def reload_data(self):
+        """
+        DB가 다시 만들어지거나 증분 적재된 뒤 DB에서 파생된 상태(엔티티 사전, 스키마/SQL 캐시,
+        컬럼형 저장소)를 다시 읽습니다. 컴파일된 그래프와 LLM 클라이언트는 그대로 유지합니다.
+        증분 적재는 WAL에만 기록되어 DB 파일 mtime이 바뀌지 않을 수 있으므로 데이터 버전 변경 시 호출합니다.
+        """
+        with self._resolver_lock:
+            self._entity_resolver = None
+            self._entity_resolver_mtime = None
+        self.query_builder = QueryBuilder(self.db_file)
+        self.columnar_store = ColumnarStore.for_db(self.db_file)
+        # 첫 요청이 사전 로드를 기다리지 않도록 미리 로드
+        self._get_entity_resolver()
+    
+    def get_classifier_metrics(self) -> Dict[str, float]:
+        """로컬 작업 분류기 적중률 지표를 반환합니다."""
+        return self.task_classifier.metrics()
+    
+    def get_node_metrics(self) -> Dict[str, Dict[str, float]]:
+        """노드별 실행 시간(p50/p95), CPU, 조회 행 수, 토큰, 캐시 적중 요약을 반환합니다."""
+        return self.metrics.summary()
+    
+    def get_llm_metrics(self) -> Dict[str, int]:
+        """LLM 호출 병합 지표 (실제 호출 수, 진행 중 호출에 합류한 수, 현재 진행 중인 호출 수)."""
+        return self.llm_singleflight.stats()
+    
     def route_by_task_type(self, state: GraphState) -> str:
         """작업 타입에 따라 라우팅합니다."""
         return "performance_report" if state["task_type"] == "PerformanceReport" else "other"
     
+    def route_report_cache(self, state: GraphState) -> str:
+        """보고서 캐시 적중 여부에 따라 라우팅합니다."""
+        return "hit" if state.get("cache_hit") else "miss"
+    
     def route_h2h_decision(self, state: GraphState) -> str:
         """H2H 결정에 따라 라우팅합니다."""
         return "needs_review" if state["needs_human_review"] else "auto"
     
-    def run(self, user_input: str) -> str:
-        """시스템을 실행합니다."""
-        initial_state = {
+    def route_review(self, state: GraphState) -> str:
+        """검토 결과에 따라 라우팅합니다 (승인된 보고서만 캐시에 저장)."""
+        return "approved" if state.get("review_status") == "approved" else "rejected"
+    
+    def _initial_state(self, user_input: str, multi_turn: bool = False) -> GraphState:
+        """요청별 초기 상태를 생성합니다."""
+        return {
             "messages": [HumanMessage(content=user_input)],
+            "multi_turn": multi_turn,
+            "refinement": {},
+            "follow_up": None,
             "task_type": "",
             "client_or_region": "",
+            "query_filter": {},
             "sql_query": "",
-            "query_result": pd.DataFrame(),
+            "sql_params": [],
+            "query_plan": "",
+            "query_ref": None,
+            "query_rows": 0,
             "analysis_result": {},
             "chart_path": None,
+            "chart_json": None,
             "report": "",
             "needs_human_review": False,
+            "review_status": None,
+            "data_version": None,
+            "cache_hit": False,
             "final_answer": ""
         }
-        
-        result = self.graph.invoke(initial_state)
-        return result["final_answer"]
+    
+    def _session_input(self, snapshot, user_input: str):
+        """
+        세션 스레드의 그래프 입력을 반환합니다.
+        - 같은 요청이 노드 실패로 중단되었으면 None (실패한 노드부터 이어서 실행)
+        - 이전 요청이 있으면 요청별 값만 초기화하고 분석 대상, SQL, 조회 결과 참조, 후속 질문 조건은 세션에 남김
+          (메시지는 누적되어 후속 질문 판단에 사용)
+        """
+        if self._is_resumable(snapshot, user_input):
+            print(f"이전 실행을 이어서 진행합니다: {', '.join(snapshot.next)}")
+            return None
+        state = self._initial_state(user_input, multi_turn=True)
+        if not snapshot.values:
+            return state
+        return {key: state[key] for key in (
+            "messages", "multi_turn", "follow_up", "chart_path", "chart_json", "report",
+            "needs_human_review", "review_status", "cache_hit", "final_answer")}
+    
+    def _graph_for(self, thread_id: Optional[str]):
+        """세션 스레드는 SQLite 체크포인트 그래프, 임시 요청은 메모리 체크포인트 그래프를 사용합니다."""
+        return self.graph if thread_id is not None else self._ephemeral_graph
+    
+    @staticmethod
+    def _is_resumable(snapshot, user_input: str) -> bool:
+        """같은 요청이 노드 실패로 중단된 상태인지 확인합니다 (검토 대기는 제외)."""
+        if not snapshot.next or "human_review" in snapshot.next:
+            return False
+        messages = snapshot.values.get("messages") or []
+        return bool(messages) and messages[-1].content == user_input
+    
+    def _prepare_run(self, user_input: str, thread_id: Optional[str]):
+        """
+        (그래프 입력, 실행 설정)을 반환합니다.
+        thread_id가 있으면 세션 입력을 사용합니다 (_session_input: 실패한 요청 이어서 실행, 후속 질문).
+        thread_id가 없으면 이 요청만의 임시 스레드를 사용합니다 (실행 후 삭제).
+        """
+        config = self._run_config(thread_id or uuid.uuid4().hex)
+        if thread_id is not None:
+            return self._session_input(self.graph.get_state(config), user_input), config
+        return self._initial_state(user_input), config
+    
+    async def _aprepare_run(self, user_input: str, thread_id: Optional[str]):
+        """_prepare_run의 비동기 버전입니다."""
+        config = self._run_config(thread_id or uuid.uuid4().hex)
+        if thread_id is not None:
+            return self._session_input(await self.graph.aget_state(config), user_input), config
+        return self._initial_state(user_input), config
+    
+    def _finish_run(self, config: Dict[str, Any], ephemeral: bool):
+        """임시 스레드는 삭제하고, 세션 스레드는 최신 체크포인트(이어서 실행/검토 재개에 필요)만 남깁니다."""
+        thread_id = config["configurable"]["thread_id"]
+        try:
+            if ephemeral:
+                self._ephemeral_checkpointer.delete_thread(thread_id)
+            else:
+                prune_thread(self.checkpointer, thread_id)
+        except sqlite3.Error as e:
+            print(f"체크포인트 정리 오류: {e}")
+    
+    def _answer(self, values: Dict[str, Any]) -> str:
+        """최종 답변을 반환합니다. 검토 대기로 멈춘 경우 검토가 필요하다는 안내와 보고서 초안을 반환합니다."""
+        if values.get("final_answer"):
+            return values["final_answer"]
+        return self.generate_final_answer(dict(values))["final_answer"]
+    
+    def run(self, user_input: str, thread_id: Optional[str] = None) -> str:
+        """
+        시스템을 실행합니다.
+        thread_id(채팅 세션 ID)를 주면 체크포인트가 세션에 남아, 실패한 요청을 다시 보내면 실패한 노드부터 이어서 실행하고
+        검토가 필요한 보고서는 review()로 이어서 처리할 수 있습니다.
+        """
+        graph_input, config = self._prepare_run(user_input, thread_id)
+        try:
+            result = self._graph_for(thread_id).invoke(graph_input, config)
+        finally:
+            self._finish_run(config, ephemeral=thread_id is None)
+        return self._answer(result)
+    
+    def pending_review(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """검토 대기 중인 보고서(분석 대상, 보고서 초안)를 반환합니다. 없으면 None."""
+        snapshot = self.graph.get_state(self._run_config(thread_id))
+        if "human_review" not in snapshot.next:
+            return None
+        return {"client_or_region": snapshot.values.get("client_or_region"),
+                "report": snapshot.values.get("report", "")}
+    
+    def review(self, thread_id: str, approved: bool, report: Optional[str] = None) -> str:
+        """
+        검토 대기 중인 보고서를 승인/반려하고 그래프를 이어서 실행합니다 (앞선 노드는 다시 실행하지 않음).
+        report를 주면 검토자가 수정한 보고서로 바꿉니다. 승인된 보고서만 보고서 캐시에 저장됩니다.
+        """
+        config = self._run_config(thread_id)
+        if "human_review" not in self.graph.get_state(config).next:
+            return "검토 대기 중인 보고서가 없습니다."
+        update = {"review_status": "approved" if approved else "rejected", "needs_human_review": not approved}
+        if report is not None:
+            update["report"] = report
+        self.graph.update_state(config, update, as_node="human_review")
+        try:
+            result = self.graph.invoke(None, config)
+        finally:
+            self._finish_run(config, ephemeral=False)
+        return self._answer(result)
+    
+    def _describe_progress(self, node: str, update: Dict[str, Any]) -> Optional[str]:
+        """노드 완료 시 사용자에게 보여줄 진행 상황 메시지를 만듭니다."""
+        if node == "classify_task":
+            return f"작업 분류: {update.get('task_type')}"
+        if node == "parse_client_region":
+            return f"분석 대상: {update.get('client_or_region')}"
+        if node == "lookup_report_cache":
+            return "캐시된 보고서를 사용합니다" if update.get("cache_hit") else None
+        if node == "build_sql_query":
+            return "SQL 쿼리 생성 완료"
+        if node == "query_database":
+            return f"데이터 조회 완료: {update.get('query_rows', 0)}행"
+        if node == "refine_result":
+            condition = describe_refinement(update.get("refinement"))
+            if update.get("cache_hit"):
+                return f"후속 질문 ({condition}): 캐시된 보고서를 사용합니다"
+            return f"후속 질문: 이전 조회 결과에 조건을 적용합니다 ({condition})"
+        if node == "analyze_data":
+            return "데이터 분석 완료"
+        if node == "generate_charts":
+            return "차트 준비 완료" if update.get("chart_json") else None
+        if node == "h2h_decision":
+            return "사람의 검토가 필요합니다" if update.get("needs_human_review") else None
+        return None
+    
+    def _to_stream_events(self, mode: str, chunk: Any, final: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """LangGraph 스트림 청크를 progress/token/final 이벤트로 변환합니다."""
+        if mode == "messages":
+            message, metadata = chunk
+            # 보고서 생성 노드의 토큰만 사용자에게 전달 (분류/파싱 LLM 출력 제외)
+            if metadata.get("langgraph_node") == "generate_report" and message.content:
+                yield {"type": "token", "content": message.content}
+            return
+        
+        for node, update in (chunk or {}).items():
+            if not isinstance(update, dict):
+                continue
+            if "report" in update:
+                final["report"] = update["report"]
+            if update.get("chart_json"):
+                final["chart_json"] = update["chart_json"]
+            if node == "final_answer":
+                final["content"] = update.get("final_answer", "")
+                continue
+            message = self._describe_progress(node, update)
+            if message:
+                yield {"type": "progress", "node": node, "message": message}
+    
+    def _final_event(self, final: Dict[str, Any], values: Dict[str, Any], thread_id: Optional[str]) -> Dict[str, Any]:
+        """final 이벤트를 완성합니다 (이어서 실행한 경우 이전 실행의 보고서/차트, 검토 대기 여부 포함)."""
+        final["content"] = final["content"] or self._answer(values)
+        final["report"] = final["report"] or values.get("report", "")
+        final["chart_json"] = final["chart_json"] or values.get("chart_json")
+        final["review_pending"] = bool(values.get("needs_human_review")) and not values.get("final_answer")
+        final["thread_id"] = thread_id
+        return {"type": "final", **final}
+    
+    def stream(self, user_input: str, thread_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        시스템을 실행하며 이벤트를 스트리밍합니다. thread_id는 run()과 같습니다.
+        
+        이벤트 형식:
+            {"type": "progress", "node": str, "message": str}  노드 진행 상황
+            {"type": "token", "content": str}                  보고서 토큰
+            {"type": "final", "content": str, "report": str,
+             "chart_json": Optional[str], "review_pending": bool,
+             "thread_id": Optional[str]}                      최종 답변 (마지막 이벤트)
+        """
+        final = {"content": "", "report": "", "chart_json": None}
+        graph_input, config = self._prepare_run(user_input, thread_id)
+        try:
+            graph = self._graph_for(thread_id)
+            for mode, chunk in graph.stream(graph_input, config, stream_mode=["updates", "messages"]):
+                yield from self._to_stream_events(mode, chunk, final)
+            values = graph.get_state(config).values
+        finally:
+            self._finish_run(config, ephemeral=thread_id is None)
+        yield self._final_event(final, values, thread_id)
+    
+    async def astream(self, user_input: str, thread_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """stream의 비동기 버전입니다."""
+        final = {"content": "", "report": "", "chart_json": None}
+        graph_input, config = await self._aprepare_run(user_input, thread_id)
+        try:
+            graph = self._graph_for(thread_id)
+            async for mode, chunk in graph.astream(graph_input, config, stream_mode=["updates", "messages"]):
+                for event in self._to_stream_events(mode, chunk, final):
+                    yield event
+            values = (await graph.aget_state(config)).values
+        finally:
+            await asyncio.to_thread(self._finish_run, config, thread_id is None)
+        yield self._final_event(final, values, thread_id)
+    
+    async def arun(self, user_input: str, thread_id: Optional[str] = None) -> str:
+        """
+        시스템을 비동기로 실행합니다.
+        LLM 호출은 ainvoke, DB 조회는 워커 스레드로 처리되어 한 프로세스에서 여러 요청을 동시에 처리할 수 있습니다.
+        """
+        graph_input, config = await self._aprepare_run(user_input, thread_id)
+        try:
+            result = await self._graph_for(thread_id).ainvoke(graph_input, config)
+        finally:
+            await asyncio.to_thread(self._finish_run, config, thread_id is None)
+        return self._answer(result)
 
 def main():
     """메인 실행 함수"""
@@ -0,0 +1,108 @@
+"""
+LLM 호출 single-flight (동일 요청 병합)
+
+데이터 갱신 직후 여러 세션이 같은 보고서("전체 매출" 등)를 동시에 요청하면 보고서 캐시에 결과가
+생기기 전이라 같은 GPT-4o 호출이 세션 수만큼 나갑니다. SingleFlight는 (모델, temperature, 메시지)가
+같은 요청이 진행 중이면 새로 호출하지 않고 진행 중인 호출의 결과를 함께 받습니다.
+
+- 결과를 저장하지 않습니다 (완료 후 같은 요청은 다시 호출). 완료된 결과 재사용은 ReportCache가 담당합니다.
+- 스레드(stream/run)와 asyncio(astream/arun) 호출이 섞여도 같은 진행 중 호출을 공유합니다.
+- 먼저 시작한 호출(leader)이 실패하면 같은 예외를 기다리던 호출에도 전달합니다.
+  leader가 취소되면 기다리던 호출 중 하나가 다시 호출합니다.
+- 합류한 호출은 LLM을 호출하지 않으므로 토큰 스트리밍 없이 완성된 응답을 받습니다.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Sequence
+
+
+def request_key(llm, messages: Sequence[Any]) -> str:
+    """(모델 클래스, 모델 이름, temperature, 메시지 타입/내용)의 SHA-256 해시."""
+    payload = json.dumps([
+        type(llm).__name__,
+        getattr(llm, "model_name", None) or getattr(llm, "model", None),
+        getattr(llm, "temperature", None),
+        [[getattr(message, "type", type(message).__name__), message.content] for message in messages],
+    ], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """키가 같은 진행 중 호출을 하나로 병합합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> 진행 중 호출의 결과 (스레드/이벤트 루프 간 공유를 위해 concurrent.futures.Future 사용)
+        self._in_flight: Dict[str, concurrent.futures.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: str):
+        """(future, leader 여부)를 반환합니다."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = concurrent.futures.Future()
+            self._in_flight[key] = future
+            self.calls += 1
+            return future, True
+
+    def _finish(self, key: str, future: concurrent.futures.Future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """func()를 호출합니다. 같은 key의 호출이 진행 중이면 그 결과를 기다려 반환합니다."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return future.result()
+                except concurrent.futures.CancelledError:
+                    continue  # leader가 취소됨: 다시 시도
+            try:
+                result = func()
+            except BaseException as e:
+                self._finish(key, future)
+                future.set_exception(e)
+                raise
+            self._finish(key, future)
+            future.set_result(result)
+            return result
+
+    async def ado(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """do의 비동기 버전입니다."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    # 기다리던 쪽이 취소되어도 공유 future(다른 대기자)는 취소하지 않음
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except asyncio.CancelledError:
+                    if future.cancelled():
+                        continue  # leader가 취소됨: 다시 시도
+                    raise
+            try:
+                result = await func()
+            except asyncio.CancelledError:
+                self._finish(key, future)
+                future.cancel()
+                raise
+            except BaseException as e:
+                self._finish(key, future)
+                future.set_exception(e)
+                raise
+            self._finish(key, future)
+            future.set_result(result)
+            return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
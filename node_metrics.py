@@ -0,0 +1,275 @@
+"""
+LangGraph 노드 단위 계측
+
+PerformanceReportSystem의 모든 노드를 감싸 노드 실행마다 다음을 기록합니다.
+- wall_ms: 경과 시간, cpu_ms: 노드를 실행한 스레드의 CPU 시간
+- rows: 조회된 행 수 (query_rows), cache_hit: 보고서 캐시 적중
+- prompt_tokens / completion_tokens: 노드 안에서 호출된 LLM 토큰 사용량 (콜백으로 수집)
+
+기록은 구조화된 JSON 한 줄로 로그(logger "performance_report.metrics", 선택적으로 JSONL 파일)에 남고,
+노드별 최근 N건으로 p50/p95를 계산하며, Prometheus 텍스트 형식으로 내보낼 수 있습니다
+(node_exporter textfile collector 등에서 읽도록 파일에 주기적으로 기록).
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger("performance_report.metrics")
+
+# 노드별로 백분위 계산에 사용하는 최근 실행 수
+DEFAULT_WINDOW = 1000
+# Prometheus 파일 최소 기록 간격 (초)
+DEFAULT_PROM_INTERVAL_SECONDS = 5.0
+# Prometheus 지표 이름 접두사
+METRIC_PREFIX = "report_node"
+
+# 현재 실행 중인 노드의 기록 (LLM 토큰 콜백이 여기에 더함)
+_current_record: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "node_metrics_record", default=None
+)
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """LLM 응답의 토큰 사용량을 현재 노드 기록에 더합니다."""
+
+    # 비동기 실행에서도 워커 스레드로 넘기지 않고 바로 호출
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs):
+        record = _current_record.get()
+        if record is None:
+            return
+        prompt, completion = _token_usage(response)
+        record["prompt_tokens"] += prompt
+        record["completion_tokens"] += completion
+        record["llm_calls"] += 1
+
+
+def _token_usage(response) -> tuple:
+    """LLMResult에서 (prompt, completion) 토큰 수를 꺼냅니다 (usage_metadata 우선, 없으면 llm_output)."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not (prompt or completion):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt = usage.get("prompt_tokens", 0)
+        completion = usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+def _new_record(node: str) -> Dict[str, Any]:
+    return {
+        "node": node, "wall_ms": 0.0, "cpu_ms": 0.0, "rows": 0, "cache_hit": False,
+        "prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0, "error": None,
+    }
+
+
+def _snapshot(state: Any) -> tuple:
+    """노드 실행 전 (query_ref, cache_hit). 상태 전체를 반환하는 노드가 이전 값을 다시 세지 않도록 비교용."""
+    if not isinstance(state, dict):
+        return None, False
+    return state.get("query_ref"), bool(state.get("cache_hit"))
+
+
+def _observe_update(record: Dict[str, Any], before: tuple, update: Any):
+    """노드가 새로 만든 조회 결과의 행 수와 새로 발생한 캐시 적중을 기록합니다."""
+    if not isinstance(update, dict):
+        return
+    ref = update.get("query_ref")
+    if ref is not None and ref is not before[0]:
+        record["rows"] = update.get("query_rows", 0)
+    if update.get("cache_hit") and not before[1]:
+        record["cache_hit"] = True
+
+
+class NodeMetrics:
+    """노드 실행 기록 저장소 (스레드 안전)"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW, log_file: Optional[str] = None,
+                 prom_file: Optional[str] = None,
+                 prom_interval_seconds: float = DEFAULT_PROM_INTERVAL_SECONDS):
+        self.window = window
+        self.log_file = log_file
+        self.prom_file = prom_file
+        self.prom_interval_seconds = prom_interval_seconds
+        self.callback = TokenUsageCallback()
+        self._lock = threading.Lock()
+        self._wall: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._last_prom_write = 0.0
+
+    # ----- 계측 -----
+
+    def instrument(self, node: str, func: Callable) -> Callable:
+        """동기 노드 함수를 계측 래퍼로 감쌉니다."""
+        @wraps(func)
+        def wrapper(state):
+            record = _new_record(node)
+            token = _current_record.set(record)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            before = _snapshot(state)
+            try:
+                update = func(state)
+                _observe_update(record, before, update)
+                return update
+            except Exception as e:
+                record["error"] = type(e).__name__
+                raise
+            finally:
+                _current_record.reset(token)
+                record["wall_ms"] = (time.perf_counter() - wall) * 1000
+                record["cpu_ms"] = (time.thread_time() - cpu) * 1000
+                self.record(record)
+        return wrapper
+
+    def instrument_async(self, node: str, func: Callable) -> Callable:
+        """
+        비동기 노드 함수를 계측 래퍼로 감쌉니다.
+        cpu_ms는 이벤트 루프 스레드 기준이라 await 중 다른 요청이 쓴 CPU가 섞일 수 있습니다.
+        """
+        @wraps(func)
+        async def wrapper(state):
+            record = _new_record(node)
+            token = _current_record.set(record)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            before = _snapshot(state)
+            try:
+                update = await func(state)
+                _observe_update(record, before, update)
+                return update
+            except Exception as e:
+                record["error"] = type(e).__name__
+                raise
+            finally:
+                _current_record.reset(token)
+                record["wall_ms"] = (time.perf_counter() - wall) * 1000
+                record["cpu_ms"] = (time.thread_time() - cpu) * 1000
+                self.record(record)
+        return wrapper
+
+    def record(self, record: Dict[str, Any]):
+        """노드 실행 한 건을 저장하고 JSON 로그로 남깁니다."""
+        record = {"ts": time.time(), **record}
+        node = record["node"]
+        with self._lock:
+            self._wall[node].append(record["wall_ms"])
+            totals = self._totals[node]
+            totals["count"] += 1
+            totals["wall_seconds"] += record["wall_ms"] / 1000
+            totals["cpu_seconds"] += record["cpu_ms"] / 1000
+            totals["rows"] += record["rows"]
+            totals["prompt_tokens"] += record["prompt_tokens"]
+            totals["completion_tokens"] += record["completion_tokens"]
+            totals["cache_hits"] += int(record["cache_hit"])
+            totals["errors"] += int(record["error"] is not None)
+            write_prom = (self.prom_file is not None
+                          and record["ts"] - self._last_prom_write >= self.prom_interval_seconds)
+            if write_prom:
+                self._last_prom_write = record["ts"]
+
+        line = json.dumps(record, ensure_ascii=False)
+        logger.info(line)
+        if self.log_file:
+            with self._lock, open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        if write_prom:
+            self.write_prometheus()
+
+    # ----- 조회 -----
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """노드별 실행 수, p50/p95(ms), 누적 CPU/행/토큰/캐시 적중."""
+        with self._lock:
+            samples = {node: np.fromiter(values, dtype=np.float64) for node, values in self._wall.items()}
+            totals = {node: dict(values) for node, values in self._totals.items()}
+        summary = {}
+        for node, wall in samples.items():
+            p50, p95 = np.percentile(wall, [50, 95]) if len(wall) else (0.0, 0.0)
+            summary[node] = {
+                "count": int(totals[node]["count"]),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "cpu_seconds": totals[node]["cpu_seconds"],
+                "rows": int(totals[node]["rows"]),
+                "prompt_tokens": int(totals[node]["prompt_tokens"]),
+                "completion_tokens": int(totals[node]["completion_tokens"]),
+                "cache_hits": int(totals[node]["cache_hits"]),
+                "errors": int(totals[node]["errors"]),
+            }
+        return summary
+
+    def render_prometheus(self) -> str:
+        """Prometheus 텍스트 노출 형식으로 지표를 반환합니다."""
+        summary = self.summary()
+        with self._lock:
+            totals = {node: dict(values) for node, values in self._totals.items()}
+
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{suffix}{{{label_text}}} {value:.6g}")
+
+        nodes = sorted(summary)
+        metric("duration_seconds", "summary", "Node wall time (quantiles over the recent window).", [
+            sample for node in nodes for sample in (
+                ("", {"node": node, "quantile": "0.5"}, summary[node]["p50_ms"] / 1000),
+                ("", {"node": node, "quantile": "0.95"}, summary[node]["p95_ms"] / 1000),
+                ("_sum", {"node": node}, totals[node]["wall_seconds"]),
+                ("_count", {"node": node}, totals[node]["count"]),
+            )
+        ])
+        metric("cpu_seconds_total", "counter", "Node CPU time.",
+               [("", {"node": node}, totals[node]["cpu_seconds"]) for node in nodes])
+        metric("rows_total", "counter", "Rows fetched by the node.",
+               [("", {"node": node}, totals[node]["rows"]) for node in nodes])
+        metric("tokens_total", "counter", "LLM tokens used by the node.", [
+            sample for node in nodes for sample in (
+                ("", {"node": node, "kind": "prompt"}, totals[node]["prompt_tokens"]),
+                ("", {"node": node, "kind": "completion"}, totals[node]["completion_tokens"]),
+            )
+        ])
+        metric("cache_hits_total", "counter", "Report cache hits.",
+               [("", {"node": node}, totals[node]["cache_hits"]) for node in nodes])
+        metric("errors_total", "counter", "Node executions that raised.",
+               [("", {"node": node}, totals[node]["errors"]) for node in nodes])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Optional[str] = None):
+        """Prometheus 텍스트를 파일로 기록합니다 (임시 파일에 쓴 뒤 교체)."""
+        path = path or self.prom_file
+        if not path:
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"지표 파일 기록 오류: {e}")
+
+    def reset(self):
+        with self._lock:
+            self._wall.clear()
+            self._totals.clear()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
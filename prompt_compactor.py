@@ -0,0 +1,180 @@
+"""
+generate_report 프롬프트용 분석 결과 압축기
+
+분석 결과(analysis_engine.AnalysisResult.to_dict)를 토큰 예산 안에 들어가도록 줄입니다.
+- 숫자는 유효 숫자 4자리로 반올림하고, 비율은 소수점 1자리 퍼센트로 표시합니다.
+- 월별 시계열은 최근 N개월만 남기고 이전 기간은 합계/월 수로 요약합니다.
+- 항목 순위는 상위 N개와 "기타"로 요약합니다.
+- 가장 자세한 단계부터 예산에 들어갈 때까지 단계를 낮추므로 월/항목 수와 관계없이 크기가 제한됩니다.
+
+토큰 수는 tiktoken으로 세며, tiktoken 인코딩을 사용할 수 없으면(오프라인 등) 보수적인 로컬 추정치를 사용합니다.
+"""
+
+import json
+import math
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# 분석 결과 JSON에 허용하는 기본 토큰 수
+DEFAULT_TOKEN_BUDGET = 600
+
+# (최근 개월 수, 상위 항목 수) 압축 단계. 앞쪽이 더 자세함 (None = 전체)
+COMPACTION_LEVELS: Tuple[Tuple[Optional[int], int], ...] = (
+    (None, 5), (12, 5), (12, 3), (6, 3), (3, 3), (3, 1), (1, 0), (0, 0),
+)
+
+# 월별 시계열 키 (최근 N개월만 유지, "N개월_이동평균"도 포함)
+SERIES_KEYS = ("월별_분석", "전월대비_증감률", "전년동월대비_증감률")
+# 항목 순위 키
+RANKING_KEYS = ("상위_항목", "하위_항목")
+# 퍼센트로 표시할 비율 키 (이름에 포함되면 적용)
+RATIO_MARKERS = ("증감률", "비중", "비율")
+
+_HANGUL = re.compile(r"[가-힣ㄱ-ㆎ]")
+_DIGITS = re.compile(r"\d+")
+_ASCII_WORD = re.compile(r"[A-Za-z]+")
+_OTHER = re.compile(r"[^\s\w]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    로컬 토큰 수 추정치 (tiktoken이 없을 때 사용).
+    한글은 글자당 1, 숫자는 3자리당 1, 영문은 4글자당 1, 기호는 1로 세어 실제보다 약간 크게 잡습니다.
+    """
+    hangul = len(_HANGUL.findall(text))
+    digits = sum(math.ceil(len(run) / 3) for run in _DIGITS.findall(text))
+    words = sum(math.ceil(len(word) / 4) for word in _ASCII_WORD.findall(text))
+    symbols = len(_OTHER.findall(text))
+    return hangul + digits + words + symbols
+
+
+class TokenCounter:
+    """모델 토크나이저(tiktoken) 또는 로컬 추정치로 토큰 수를 셉니다."""
+
+    _encodings: Dict[str, Any] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model: str = "gpt-4o"):
+        self.model = model
+        self._encoding = self._load_encoding(model)
+
+    @classmethod
+    def _load_encoding(cls, model: str):
+        with cls._lock:
+            if model not in cls._encodings:
+                try:
+                    import tiktoken
+                    cls._encodings[model] = tiktoken.encoding_for_model(model)
+                except Exception:
+                    # 미설치/오프라인(인코딩 파일 다운로드 실패)이면 로컬 추정
+                    cls._encodings[model] = None
+            return cls._encodings[model]
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return estimate_tokens(text)
+
+
+def round_number(value: Any, ratio: bool = False) -> Any:
+    """유효 숫자 4자리로 반올림합니다. ratio=True면 소수점 1자리 퍼센트 값으로 바꿉니다."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if not math.isfinite(value):
+        return None
+    if ratio:
+        return round(value * 100, 1)
+    if value == 0:
+        return 0
+    rounded = float(f"{value:.4g}")
+    return int(rounded) if abs(rounded) >= 1000 or rounded.is_integer() else rounded
+
+
+def _is_ratio(key: str) -> bool:
+    return any(marker in key for marker in RATIO_MARKERS)
+
+
+def _round_tree(value: Any, ratio: bool = False) -> Any:
+    if isinstance(value, dict):
+        return {
+            (f"{key}(%)" if _is_ratio(key) else key):
+                _round_tree(item, ratio or _is_ratio(key))
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_round_tree(item, ratio) for item in value]
+    return round_number(value, ratio)
+
+
+def _trim_series(series: Dict[str, Any], recent: Optional[int], summarize: bool) -> Dict[str, Any]:
+    """최근 recent개월만 남기고, summarize=True면 이전 기간을 합계로 요약합니다."""
+    if recent is None or len(series) <= recent:
+        return dict(series)
+    items = list(series.items())
+    kept = dict(items[len(items) - recent:]) if recent else {}
+    if summarize:
+        earlier = items[:len(items) - recent]
+        values = [value for _, value in earlier if value is not None]
+        kept = {
+            "이전_기간": f"{earlier[0][0]}~{earlier[-1][0]}",
+            "이전_기간_합계": sum(values),
+            "이전_기간_월수": len(earlier),
+            **kept,
+        }
+    return kept
+
+
+def _trim_ranking(entries: List[Dict[str, Any]], top_n: int, total: Optional[float]) -> List[Dict[str, Any]]:
+    """상위 top_n개만 남기고, 전체 합계가 있으면 나머지를 "기타"로 묶습니다."""
+    kept = [dict(entry) for entry in entries[:top_n]]
+    if total is None:
+        return kept
+    kept_total = sum(entry.get("합계") or 0 for entry in kept)
+    kept_share = sum(entry.get("비중") or 0 for entry in kept)
+    if total - kept_total > 0:
+        kept.append({"항목": "기타", "합계": total - kept_total, "비중": max(0.0, 1.0 - kept_share)})
+    return kept
+
+
+class PromptCompactor:
+    """분석 결과를 토큰 예산 안의 compact JSON 문자열로 변환합니다."""
+
+    def __init__(self, budget_tokens: int = DEFAULT_TOKEN_BUDGET, counter: Optional[TokenCounter] = None):
+        self.budget_tokens = budget_tokens
+        self.counter = counter or TokenCounter()
+
+    def _level(self, analysis: Dict[str, Any], recent: Optional[int], top_n: int) -> Dict[str, Any]:
+        compact: Dict[str, Any] = {}
+        total = analysis.get("합계")
+        months = analysis.get("분석_월") or []
+        for key, value in analysis.items():
+            if key == "분석_월":
+                if months:
+                    compact["분석_기간"] = f"{months[0]}~{months[-1]} ({len(months)}개월)"
+            elif (key in SERIES_KEYS or key.endswith("이동평균")) and isinstance(value, dict):
+                if recent != 0 or key == "월별_분석":
+                    trimmed = _trim_series(value, recent, summarize=key == "월별_분석")
+                    if trimmed:
+                        compact[key] = trimmed
+            elif key in RANKING_KEYS and isinstance(value, list):
+                if top_n:
+                    # "기타"는 상위 항목에만 붙임 (하위 항목은 꼬리 쪽 참고용)
+                    compact[key] = _trim_ranking(value, top_n, total if key == "상위_항목" else None)
+            else:
+                compact[key] = value
+        return _round_tree(compact)
+
+    def compact(self, analysis: Dict[str, Any]) -> Tuple[str, int]:
+        """(JSON 문자열, 토큰 수)를 반환합니다. 가장 자세하면서 예산에 들어가는 단계를 고릅니다."""
+        text, tokens = "", 0
+        for recent, top_n in COMPACTION_LEVELS:
+            text = json.dumps(self._level(analysis, recent, top_n), ensure_ascii=False, separators=(",", ":"))
+            tokens = self.counter.count(text)
+            if tokens <= self.budget_tokens:
+                break
+        return text, tokens
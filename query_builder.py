@@ -0,0 +1,576 @@
+"""
+구조화된 필터로부터 파라미터 바인딩 SQL을 생성하는 쿼리 빌더
+
+값은 항상 ? 파라미터로 전달하므로 SQL 텍스트는 필터의 "형태"에만 의존합니다.
+형태별 SQL 텍스트는 제한된 크기의 캐시에 보관되고, 같은 텍스트가 반복되면
+SQLite 커넥션의 prepared statement 캐시도 그대로 재사용됩니다.
+집계(aggregation)를 SQL에서 수행하여 pandas로 넘어오는 행 수를 줄이고,
+필터가 롤업 테이블의 단위(전체/거래처/품목)에 맞으면 팩트 대신 롤업에서 집계합니다.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from data_processor import DIMENSION_COLUMNS, get_month_columns
+from db_pool import read_connection
+
+# 지원하는 집계 방식
+AGGREGATIONS = ("rows", "monthly", "product_monthly", "client", "product", "strength")
+
+# 그룹 집계 결과의 키 컬럼 (long 스키마 표현식, wide 스키마 컬럼)
+GROUP_KEYS = {
+    "client": ("c.name", '"ID"'),
+    "product": ("p.product", '"품목"'),
+    "strength": ("p.strength", '"함량"'),
+}
+
+# 롤업 범위별로 사용할 롤업 테이블과 조인할 차원
+ROLLUP_SOURCES = {
+    "all": ("rollup_client_month", "client_id", "dim_client c ON c.client_id = r.client_id"),
+    "client": ("rollup_client_month", "client_id", "dim_client c ON c.client_id = r.client_id"),
+    "product": ("rollup_product_month", "product_id", "dim_product p ON p.product_id = r.product_id"),
+}
+
+# 롤업 범위별로 답할 수 있는 그룹 집계
+ROLLUP_GROUPS = {
+    "all": ("product_monthly", "client", "product", "strength"),
+    "client": ("product_monthly", "client"),
+    "product": ("product_monthly", "product", "strength"),
+}
+
+# 필터 없음으로 간주하는 대상 값
+ALL_ENTITY_VALUES = ("", "전체")
+
+DEFAULT_STATEMENT_CACHE_SIZE = 128
+
+
+@dataclass(frozen=True)
+class QueryFilter:
+    """
+    entity: 거래처/품목/함량 부분 문자열 ("전체"/None이면 필터 없음)
+    months: (시작 월, 종료 월) YYYY-MM, 양 끝 포함
+    aggregation: rows | monthly | product_monthly | client | product | strength
+        product_monthly: 품목×월 집계 (product, month, count, sum, sumsq, min, max, item_count)
+            품목별 item_count는 대상에 속한 품목 라인 수이며, 값이 없는 품목은 month가 NULL인 행 하나로 나옵니다.
+            월별로 합치면 monthly와 같고, 후속 질문에서 월 범위/품목으로 메모리에서 좁힐 수 있습니다.
+    top_n: client/product/strength 집계 시 상위 N개
+    """
+    entity: Optional[str] = None
+    months: Optional[Tuple[str, str]] = None
+    aggregation: str = "monthly"
+    top_n: Optional[int] = None
+
+    def __post_init__(self):
+        if self.aggregation not in AGGREGATIONS:
+            raise ValueError(f"지원하지 않는 집계 방식입니다: {self.aggregation}")
+
+    @property
+    def has_entity(self) -> bool:
+        return self.entity is not None and self.entity.strip() not in ALL_ENTITY_VALUES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QueryFilter":
+        months = data.get("months")
+        return cls(
+            entity=data.get("entity"),
+            months=tuple(months) if months else None,
+            aggregation=data.get("aggregation", "monthly"),
+            top_n=data.get("top_n"),
+        )
+
+
+@dataclass(frozen=True)
+class SchemaInfo:
+    """쿼리 생성에 필요한 DB 스키마 정보"""
+    long: bool
+    search_index: bool
+    wide_view: bool
+    rollup: bool
+    columns: Tuple[str, ...]
+    months: Tuple[str, ...]
+
+
+def quote_identifier(name: str) -> str:
+    return '"{}"'.format(str(name).replace('"', '""'))
+
+
+def load_schema_info(conn: sqlite3.Connection) -> SchemaInfo:
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    columns = tuple(row[1] for row in conn.execute("PRAGMA table_info(sales_data)"))
+    return SchemaInfo(
+        long="sales_fact" in names,
+        search_index="sales_search" in names,
+        wide_view="sales_wide" in names,
+        rollup="rollup_month" in names,
+        columns=columns,
+        months=tuple(get_month_columns(columns)),
+    )
+
+
+class QueryBuilder:
+    """QueryFilter -> (SQL, 파라미터)"""
+
+    def __init__(self, db_file: str, cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE):
+        self.db_file = db_file
+        self.cache_size = cache_size
+        self._statements: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._schema: Optional[SchemaInfo] = None
+        self._schema_identity = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def schema(self) -> SchemaInfo:
+        """DB 스키마 정보를 반환합니다. DB 파일이 바뀌면 다시 읽습니다."""
+        st = os.stat(self.db_file)
+        identity = (st.st_dev, st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            if self._schema is not None and self._schema_identity == identity:
+                return self._schema
+        with read_connection(self.db_file) as conn:
+            schema = load_schema_info(conn)
+        with self._lock:
+            if self._schema_identity != identity:
+                # 스키마가 바뀌면 SQL 텍스트도 달라지므로 캐시를 비움
+                self._statements.clear()
+            self._schema, self._schema_identity = schema, identity
+        return schema
+
+    def cache_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._statements), "hits": self.cache_hits, "misses": self.cache_misses}
+
+    def build(self, query_filter: QueryFilter) -> Tuple[str, List[Any]]:
+        """필터에 맞는 SQL과 바인딩 파라미터를 반환합니다."""
+        sql, params, _ = self.build_with_plan(query_filter)
+        return sql, params
+
+    def build_with_plan(self, query_filter: QueryFilter) -> Tuple[str, List[Any], str]:
+        """
+        SQL, 바인딩 파라미터, 원천(plan과 같은 값)을 함께 반환합니다.
+        롤업 범위 판별(차원 테이블 EXISTS 조회)을 한 번만 수행하므로 SQL과 원천이 모두 필요하면 이 메서드를 사용합니다.
+        """
+        schema = self.schema()
+        match_mode = self._match_mode(query_filter, schema)
+        months = self._select_months(query_filter, schema)
+        rollup_scope = self._rollup_scope(query_filter, schema)
+
+        # SQL 텍스트를 결정하는 요소만 키로 사용 (값은 파라미터)
+        shape = (
+            query_filter.aggregation, match_mode,
+            query_filter.months is not None,
+            query_filter.top_n is not None,
+            months if not schema.long or query_filter.aggregation == "rows" else None,
+            rollup_scope,
+        )
+        plan = self._plan(query_filter, schema, rollup_scope)
+        if rollup_scope is not None:
+            sql = self._cached_statement(shape, lambda: self._render_rollup(query_filter, rollup_scope))
+            return sql, self._rollup_params(query_filter, rollup_scope), plan
+        sql = self._cached_statement(shape, lambda: self._render(query_filter, schema, match_mode, months))
+        return sql, self._params(query_filter, schema, match_mode), plan
+
+    def plan(self, query_filter: QueryFilter) -> str:
+        """필터가 읽을 원천을 반환합니다: rollup:all | rollup:client | rollup:product | fact:client | fact | wide"""
+        schema = self.schema()
+        return self._plan(query_filter, schema, self._rollup_scope(query_filter, schema))
+
+    @staticmethod
+    def _plan(query_filter: QueryFilter, schema: SchemaInfo, rollup_scope: Optional[str]) -> str:
+        if rollup_scope == "client" and query_filter.aggregation == "product_monthly":
+            return "fact:client"
+        if rollup_scope is not None:
+            return f"rollup:{rollup_scope}"
+        return "fact" if schema.long else "wide"
+
+    def build_grouped_monthly(self, group: str = "client") -> str:
+        """
+        모든 거래처(client) 또는 품목(product)의 월별 집계를 한 번에 조회하는 SQL을 반환합니다 (파라미터 없음).
+        결과 컬럼: {group}, month, count, sum, sumsq, min, max, item_count (group, month 순 정렬)
+        일괄 보고서 생성에서 항목마다 쿼리를 실행하는 대신 사용합니다.
+        """
+        if group not in ("client", "product"):
+            raise ValueError(f"지원하지 않는 그룹입니다: {group}")
+        schema = self.schema()
+        shape = ("grouped_monthly", group, schema.long, schema.rollup, None if schema.long else schema.months)
+        return self._cached_statement(shape, lambda: self._render_grouped_monthly(group, schema))
+
+    def _render_grouped_monthly(self, group: str, schema: SchemaInfo) -> str:
+        if not schema.long:
+            _, key_col = GROUP_KEYS[group]
+            selects = [
+                "SELECT {0} AS {1}, '{2}' AS month, COUNT({3}) AS count, SUM({3}) AS sum, "
+                "SUM({3} * {3}) AS sumsq, MIN({3}) AS min, MAX({3}) AS max, COUNT(*) AS item_count "
+                "FROM sales_data GROUP BY {0}".format(
+                    key_col, group, month.replace("'", "''"), quote_identifier(month))
+                for month in schema.months
+            ]
+            if not selects:
+                return f"SELECT NULL AS {group}, NULL AS month LIMIT 0"
+            return (
+                f"SELECT * FROM ({' UNION ALL '.join(selects)}) "
+                f"WHERE count > 0 ORDER BY {group}, month"
+            )
+
+        key_expr, _ = GROUP_KEYS[group]
+        dim_join = {
+            "client": "dim_client c ON c.client_id = {0}.client_id",
+            "product": "dim_product p ON p.product_id = {0}.product_id",
+        }[group]
+        item_counts = (
+            f"SELECT {key_expr} AS key, COUNT(*) AS item_count "
+            f"FROM sales_item i JOIN {dim_join.format('i')} GROUP BY {key_expr}"
+        )
+        if schema.rollup:
+            table = "rollup_client_month" if group == "client" else "rollup_product_month"
+            source = f"{table} r JOIN {dim_join.format('r')}"
+            month = "r.month"
+            aggregates = ("SUM(r.count) AS count, SUM(r.sum) AS sum, SUM(r.sumsq) AS sumsq, "
+                          "MIN(r.min) AS min, MAX(r.max) AS max")
+        else:
+            source = f"sales_fact f JOIN {dim_join.format('f')}"
+            month = "f.month"
+            aggregates = ("COUNT(f.amount) AS count, SUM(f.amount) AS sum, "
+                          "SUM(f.amount * f.amount) AS sumsq, MIN(f.amount) AS min, MAX(f.amount) AS max")
+        return (
+            f"WITH item_counts AS ({item_counts}), "
+            f"monthly AS (SELECT {key_expr} AS key, {month} AS month, {aggregates} "
+            f"FROM {source} GROUP BY {key_expr}, {month}) "
+            f"SELECT m.key AS {group}, m.month, m.count, m.sum, m.sumsq, m.min, m.max, n.item_count "
+            "FROM monthly m JOIN item_counts n ON n.key = m.key ORDER BY m.key, m.month"
+        )
+
+    def build_grouped_product_totals(self, group: str = "client") -> str:
+        """
+        모든 거래처(client) 또는 품목(product)의 품목별 합계를 한 번에 조회하는 SQL을 반환합니다 (파라미터 없음).
+        결과 컬럼: entity, product, total (값이 있는 품목만, product_monthly 분석의 품목 순위와 같은 기준)
+        일괄 보고서에서 build_grouped_monthly 결과에 항목별 품목 순위를 붙일 때 사용합니다.
+        """
+        if group not in ("client", "product"):
+            raise ValueError(f"지원하지 않는 그룹입니다: {group}")
+        schema = self.schema()
+        shape = ("grouped_product_totals", group, schema.long, schema.rollup,
+                 None if schema.long else schema.months)
+        return self._cached_statement(shape, lambda: self._render_grouped_product_totals(group, schema))
+
+    def _render_grouped_product_totals(self, group: str, schema: SchemaInfo) -> str:
+        if not schema.long:
+            _, key_col = GROUP_KEYS[group]
+            _, product_col = GROUP_KEYS["product"]
+            if not schema.months:
+                return "SELECT NULL AS entity, NULL AS product, NULL AS total LIMIT 0"
+            total_expr = " + ".join(f"TOTAL({quote_identifier(month)})" for month in schema.months)
+            count_expr = " + ".join(f"COUNT({quote_identifier(month)})" for month in schema.months)
+            return (
+                f"SELECT {key_col} AS entity, {product_col} AS product, {total_expr} AS total "
+                f"FROM sales_data GROUP BY {key_col}, {product_col} HAVING {count_expr} > 0 "
+                "ORDER BY entity, product"
+            )
+
+        key_expr, _ = GROUP_KEYS[group]
+        if group == "product" and schema.rollup:
+            # 품목 그룹은 품목 롤업으로 충분 (거래처 구분 불필요)
+            source = "rollup_product_month r JOIN dim_product p ON p.product_id = r.product_id"
+            total, count = "SUM(r.sum)", "SUM(r.count)"
+        else:
+            # 거래처 롤업에는 품목 구분이 없으므로 팩트에서 (거래처, 품목)별로 집계
+            source = ("sales_fact r JOIN dim_client c ON c.client_id = r.client_id "
+                      "JOIN dim_product p ON p.product_id = r.product_id")
+            total, count = "SUM(r.amount)", "COUNT(r.amount)"
+        return (
+            f"SELECT {key_expr} AS entity, p.product AS product, {total} AS total "
+            f"FROM {source} GROUP BY {key_expr}, p.product HAVING {count} > 0 ORDER BY entity, product"
+        )
+
+    def _cached_statement(self, shape: tuple, render: Callable[[], str]) -> str:
+        with self._lock:
+            sql = self._statements.get(shape)
+            if sql is not None:
+                self._statements.move_to_end(shape)
+                self.cache_hits += 1
+                return sql
+            self.cache_misses += 1
+        sql = render()
+        with self._lock:
+            self._statements[shape] = sql
+            while len(self._statements) > self.cache_size:
+                self._statements.popitem(last=False)
+        return sql
+
+    @staticmethod
+    def _match_mode(query_filter: QueryFilter, schema: SchemaInfo) -> Optional[str]:
+        """entity 검색 방식: fts(trigram MATCH) | fts_like | like | None(필터 없음)"""
+        if not query_filter.has_entity:
+            return None
+        if not (schema.search_index and schema.wide_view):
+            return "like"
+        entity = query_filter.entity
+        # trigram MATCH는 3글자 이상, LIKE 와일드카드가 없을 때 LIKE와 결과가 같음
+        if len(entity) >= 3 and not any(ch in entity for ch in "%_"):
+            return "fts"
+        return "fts_like"
+
+    def _rollup_scope(self, query_filter: QueryFilter, schema: SchemaInfo) -> Optional[str]:
+        """
+        롤업으로 답할 수 있으면 범위(all/client/product)를 반환합니다.
+        대상 문자열이 거래처명에만 맞으면 해당 거래처의 모든 품목 라인이 선택되므로 거래처 롤업과,
+        품목/함량에만 맞으면 품목 롤업과 결과가 같습니다. 양쪽 모두에 맞으면 팩트에서 집계합니다.
+        """
+        if not (schema.long and schema.rollup) or query_filter.aggregation == "rows":
+            return None
+        if not query_filter.has_entity:
+            scope = "all"
+        elif any(ch in query_filter.entity for ch in "%_"):
+            return None
+        else:
+            pattern = f"%{query_filter.entity}%"
+            with read_connection(self.db_file) as conn:
+                client_match = conn.execute(
+                    "SELECT EXISTS (SELECT 1 FROM dim_client WHERE name LIKE ?)", (pattern,)
+                ).fetchone()[0]
+                product_match = conn.execute(
+                    "SELECT EXISTS (SELECT 1 FROM dim_product WHERE product LIKE ? OR strength LIKE ?)",
+                    (pattern, pattern)
+                ).fetchone()[0]
+            if client_match and product_match:
+                return None
+            scope = "product" if product_match else "client"
+        if query_filter.aggregation != "monthly" and query_filter.aggregation not in ROLLUP_GROUPS[scope]:
+            return None
+        return scope
+
+    @staticmethod
+    def _select_months(query_filter: QueryFilter, schema: SchemaInfo) -> Tuple[str, ...]:
+        if query_filter.months is None:
+            return schema.months
+        start, end = query_filter.months
+        return tuple(month for month in schema.months if start <= month <= end)
+
+    @staticmethod
+    def _params(query_filter: QueryFilter, schema: SchemaInfo, match_mode: Optional[str]) -> List[Any]:
+        params: List[Any] = []
+        entity = query_filter.entity
+        if match_mode == "fts":
+            params.append('"{}"'.format(entity.replace('"', '""')))
+        elif match_mode in ("fts_like", "like"):
+            params.extend([f"%{entity}%"] * 3)
+        # long 스키마는 월 범위를 파라미터로, wide 스키마는 컬럼 선택으로 처리
+        if query_filter.months is not None and schema.long and query_filter.aggregation != "rows":
+            params.extend(query_filter.months)
+        if query_filter.top_n is not None and query_filter.aggregation in GROUP_KEYS:
+            params.append(int(query_filter.top_n))
+        return params
+
+    @staticmethod
+    def _rollup_params(query_filter: QueryFilter, scope: str) -> List[Any]:
+        params: List[Any] = []
+        pattern = f"%{query_filter.entity}%"
+        # 대상 필터 (monthly는 item_count 서브쿼리에서 한 번 더 사용)
+        entity_params = {"all": [], "client": [pattern], "product": [pattern, pattern]}[scope]
+        if query_filter.aggregation in ("monthly", "product_monthly"):
+            params.extend(entity_params)
+        params.extend(entity_params)
+        if query_filter.months is not None:
+            params.extend(query_filter.months)
+        if query_filter.top_n is not None and query_filter.aggregation in GROUP_KEYS:
+            params.append(int(query_filter.top_n))
+        return params
+
+    @staticmethod
+    def _rollup_key_filter(scope: str) -> str:
+        if scope == "client":
+            return "SELECT client_id FROM dim_client WHERE name LIKE ?"
+        return "SELECT product_id FROM dim_product WHERE product LIKE ? OR strength LIKE ?"
+
+    def _render_rollup(self, query_filter: QueryFilter, scope: str) -> str:
+        table, key, dim_join = ROLLUP_SOURCES[scope]
+        conditions = []
+        if scope != "all":
+            conditions.append(f"r.{key} IN ({self._rollup_key_filter(scope)})")
+        if query_filter.months is not None:
+            conditions.append("r.month BETWEEN ? AND ?")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        if query_filter.aggregation == "monthly":
+            if scope == "all":
+                # 전체 월별 집계는 월 수만큼의 행만 읽음
+                item_count = "(SELECT COUNT(*) FROM sales_item)"
+                source = "rollup_month r"
+            else:
+                item_count = f"(SELECT COUNT(*) FROM sales_item WHERE {key} IN ({self._rollup_key_filter(scope)}))"
+                source = f"{table} r"
+            return (
+                f"SELECT r.month AS month, SUM(r.count) AS count, SUM(r.sum) AS sum, "
+                "SUM(r.sum) / SUM(r.count) AS mean, MIN(r.min) AS min, MAX(r.max) AS max, "
+                f"SUM(r.sumsq) AS sumsq, {item_count} AS item_count "
+                f"FROM {source}{where} GROUP BY r.month ORDER BY r.month"
+            )
+
+        if query_filter.aggregation == "product_monthly":
+            key_filter = f" WHERE {key} IN ({self._rollup_key_filter(scope)})" if scope != "all" else ""
+            items_cte = f"items AS (SELECT product_id FROM sales_item{key_filter})"
+            if scope == "client":
+                # 거래처 롤업에는 품목 구분이 없으므로 팩트의 (client_id, month) 인덱스로 해당 거래처만 집계
+                return self._render_product_monthly(
+                    items_cte, "sales_fact r JOIN dim_product p ON p.product_id = r.product_id", "r.month",
+                    "COUNT(r.amount) AS count, SUM(r.amount) AS sum, SUM(r.amount * r.amount) AS sumsq, "
+                    "MIN(r.amount) AS min, MAX(r.amount) AS max",
+                    where
+                )
+            table, key, dim_join = ROLLUP_SOURCES["product"]
+            return self._render_product_monthly(
+                items_cte, f"{table} r JOIN {dim_join}", "r.month",
+                "SUM(r.count) AS count, SUM(r.sum) AS sum, SUM(r.sumsq) AS sumsq, "
+                "MIN(r.min) AS min, MAX(r.max) AS max",
+                where
+            )
+
+        key_expr, _ = GROUP_KEYS[query_filter.aggregation]
+        if query_filter.aggregation != "client":
+            table, key, dim_join = ROLLUP_SOURCES["product"]
+        limit = " LIMIT ?" if query_filter.top_n is not None else ""
+        return (
+            f"SELECT {key_expr} AS {query_filter.aggregation}, SUM(r.sum) AS total "
+            f"FROM {table} r JOIN {dim_join}{where} "
+            f"GROUP BY {key_expr} ORDER BY total DESC{limit}"
+        )
+
+    @staticmethod
+    def _item_filter(match_mode: str) -> str:
+        """품목 라인(item_id) 필터 서브쿼리"""
+        if match_mode == "fts":
+            return "SELECT rowid FROM sales_search WHERE sales_search MATCH ?"
+        if match_mode == "fts_like":
+            return 'SELECT rowid FROM sales_search WHERE "ID" LIKE ? OR "품목" LIKE ? OR "함량" LIKE ?'
+        return 'SELECT item_id FROM sales_wide WHERE "ID" LIKE ? OR "품목" LIKE ? OR "함량" LIKE ?'
+
+    def _render(self, query_filter: QueryFilter, schema: SchemaInfo,
+                match_mode: Optional[str], months: Tuple[str, ...]) -> str:
+        if query_filter.aggregation == "rows":
+            return self._render_rows(schema, match_mode, months)
+        if schema.long:
+            return self._render_long(query_filter, match_mode)
+        return self._render_wide(query_filter, schema, match_mode, months)
+
+    def _render_rows(self, schema: SchemaInfo, match_mode: Optional[str], months: Tuple[str, ...]) -> str:
+        dims = [col for col in schema.columns if col in DIMENSION_COLUMNS]
+        columns = ", ".join(quote_identifier(col) for col in dims + list(months))
+        if match_mode is None:
+            return f"SELECT {columns} FROM sales_data"
+        if match_mode == "like" and not schema.wide_view:
+            return f'SELECT {columns} FROM sales_data WHERE ("ID" LIKE ? OR "품목" LIKE ? OR "함량" LIKE ?)'
+        return (
+            f"SELECT {columns} FROM sales_wide "
+            f"WHERE item_id IN ({self._item_filter(match_mode)}) ORDER BY item_id"
+        )
+
+    def _render_long(self, query_filter: QueryFilter, match_mode: Optional[str]) -> str:
+        if match_mode is None:
+            items_cte = "items AS (SELECT client_id, product_id FROM sales_item)"
+            fact_from = "sales_fact f"
+        else:
+            items_cte = (
+                "items AS (SELECT client_id, product_id FROM sales_item "
+                f"WHERE item_id IN ({self._item_filter(match_mode)}))"
+            )
+            fact_from = "items i JOIN sales_fact f ON f.client_id = i.client_id AND f.product_id = i.product_id"
+        where = " WHERE f.month BETWEEN ? AND ?" if query_filter.months is not None else ""
+
+        if query_filter.aggregation == "product_monthly":
+            return self._render_product_monthly(
+                items_cte,
+                f"{fact_from} JOIN dim_product p ON p.product_id = f.product_id", "f.month",
+                "COUNT(f.amount) AS count, SUM(f.amount) AS sum, SUM(f.amount * f.amount) AS sumsq, "
+                "MIN(f.amount) AS min, MAX(f.amount) AS max",
+                where
+            )
+
+        if query_filter.aggregation == "monthly":
+            return (
+                f"WITH {items_cte} "
+                "SELECT f.month AS month, COUNT(f.amount) AS count, SUM(f.amount) AS sum, "
+                "AVG(f.amount) AS mean, MIN(f.amount) AS min, MAX(f.amount) AS max, "
+                "SUM(f.amount * f.amount) AS sumsq, (SELECT COUNT(*) FROM items) AS item_count "
+                f"FROM {fact_from}{where} GROUP BY f.month ORDER BY f.month"
+            )
+
+        key_expr, _ = GROUP_KEYS[query_filter.aggregation]
+        limit = " LIMIT ?" if query_filter.top_n is not None else ""
+        return (
+            f"WITH {items_cte} "
+            f"SELECT {key_expr} AS {query_filter.aggregation}, SUM(f.amount) AS total "
+            f"FROM {fact_from} "
+            "JOIN dim_client c ON c.client_id = f.client_id "
+            "JOIN dim_product p ON p.product_id = f.product_id"
+            f"{where} GROUP BY {key_expr} ORDER BY total DESC{limit}"
+        )
+
+    @staticmethod
+    def _render_product_monthly(items_cte: str, source: str, month: str, aggregates: str, where: str) -> str:
+        """long 스키마 품목×월 집계: 대상 품목 라인의 품목별 개수에 월별 집계를 LEFT JOIN."""
+        return (
+            f"WITH {items_cte}, "
+            "item_counts AS (SELECT p.product AS product, COUNT(*) AS item_count "
+            "FROM items i JOIN dim_product p ON p.product_id = i.product_id GROUP BY p.product), "
+            f"monthly AS (SELECT p.product AS product, {month} AS month, {aggregates} "
+            f"FROM {source}{where} GROUP BY p.product, {month}) "
+            "SELECT n.product, m.month, m.count, m.sum, m.sumsq, m.min, m.max, n.item_count "
+            "FROM item_counts n LEFT JOIN monthly m ON m.product = n.product ORDER BY n.product, m.month"
+        )
+
+    def _render_wide(self, query_filter: QueryFilter, schema: SchemaInfo,
+                     match_mode: Optional[str], months: Tuple[str, ...]) -> str:
+        if match_mode is None:
+            filtered = "SELECT * FROM sales_data"
+        elif match_mode == "like" and not schema.wide_view:
+            filtered = 'SELECT * FROM sales_data WHERE ("ID" LIKE ? OR "품목" LIKE ? OR "함량" LIKE ?)'
+        else:
+            filtered = f"SELECT * FROM sales_wide WHERE item_id IN ({self._item_filter(match_mode)})"
+
+        if query_filter.aggregation == "monthly":
+            if not months:
+                return f"WITH filtered AS ({filtered}) SELECT NULL AS month LIMIT 0"
+            selects = [
+                "SELECT '{0}' AS month, COUNT({1}) AS count, SUM({1}) AS sum, AVG({1}) AS mean, "
+                "MIN({1}) AS min, MAX({1}) AS max, SUM({1} * {1}) AS sumsq, "
+                "(SELECT COUNT(*) FROM filtered) AS item_count FROM filtered".format(
+                    month.replace("'", "''"), quote_identifier(month))
+                for month in months
+            ]
+            # 값이 하나도 없는 월은 제외 (long 스키마의 GROUP BY 결과와 동일)
+            return (
+                f"WITH filtered AS ({filtered}) "
+                f"SELECT * FROM ({' UNION ALL '.join(selects)}) WHERE count > 0"
+            )
+
+        if query_filter.aggregation == "product_monthly":
+            _, key_col = GROUP_KEYS["product"]
+            if not months:
+                return f"WITH filtered AS ({filtered}) SELECT NULL AS product LIMIT 0"
+            # 값이 없는 (품목, 월)도 count 0으로 남겨 품목별 item_count를 보존 (분석 시 제외)
+            selects = [
+                "SELECT {0} AS product, '{1}' AS month, COUNT({2}) AS count, SUM({2}) AS sum, "
+                "SUM({2} * {2}) AS sumsq, MIN({2}) AS min, MAX({2}) AS max, COUNT(*) AS item_count "
+                "FROM filtered GROUP BY {0}".format(key_col, month.replace("'", "''"), quote_identifier(month))
+                for month in months
+            ]
+            return (
+                f"WITH filtered AS ({filtered}) "
+                f"SELECT * FROM ({' UNION ALL '.join(selects)}) ORDER BY product, month"
+            )
+
+        _, key_col = GROUP_KEYS[query_filter.aggregation]
+        total_expr = " + ".join(f"TOTAL({quote_identifier(month)})" for month in months) or "0"
+        limit = " LIMIT ?" if query_filter.top_n is not None else ""
+        return (
+            f"WITH filtered AS ({filtered}) "
+            f"SELECT {key_col} AS {query_filter.aggregation}, {total_expr} AS total "
+            f"FROM filtered GROUP BY {key_col} ORDER BY total DESC{limit}"
+        )
@@ -0,0 +1,196 @@
+"""
+(분석 대상, 데이터 버전) 단위 보고서 캐시
+
+같은 대상을 다른 표현으로 요청해도 client_or_region이 같게 해석되면
+generate_report를 다시 호출하지 않고 저장된 보고서를 반환합니다.
+데이터 버전은 metadata 테이블의 updated_at(없으면 created_at)이며, DB를 다시
+만들거나 증분 적재하면 버전이 바뀌어 이전 버전 항목은 자동으로 무효화됩니다.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from db_pool import read_connection
+from entity_resolver import normalize_text
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+CACHE_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS report_cache (
+    cache_key TEXT PRIMARY KEY,
+    data_version TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+)
+"""
+
+
+def get_data_version(db_file: str) -> Optional[str]:
+    """
+    데이터 버전을 반환합니다.
+    증분 적재된 DB는 metadata.updated_at, 그 외에는 metadata.created_at을 사용합니다.
+    """
+    try:
+        with read_connection(db_file) as conn:
+            cursor = conn.execute("SELECT * FROM metadata LIMIT 1")
+            row = cursor.fetchone()
+            columns = [desc[0] for desc in cursor.description]
+    except (sqlite3.Error, OSError):
+        return None
+    if not row:
+        return None
+    meta = dict(zip(columns, row))
+    version = meta.get("updated_at") or meta.get("created_at")
+    return str(version) if version is not None else None
+
+
+class ReportCache:
+    """LRU + TTL 메모리 캐시 (선택적으로 SQLite 파일에 영구 저장)"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # cache_key -> (created_at, data_version, payload)
+        self._entries: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        self._data_version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(CACHE_TABLE_DDL)
+            finally:
+                conn.close()
+
+    @staticmethod
+    def make_key(client_or_region: str, data_version: str) -> str:
+        return f"{data_version}\x1f{normalize_text(client_or_region)}"
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _observe_version(self, data_version: str):
+        """새 데이터 버전을 보면 이전 버전 항목을 모두 제거합니다."""
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        self._entries.clear()
+        if self.db_path:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM report_cache WHERE data_version != ?", (data_version,))
+            finally:
+                conn.close()
+
+    def get(self, client_or_region: str, data_version: str) -> Optional[Dict[str, Any]]:
+        """캐시된 보고서 payload를 반환합니다. 없거나 만료되었으면 None."""
+        key = self.make_key(client_or_region, data_version)
+        now = time.time()
+
+        with self._lock:
+            self._observe_version(data_version)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                del self._entries[key]
+
+            payload = self._disk_get(key, now) if self.db_path else None
+            if payload is None:
+                self.misses += 1
+                return None
+
+            self._entries[key] = (payload[0], data_version, payload[1])
+            self._evict_memory()
+            self.hits += 1
+            return payload[1]
+
+    def set(self, client_or_region: str, data_version: str, payload: Dict[str, Any]):
+        """보고서 payload를 저장합니다."""
+        key = self.make_key(client_or_region, data_version)
+        now = time.time()
+
+        with self._lock:
+            self._observe_version(data_version)
+            self._entries[key] = (now, data_version, payload)
+            self._entries.move_to_end(key)
+            self._evict_memory()
+
+            if self.db_path:
+                self._disk_set(key, data_version, payload, now)
+
+    def clear(self):
+        """모든 항목을 삭제합니다."""
+        with self._lock:
+            self._entries.clear()
+            if self.db_path:
+                conn = self._connect()
+                try:
+                    with conn:
+                        conn.execute("DELETE FROM report_cache")
+                finally:
+                    conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "data_version": self._data_version,
+            }
+
+    def _evict_memory(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT payload, created_at FROM report_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with conn:
+                if now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM report_cache WHERE cache_key = ?", (key,))
+                    return None
+                conn.execute("UPDATE report_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+            return row[1], json.loads(row[0])
+        finally:
+            conn.close()
+
+    def _disk_set(self, key: str, data_version: str, payload: Dict[str, Any], now: float):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO report_cache "
+                    "(cache_key, data_version, payload, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, data_version, json.dumps(payload, ensure_ascii=False, default=str), now, now)
+                )
+                conn.execute("DELETE FROM report_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                conn.execute(
+                    "DELETE FROM report_cache WHERE cache_key NOT IN "
+                    "(SELECT cache_key FROM report_cache ORDER BY last_access DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+        finally:
+            conn.close()
@@ -6,14 +6,37 @@ LangGraph 기반 성과 보고서 시스템 실행 스크립트
 import os
 import sys
 import argparse
-from data_processor import DataProcessor
-from langgraph_system import PerformanceReportSystem
+import subprocess
+import uuid
+from collections import defaultdict
 
-def setup_data():
-    """데이터 설정 및 데이터베이스 생성"""
+# 모드별로 실제 임포트되는 모듈 (--profile-imports)
+# 무거운 모듈(pandas, LangChain, matplotlib 등)은 해당 모드의 함수 안에서 처음 사용할 때 임포트합니다.
+MODE_IMPORTS = {
+    'setup': ['data_processor'],
+    'console': ['langgraph_system', 'langchain_openai'],
+    'web': ['streamlit', 'data_processor', 'chart_renderer', 'system_registry'],
+    'batch': ['batch_report', 'langgraph_system', 'langchain_openai'],
+}
+
+def setup_data(schema="long", incremental=False, streaming=False, columnar=False):
+    """
+    데이터 설정 및 데이터베이스 생성
+    incremental=True면 변경분만 반영하고, streaming=True면 시트를 메모리에 올리지 않고 청크 단위로 적재합니다.
+    columnar=True면 Parquet 컬럼형 저장소도 함께 만듭니다.
+    """
     print("📊 데이터 처리를 시작합니다...")
     
-    processor = DataProcessor()
+    from data_processor import DataProcessor
+    processor = DataProcessor(schema=schema, columnar=columnar)
+    
+    if streaming and not incremental:
+        stats = processor.create_sqlite_db_streaming()
+        if not stats:
+            print("❌ 스트리밍 적재에 실패했습니다.")
+            return False
+        print(f"✅ 스트리밍 적재 완료: {stats['rows']}행 ({stats['rows_per_sec']:,.0f}행/초, {stats['source']})")
+        return processor.test_database()
     
     # Excel 데이터 로드
     df = processor.load_excel_data()
@@ -25,9 +48,21 @@ def setup_data():
     analysis = processor.analyze_data_structure(df)
     print(f"✅ 데이터 분석 완료: {analysis['total_rows']}행, {analysis['total_columns']}열")
     
-    # SQLite 데이터베이스 생성
-    processor.create_sqlite_db(df)
-    print("✅ SQLite 데이터베이스 생성 완료")
+    # SQLite 데이터베이스 생성 / 증분 적재
+    if incremental:
+        stats = processor.update_sqlite_db(df)
+        if stats is None:
+            print("❌ 증분 적재에 실패했습니다 (변경 사항은 롤백되었습니다).")
+            return False
+        if stats["rebuilt"]:
+            print("✅ SQLite 데이터베이스 생성 완료 (증분 적재 대신 전체 재생성)")
+        else:
+            print("✅ SQLite 데이터베이스 증분 적재 완료")
+    else:
+        if not processor.create_sqlite_db(df):
+            print("❌ SQLite 데이터베이스 생성에 실패했습니다.")
+            return False
+        print("✅ SQLite 데이터베이스 생성 완료")
     
     # 데이터베이스 테스트
     if processor.test_database():
@@ -37,12 +72,42 @@ def setup_data():
         print("❌ 데이터베이스 테스트 실패")
         return False
 
+def print_stream(system, user_input, thread_id=None):
+    """보고서 토큰과 진행 상황을 콘솔에 스트리밍합니다."""
+    streamed = False
+    for event in system.stream(user_input, thread_id=thread_id):
+        if event["type"] == "progress" and not streamed:
+            print(f"  · {event['message']}")
+        elif event["type"] == "token":
+            if not streamed:
+                print("\n🤖 AI: ", end="", flush=True)
+                streamed = True
+            print(event["content"], end="", flush=True)
+        elif event["type"] == "final":
+            if streamed:
+                # 스트리밍된 보고서 외의 안내(검토 필요, 차트 경로)만 출력
+                extra = event["content"].replace(event["report"], "", 1).strip()
+                print(f"\n\n{extra}\n" if extra else "\n")
+            else:
+                print(f"\n🤖 AI: {event['content']}\n")
+            if event["review_pending"]:
+                review_console(system, thread_id)
+
+def review_console(system, thread_id):
+    """검토 대기 중인 보고서를 콘솔에서 승인/반려합니다."""
+    answer = input("보고서를 승인하시겠습니까? (y/n, 나중에 검토하려면 Enter): ").strip().lower()
+    if answer in ("y", "n"):
+        print(f"\n🤖 AI: {system.review(thread_id, approved=answer == 'y')}\n")
+
 def run_console():
     """콘솔 모드로 실행"""
     print("🚀 LangGraph 성과 보고서 시스템 - 콘솔 모드")
     
-    # 시스템 초기화
+    # 시스템 초기화 (LLM/그래프 스택은 콘솔 모드에서만 임포트)
+    from langgraph_system import PerformanceReportSystem
     system = PerformanceReportSystem()
+    # 세션 체크포인트 스레드: 실패한 요청을 다시 입력하면 실패한 단계부터 이어서 실행
+    thread_id = uuid.uuid4().hex
     print("✅ AI 시스템 초기화 완료")
     
     print("\n💬 채팅을 시작합니다. '종료' 또는 'quit'를 입력하면 종료됩니다.")
@@ -60,8 +125,7 @@ def run_console():
                 continue
             
             print("🤖 AI가 응답을 생성하고 있습니다...")
-            response = system.run(user_input)
-            print(f"\n🤖 AI: {response}\n")
+            print_stream(system, user_input, thread_id)
             
         except KeyboardInterrupt:
             print("\n\n시스템을 종료합니다.")
@@ -69,27 +133,50 @@ def run_console():
         except Exception as e:
             print(f"❌ 오류가 발생했습니다: {e}")
 
+def run_batch(group="client", concurrency=8, output_dir="batch_reports", limit=None):
+    """모든 거래처(또는 품목)의 보고서를 한 번에 생성합니다 (중단 후 다시 실행하면 이어서 진행)."""
+    print(f"📦 일괄 보고서 생성을 시작합니다 ({group}, 동시 {concurrency}건)...")
+    
+    from batch_report import BatchReportRunner
+    from langgraph_system import PerformanceReportSystem
+    runner = BatchReportRunner(PerformanceReportSystem(), output_dir=output_dir, group=group,
+                               concurrency=concurrency)
+    try:
+        stats = runner.run(limit=limit)
+    except KeyboardInterrupt:
+        print(f"\n⏸️  중단되었습니다. 완료된 보고서는 {runner.results_file}에 저장되어 있으며, 다시 실행하면 이어서 진행합니다.")
+        return False
+    
+    print(f"✅ 일괄 보고서 생성 완료: {stats['completed']}건 생성, {stats['skipped']}건 건너뜀, "
+          f"{stats['failed']}건 실패 ({stats['elapsed_seconds']:.1f}초, 재시도 {stats['retries']}회)")
+    print(f"   결과: {runner.results_file}")
+    return stats['failed'] == 0
+
 def run_streamlit():
     """Streamlit 웹 앱으로 실행"""
     print("🌐 Streamlit 웹 앱을 시작합니다...")
     os.system("streamlit run app.py")
 
-def check_environment():
-    """환경 설정을 확인합니다."""
+def check_environment(require_llm=True):
+    """
+    환경 설정을 확인합니다.
+    require_llm=False(데이터 설정만 하는 경우)면 .env와 OPENAI_API_KEY는 확인하지 않습니다.
+    """
     print("🔍 환경 설정을 확인합니다...")
     
-    # .env 파일 확인
-    if not os.path.exists('.env'):
-        print("⚠️  .env 파일이 없습니다. .env.example을 참고하여 생성해주세요.")
-        return False
-    
-    # OpenAI API 키 확인
-    from dotenv import load_dotenv
-    load_dotenv()
-    
-    if not os.getenv('OPENAI_API_KEY'):
-        print("❌ OPENAI_API_KEY가 설정되지 않았습니다.")
-        return False
+    if require_llm:
+        # .env 파일 확인
+        if not os.path.exists('.env'):
+            print("⚠️  .env 파일이 없습니다. .env.example을 참고하여 생성해주세요.")
+            return False
+        
+        # OpenAI API 키 확인
+        from dotenv import load_dotenv
+        load_dotenv()
+        
+        if not os.getenv('OPENAI_API_KEY'):
+            print("❌ OPENAI_API_KEY가 설정되지 않았습니다.")
+            return False
     
     # 필수 파일 확인
     if not os.path.exists('data.xlsx'):
@@ -99,28 +186,90 @@ def check_environment():
     print("✅ 환경 설정이 올바릅니다.")
     return True
 
+def profile_imports(modules, top=15):
+    """
+    python -X importtime으로 모듈 임포트 시간을 측정해 최상위 패키지별로 출력합니다.
+    측정은 새 인터프리터에서 하므로 이미 임포트된 모듈의 영향을 받지 않습니다.
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        print(f"❌ 임포트 실패: {result.stderr.strip().splitlines()[-1]}")
+        return False
+    
+    total_us = 0
+    self_us_by_package = defaultdict(int)
+    cumulative_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, raw_name = line[len("import time:"):].split("|")
+        name = raw_name.strip()
+        depth = (len(raw_name) - len(raw_name.lstrip())) // 2
+        self_us_by_package[name.split(".")[0]] += int(self_us)
+        if depth == 0:
+            total_us += int(cumulative)
+            cumulative_us[name] = int(cumulative)
+    
+    print(f"⏱️  임포트 시간: {total_us / 1000:.0f}ms ({', '.join(modules)})")
+    for module in modules:
+        if module in cumulative_us:
+            print(f"  {module:<24} 누적 {cumulative_us[module] / 1000:8.1f}ms")
+    print(f"\n  패키지별 자체 시간 (상위 {top}개)")
+    ranked = sorted(self_us_by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    for package, self_us in ranked:
+        share = self_us / total_us if total_us else 0.0
+        print(f"  {package:<24} {self_us / 1000:8.1f}ms  {share:6.1%}")
+    return True
+
 def main():
     """메인 함수"""
     parser = argparse.ArgumentParser(description='LangGraph 성과 보고서 시스템')
-    parser.add_argument('--mode', choices=['setup', 'console', 'web'], default='web',
+    parser.add_argument('--mode', choices=['setup', 'console', 'web', 'batch'], default='web',
                        help='실행 모드 선택 (default: web)')
     parser.add_argument('--force-setup', action='store_true',
                        help='강제로 데이터 설정 다시 실행')
+    parser.add_argument('--schema', choices=['long', 'wide'], default='long',
+                       help='DB 스키마 선택: long=정규화 팩트 테이블, wide=시트 그대로 (default: long)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='기존 DB에 변경된 셀만 반영 (실행 중인 앱을 멈추지 않음)')
+    parser.add_argument('--streaming', action='store_true',
+                       help='Excel을 청크 단위로 읽어 바로 DB에 기록 (대용량 시트용)')
+    parser.add_argument('--columnar', action='store_true',
+                       help='Parquet 컬럼형 저장소도 생성 (집계 조회 가속, pyarrow/duckdb 사용)')
+    parser.add_argument('--batch-group', choices=['client', 'product'], default='client',
+                       help='batch 모드: 거래처별(client) 또는 품목별(product) 보고서 (default: client)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                       help='batch 모드: 동시에 진행하는 보고서 생성 요청 수 (default: 8)')
+    parser.add_argument('--output-dir', default='batch_reports',
+                       help='batch 모드: 결과 디렉터리 (default: batch_reports)')
+    parser.add_argument('--limit', type=int, default=None,
+                       help='batch 모드: 생성할 최대 보고서 수 (시험 실행용)')
+    parser.add_argument('--profile-imports', action='store_true',
+                       help='선택한 모드가 임포트하는 모듈의 임포트 시간을 패키지별로 출력하고 종료')
     
     args = parser.parse_args()
     
+    if args.profile_imports:
+        profile_imports(MODE_IMPORTS[args.mode])
+        return
+    
     print("=" * 60)
     print("🚀 LangGraph 기반 성과 보고서 시스템")
     print("=" * 60)
     
     # 환경 확인
-    if not check_environment():
+    if not check_environment(require_llm=args.mode != 'setup'):
         print("\n환경 설정을 완료한 후 다시 실행해주세요.")
         return
     
     # 데이터 설정
-    if args.mode == 'setup' or args.force_setup or not os.path.exists('sales_data.db'):
-        if not setup_data():
+    if args.mode == 'setup' or args.force_setup or args.incremental or not os.path.exists('sales_data.db'):
+        if not setup_data(args.schema, incremental=args.incremental, streaming=args.streaming,
+                          columnar=args.columnar):
             print("데이터 설정에 실패했습니다.")
             return
     
@@ -131,6 +280,8 @@ def main():
         run_console()
     elif args.mode == 'web':
         run_streamlit()
+    elif args.mode == 'batch':
+        run_batch(args.batch_group, args.concurrency, args.output_dir, args.limit)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+프로세스 공용 PerformanceReportSystem 레지스트리
+
+Streamlit 세션(브라우저 탭)마다 시스템을 만들면 그래프 컴파일, ChatOpenAI 클라이언트 생성,
+엔티티 사전 로드가 세션 수만큼 반복됩니다. 이 모듈은 DB 파일별로 시스템을 하나만 만들어 공유합니다.
+- 컴파일된 그래프는 요청마다 독립된 상태로 실행되므로 여러 스레드에서 동시에 사용할 수 있습니다.
+- LLM 클라이언트(및 그 HTTP 커넥션 풀)도 시스템과 함께 공유됩니다.
+- get_system()은 DB의 데이터 버전을 확인해 바뀌었으면 reload_data()로 DB 파생 상태를 다시 읽습니다.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Set
+
+from report_cache import get_data_version
+
+# _systems/_versions/_building 보호용 (시스템 생성 중에는 잡지 않음)
+_lock = threading.Lock()
+# 절대 경로 -> 시스템
+_systems: Dict[str, object] = {}
+# 절대 경로 -> 시스템이 마지막으로 본 데이터 버전
+_versions: Dict[str, Optional[str]] = {}
+# 절대 경로 -> 생성 완료 이벤트 (생성 중인 시스템, 동시 호출은 이 이벤트를 기다림)
+_building: Dict[str, threading.Event] = {}
+# 백그라운드에서 생성 중인 시스템의 절대 경로
+_warming: Set[str] = set()
+
+
+def _build_system(key: str, db_file: str, version: Optional[str], done: threading.Event):
+    """시스템을 _lock 밖에서 생성해 등록합니다. 실패해도 기다리는 호출이 깨어나도록 이벤트를 설정합니다."""
+    try:
+        # LLM/그래프 스택은 시스템이 처음 필요할 때만 임포트
+        from langgraph_system import PerformanceReportSystem
+        system = PerformanceReportSystem(db_file)
+        with _lock:
+            _systems[key] = system
+            _versions[key] = version
+        return system
+    finally:
+        with _lock:
+            _building.pop(key, None)
+        done.set()
+
+
+def get_system(db_file: str = "sales_data.db"):
+    """
+    공용 시스템을 반환합니다. 처음 호출 시 생성하고, 데이터 버전이 바뀌었으면 다시 로드합니다.
+    생성은 _lock 밖에서 한 번만 실행되고, 그동안 들어온 호출은 생성이 끝날 때까지 기다립니다.
+    """
+    key = os.path.abspath(db_file)
+    version = get_data_version(db_file)
+    while True:
+        with _lock:
+            system = _systems.get(key)
+            if system is not None:
+                reload = version != _versions[key]
+                _versions[key] = version
+                break
+            done = _building.get(key)
+            builder = done is None
+            if builder:
+                done = _building[key] = threading.Event()
+        if builder:
+            return _build_system(key, db_file, version, done)
+        # 다른 스레드가 생성 중: 끝나면 다시 확인 (생성이 실패했으면 이 호출이 다시 생성)
+        done.wait()
+
+    if reload:
+        print(f"데이터 버전 변경 감지 ({version}): 시스템 데이터를 다시 로드합니다.")
+        system.reload_data()
+    return system
+
+
+def warm_system(db_file: str = "sales_data.db"):
+    """
+    공용 시스템을 백그라운드 스레드에서 미리 만듭니다 (이미 있거나 생성 중이면 무시).
+    생성 중에 get_system()을 호출하면 생성이 끝날 때까지 기다립니다.
+    """
+    key = os.path.abspath(db_file)
+    with _lock:
+        if key in _systems or key in _warming:
+            return
+        _warming.add(key)
+
+    def warm():
+        try:
+            get_system(db_file)
+        except Exception as e:
+            print(f"시스템 사전 초기화 오류: {e}")
+        finally:
+            with _lock:
+                _warming.discard(key)
+
+    threading.Thread(target=warm, name="system-warmup", daemon=True).start()
+
+
+def reset_system(db_file: Optional[str] = None):
+    """공용 시스템을 제거합니다 (db_file이 없으면 전체). 다음 get_system() 호출 때 새로 만듭니다."""
+    with _lock:
+        keys = [os.path.abspath(db_file)] if db_file else list(_systems)
+        removed = [_systems.pop(key) for key in keys if key in _systems]
+        for key in keys:
+            _versions.pop(key, None)
+    # 진행 중인 요청이 있을 수 있으므로 차트 워커는 기다리지 않고 종료
+    for system in removed:
+        system.chart_renderer.shutdown(wait=False)
+
+
+def is_loaded(db_file: str = "sales_data.db") -> bool:
+    """시스템이 준비되었는지 확인합니다 (잠금 없이 확인하므로 생성 중에도 기다리지 않음)."""
+    return os.path.abspath(db_file) in _systems
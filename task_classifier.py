@@ -0,0 +1,110 @@
+"""
+classify_task 앞단의 규칙 기반 작업 분류기
+
+키워드 가중치로 PerformanceReport / Other 점수를 계산하고,
+신뢰도가 임계값 이상인 경우에만 LLM 없이 바로 라우팅합니다.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+PERFORMANCE_REPORT = "PerformanceReport"
+OTHER = "Other"
+
+# 성과 보고서 요청 키워드와 가중치
+REPORT_KEYWORDS: Dict[str, float] = {
+    "보고서": 1.0,
+    "리포트": 1.0,
+    "report": 1.0,
+    "매출": 1.0,
+    "실적": 1.0,
+    "성과": 1.0,
+    "판매량": 1.0,
+    "sales": 1.0,
+    "분석": 0.5,
+    "추이": 0.5,
+    "트렌드": 0.5,
+    "현황": 0.5,
+    "월별": 0.5,
+    "비교": 0.5,
+    "요약": 0.5,
+    "상반기": 0.5,
+    "하반기": 0.5,
+    "시각화": 0.5,
+    "차트": 0.5,
+}
+
+# 성과 보고서와 무관한 요청 키워드와 가중치
+OTHER_KEYWORDS: Dict[str, float] = {
+    "안녕": 1.0,
+    "날씨": 1.0,
+    "번역": 1.0,
+    "농담": 1.0,
+    "고마워": 1.0,
+    "감사합니다": 1.0,
+    "이메일": 1.0,
+    "코드": 1.0,
+    "hello": 1.0,
+    "weather": 1.0,
+}
+
+# 알려진 거래처/품목이 언급된 경우 보고서 쪽 가중치
+ENTITY_WEIGHT = 0.5
+
+# 이 이상이면 LLM 없이 분류 확정
+DEFAULT_CONFIDENCE_THRESHOLD = 0.75
+
+
+class RuleBasedTaskClassifier:
+    """키워드 규칙 기반 1차 분류기 (적중률 지표 포함)"""
+
+    def __init__(self, threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._total = 0
+        self._hits = 0
+        self._hits_by_label = {PERFORMANCE_REPORT: 0, OTHER: 0}
+
+    def score(self, text: str, entity_found: bool = False) -> Tuple[str, float]:
+        """(예상 작업 타입, 신뢰도 0~1)을 반환합니다."""
+        lowered = text.casefold()
+        report_score = sum(w for keyword, w in REPORT_KEYWORDS.items() if keyword in lowered)
+        other_score = sum(w for keyword, w in OTHER_KEYWORDS.items() if keyword in lowered)
+        if entity_found:
+            report_score += ENTITY_WEIGHT
+
+        total = report_score + other_score
+        if total == 0:
+            return OTHER, 0.0
+
+        label = PERFORMANCE_REPORT if report_score > other_score else OTHER
+        # 한쪽 근거가 강할수록, 양쪽 근거가 섞일수록 낮아지는 신뢰도
+        confidence = min(1.0, max(report_score, other_score)) * abs(report_score - other_score) / total
+        return label, confidence
+
+    def classify(self, text: str, entity_found: bool = False) -> Optional[str]:
+        """신뢰도가 임계값 이상이면 작업 타입을, 아니면 None(LLM 위임)을 반환합니다."""
+        label, confidence = self.score(text, entity_found)
+        hit = confidence >= self.threshold
+
+        with self._lock:
+            self._total += 1
+            if hit:
+                self._hits += 1
+                self._hits_by_label[label] += 1
+
+        return label if hit else None
+
+    def metrics(self) -> Dict[str, float]:
+        """로컬 분류 적중률 지표를 반환합니다."""
+        with self._lock:
+            total, hits = self._total, self._hits
+            by_label = dict(self._hits_by_label)
+        return {
+            "total": total,
+            "local_hits": hits,
+            "llm_fallbacks": total - hits,
+            "hit_rate": hits / total if total else 0.0,
+            "hits_performance_report": by_label[PERFORMANCE_REPORT],
+            "hits_other": by_label[OTHER],
+        }
@@ -0,0 +1,99 @@
+"""
+followup.py 후속 질문 해석 테스트 (python -m pytest -q)
+"""
+
+import pandas as pd
+import pytest
+
+from followup import apply_refinement, merge_refinement, parse_follow_up, parse_month_range
+
+CLIENT = "강서굿모닝이비인후과"
+CLIENT_ENTITY = (CLIENT, "client_name")
+MONTHS = [f"2020-{month:02d}" for month in range(1, 12)]
+PRODUCTS = ["뉴렙톨정 150mg", "가스몬정", "그란닥신정"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2020년 상반기만", ("2020-01", "2020-06")),
+    ("2020년 하반기", ("2020-07", "2020-12")),
+    ("2020년 3분기", ("2020-07", "2020-09")),
+    ("2020년 3월", ("2020-03", "2020-03")),
+    ("2020-03만 보여줘", ("2020-03", "2020-03")),
+    ("2020년 1월부터 6월", ("2020-01", "2020-06")),
+    ("2019년 12월부터 2020년 2월까지", ("2019-12", "2020-02")),
+    ("2019년부터 2020년", ("2019-01", "2020-12")),
+    ("2020년", ("2020-01", "2020-12")),
+    ("최근 3개월", ("2020-09", "2020-11")),
+    ("최근 1년", ("2019-12", "2020-11")),
+    ("뉴렙톨만", None),
+])
+def test_parse_month_range(text, expected):
+    months = ["2019-12"] + MONTHS
+    assert parse_month_range(text, months) == expected
+
+
+def test_recent_without_months_is_unknown():
+    assert parse_month_range("최근 6개월") is None
+
+
+@pytest.mark.parametrize("text, entities, expected", [
+    ("그럼 2020년 상반기만 보여줘", [], {"months": ["2020-01", "2020-06"]}),
+    ("그 중 뉴렙톨만", [("뉴렙톨", "product")], {"products": ["뉴렙톨"]}),
+    ("뉴렙톨만 2020년 3분기", [("뉴렙톨", "product")],
+     {"months": ["2020-07", "2020-09"], "products": ["뉴렙톨"]}),
+    # 후속 표현 없이 현재 대상을 다시 언급
+    (f"{CLIENT} 2020년 상반기 매출", [CLIENT_ENTITY], {"months": ["2020-01", "2020-06"]}),
+])
+def test_follow_up(text, entities, expected):
+    assert parse_follow_up(text, entities, CLIENT, MONTHS, PRODUCTS) == expected
+
+
+@pytest.mark.parametrize("text, entities", [
+    # 전체 대상 요청은 현재 거래처의 조건이 아님
+    ("2020년 상반기 전체 매출 보여줘", []),
+    ("2020년 전체 거래처 매출 보여줘", []),
+    ("그럼 모든 거래처 2020년만", []),
+    # 후속 표현도 대상도 없는 요청
+    ("2020년 매출 보여줘", []),
+    ("뉴렙톨 2020년 매출", [("뉴렙톨", "product")]),
+    # 다른 거래처/지역
+    ("그럼 서울굿모닝의원 2020년만", [("서울굿모닝의원", "client_name")]),
+    ("그럼 강서구만", [("강서구", "region")]),
+    # 이전 결과에 없는 품목
+    ("그 중 타이레놀만", [("타이레놀", "product")]),
+    # 후속 표현 없는 보고서 요청
+    (f"{CLIENT} 2020년 보고서", [CLIENT_ENTITY]),
+    # 조건 없음
+    ("그럼 어떻게 되나요?", []),
+])
+def test_new_request(text, entities):
+    assert parse_follow_up(text, entities, CLIENT, MONTHS, PRODUCTS) is None
+
+
+def test_all_target_follow_up():
+    expected = {"months": ["2020-01", "2020-06"]}
+    assert parse_follow_up("그럼 2020년 상반기만", [], "전체", MONTHS) == expected
+    assert parse_follow_up("2020년 상반기 전체 매출 보여줘", [], "전체", MONTHS) == expected
+
+
+def test_merge_refinement_accumulates():
+    merged = merge_refinement({"months": ["2020-01", "2020-06"]}, {"products": ["뉴렙톨"]})
+    assert merged == {"months": ["2020-01", "2020-06"], "products": ["뉴렙톨"]}
+    assert merge_refinement(merged, {"months": ["2020-07", "2020-12"]})["months"] == ["2020-07", "2020-12"]
+
+
+def test_apply_refinement_keeps_item_count():
+    df = pd.DataFrame({
+        "product": ["뉴렙톨정 150mg", "뉴렙톨정 150mg", "가스몬정"],
+        "month": ["2020-01", "2020-08", "2020-08"],
+        "total_sales": [1.0, 2.0, 3.0],
+        "item_count": [2, 2, 1],
+    })
+    refined = apply_refinement(df, {"months": ["2020-01", "2020-06"], "products": ["뉴렙톨"]})
+    assert refined["product"].tolist() == ["뉴렙톨정 150mg", "뉴렙톨정 150mg"]
+    assert refined["month"].tolist()[0] == "2020-01"
+    assert pd.isna(refined["month"].tolist()[1])
+
+
+def test_amount_is_not_follow_up_marker():
+    assert parse_follow_up("2020년 매출 10만 원 이상", [], CLIENT, MONTHS, PRODUCTS) is None